@@ -0,0 +1,159 @@
+"""
+Écritures en masse des routes POST /{ressource}/bulk
+- INSERT par lots (executemany) dans la transaction de l'appelant, sans commit
+- Récupération des ids générés, dans l'ordre des lignes envoyées
+- Upsert sur une clé naturelle (isbn pour les livres)
+"""
+
+import logging
+import os
+from collections import Counter, defaultdict, deque
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import func, insert, or_, select, text, update
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+MAX_BULK_CHUNK_SIZE = 10000
+# Nombre maximal d'éléments par requête bulk
+MAX_BULK_ITEMS = int(os.getenv("MAX_BULK_ITEMS", "50000"))
+
+# Colonne qui retrouve sur MySQL les lignes insérées par un lot (voir _relire_ids) ; pas
+# forcément unique : la n-ième ligne d'une valeur reçoit le n-ième id de cette valeur
+# (un exemplaire : son livre et son rang dans le lot)
+CLES_RELECTURE = {
+    "livres": "isbn",
+    "utilisateurs": "email",
+    "exemplaires": "livre_id",
+    "emprunts": "exemplaire_id",
+    "groupes": "nom",
+    "etats": "nom",
+    "categories": "nom",
+    "statuts": "nom",
+    "departements": "nom",
+}
+
+
+class IdsAmbigus(Exception):
+    """Une écriture concurrente empêche d'attribuer les ids générés : transaction à rejouer"""
+
+
+def _lots(rows: List[Any], chunk_size: int):
+    for start in range(0, len(rows), chunk_size):
+        yield rows[start : start + chunk_size]
+
+
+def _relire_ids(db: Session, table, pk, cle: str, chunk: List[Dict[str, Any]], borne: int) -> List[int]:
+    """
+    Ids des lignes d'un lot inséré sur MySQL, relus par la clé au-delà de `borne`.
+
+    InnoDB attribue des ids croissants, dans l'ordre des lignes, et supérieurs à tout id déjà
+    en base : quels que soient innodb_autoinc_lock_mode (2, « interleaved », par défaut sur
+    MySQL 8), auto_increment_increment ou le découpage de l'executemany par le pilote, la
+    n-ième ligne d'une valeur de clé reçoit le n-ième id de cette valeur. Une ligne d'une
+    autre transaction de même clé dans l'intervalle rend les comptes faux : IdsAmbigus
+    plutôt que des ids faux.
+    """
+    colonne = table.c[cle]
+    valeurs = {row.get(cle) for row in chunk}
+    filtre = colonne.in_([v for v in valeurs if v is not None])
+    if None in valeurs:
+        filtre = or_(filtre, colonne.is_(None))
+    par_cle: Dict[Any, deque] = defaultdict(deque)
+    for id_, valeur in db.execute(select(pk, colonne).where(pk > borne, filtre).order_by(pk)):
+        par_cle[valeur].append(id_)
+    attendus = Counter(row.get(cle) for row in chunk)
+    if any(len(par_cle[valeur]) != nombre for valeur, nombre in attendus.items()):
+        raise IdsAmbigus(f"Concurrent insert into {table.name}, retry")
+    return [par_cle[row.get(cle)].popleft() for row in chunk]
+
+
+def inserer(db: Session, model, rows: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> List[int]:
+    """
+    Insère les lignes par lots de chunk_size (un executemany par lot) et retourne leurs ids,
+    dans l'ordre.
+
+    - Bases qui gardent l'ordre de RETURNING en executemany (MariaDB) : ids renvoyés par lot
+    - SQLite : sans colonne sentinelle, RETURNING ordonné repasserait à un INSERT par ligne ;
+      un seul écrivain à la fois, les rowid d'un lot sont donc consécutifs et finissent
+      à last_insert_rowid()
+    - MySQL : ids relus par la clé de CLES_RELECTURE, au-delà du plus grand id lu avant le lot
+    - Table sans clé de relecture : un INSERT par ligne (dernier recours, signalé)
+
+    Raises:
+        IdsAmbigus: une écriture concurrente empêche d'attribuer les ids
+    """
+    table = model.__table__
+    pk = model.__mapper__.primary_key[0]
+    dialect = db.get_bind().dialect
+    sqlite = dialect.name == "sqlite"
+    returning = dialect.insert_executemany_returning and not sqlite
+    cle = CLES_RELECTURE.get(table.name)
+    if not returning and not sqlite and cle is None:
+        logger.warning("Bulk : pas de clé de relecture pour %s, un INSERT par ligne", table.name)
+
+    ids: List[int] = []
+    for chunk in _lots(rows, chunk_size):
+        if returning:
+            result = db.execute(insert(table).returning(pk, sort_by_parameter_order=True), chunk)
+            ids.extend(result.scalars().all())
+        elif sqlite:
+            db.execute(insert(table), chunk)
+            dernier = db.execute(text("SELECT last_insert_rowid()")).scalar()
+            ids.extend(range(dernier - len(chunk) + 1, dernier + 1))
+        elif cle is not None:
+            borne = db.execute(select(func.coalesce(func.max(pk), 0))).scalar()
+            db.execute(insert(table), chunk)
+            ids.extend(_relire_ids(db, table, pk, cle, chunk, borne))
+        else:
+            ids.extend(db.execute(insert(table).values(row)).lastrowid for row in chunk)
+    return ids
+
+
+def upsert(
+    db: Session, model, key: str, rows: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE
+) -> Tuple[List[int], int, int]:
+    """
+    Met à jour les lignes dont la clé `key` existe déjà, insère les autres.
+    Une clé présente plusieurs fois dans `rows` : la dernière occurrence l'emporte.
+    Une clé présente sur plusieurs lignes en base : la plus ancienne est mise à jour.
+
+    Returns:
+        (ids dans l'ordre de `rows`, nombre de lignes créées, nombre de lignes mises à jour)
+    """
+    pk = model.__mapper__.primary_key[0]
+    column = getattr(model, key)
+    # Tables versionnées : l'UPDATE par clé primaire attend la version courante et l'incrémente
+    version = model.__mapper__.version_id_col
+
+    uniques: Dict[Any, Dict[str, Any]] = {}
+    for row in rows:
+        uniques[row[key]] = row
+
+    ids_par_cle: Dict[Any, int] = {}
+    created = updated = 0
+    for chunk in _lots(list(uniques.values()), chunk_size):
+        cles = [row[key] for row in chunk]
+        colonnes = [column, pk] if version is None else [column, pk, version]
+        lignes = db.execute(select(*colonnes).where(column.in_(cles)).order_by(pk.desc())).all()
+        existants = {ligne[0]: ligne[1] for ligne in lignes}
+        versions = {ligne[1]: ligne[2] for ligne in lignes} if version is not None else {}
+
+        a_modifier = [{pk.key: existants[row[key]], **row} for row in chunk if row[key] in existants]
+        if version is not None:
+            for row in a_modifier:
+                row[version.key] = versions[row[pk.key]]
+        a_creer = [row for row in chunk if row[key] not in existants]
+        if a_modifier:
+            # UPDATE ORM par clé primaire : un executemany
+            db.execute(update(model), a_modifier)
+        new_ids = inserer(db, model, a_creer, chunk_size) if a_creer else []
+
+        ids_par_cle.update(existants)
+        ids_par_cle.update((row[key], new_id) for row, new_id in zip(a_creer, new_ids))
+        created += len(a_creer)
+        updated += len(a_modifier)
+
+    return [ids_par_cle[row[key]] for row in rows], created, updated
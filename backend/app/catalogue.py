@@ -0,0 +1,194 @@
+"""
+Requêtes du catalogue
+- Recherche plein texte sur titre, auteur et résumé (index FULLTEXT MySQL)
+- Lecture des livres trouvés par l'index trigrammes
+- Disponibilité d'une page de livres en une requête agrégée
+- Page du catalogue enrichie (catégorie, exemplaires) en une requête, par curseur
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Float, and_, case, distinct, func, literal, or_, select, type_coerce
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+
+from . import connexions
+from . import models
+from . import pagination
+
+# Colonnes renvoyées par la recherche (schéma LivreResponse)
+COLONNES_LIVRE = [c for c in models.Livre.__table__.columns]
+
+# Colonnes des livres de GET /livres/catalogue, sans la version de ligne
+COLONNES_CATALOGUE = [c for c in COLONNES_LIVRE if c.name != "version"]
+# Clés de tri de GET /livres/catalogue (celles de GET /livres/)
+TRIS_CATALOGUE = ["titre", "auteur", "annee_publication"]
+
+
+def score_recherche(db: Session, q: str):
+    """
+    Expression de pertinence pour la recherche `q`.
+    MySQL : MATCH ... AGAINST sur l'index FULLTEXT (collation insensible aux accents).
+    SQLite : LIKE sur le texte replié (casse et accents, comme la collation MySQL),
+    score constant : l'ordre de pertinence n'est pas reproduit.
+    Autres bases : correspondance LIKE, score constant (développement uniquement).
+    """
+    if db.get_bind().dialect.name == "mysql":
+        expr = match(
+            models.Livre.titre, models.Livre.auteur, models.Livre.resume, against=q
+        ).in_natural_language_mode()
+        # Arrondi : la valeur du curseur doit se relire à l'identique dans le prédicat
+        return type_coerce(func.round(expr, 6), Float), expr > 0
+
+    pattern = f"%{q}%"
+    if db.get_bind().dialect.name == "sqlite":
+        # replier() est enregistrée à la connexion (connexions.configurer_sqlite)
+        pattern = f"%{connexions.replier(q)}%"
+        colonnes = (models.Livre.titre, models.Livre.auteur, models.Livre.resume)
+        condition = or_(*(func.replier(c).like(pattern) for c in colonnes))
+        return type_coerce(literal(1.0), Float), condition
+
+    condition = or_(
+        models.Livre.titre.ilike(pattern),
+        models.Livre.auteur.ilike(pattern),
+        models.Livre.resume.ilike(pattern),
+    )
+    return type_coerce(literal(1.0), Float), condition
+
+
+def rechercher_livres(
+    db: Session, q: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Livres correspondant à `q`, du plus pertinent au moins pertinent,
+    paginés par curseur sur (score, livre_id).
+
+    Returns:
+        (lignes de la page, curseur de la page suivante ou None)
+
+    Raises:
+        pagination.InvalidCursor: si le curseur ne correspond pas à cette recherche
+    """
+    score, condition = score_recherche(db, q)
+    pk = models.Livre.livre_id
+    sort_spec = f"search:{q}"
+    after = pagination.decode_cursor(cursor, sort_spec, [score, pk]) if cursor else None
+
+    stmt = select(*COLONNES_LIVRE, score.label("score")).where(condition)
+    stmt = pagination.seek(stmt, pk, score, True, after)
+    rows = db.execute(stmt.limit(limit + 1)).all()
+    return pagination.split_page(rows, limit, sort_spec, lambda last: [last.score, last.livre_id])
+
+
+def livres_par_ids(db: Session, livre_ids: List[int]) -> Dict[int, Any]:
+    """Lignes des livres demandés, par livre_id (les livres supprimés entre-temps sont absents)"""
+    if not livre_ids:
+        return {}
+    rows = db.execute(select(*COLONNES_LIVRE).where(models.Livre.livre_id.in_(livre_ids))).all()
+    return {row.livre_id: row for row in rows}
+
+
+def _select_disponibilite(livre_ids: List[int]):
+    """
+    Exemplaires, exemplaires disponibles et prochain retour prévu par livre, en une requête.
+    Les deux index sont couvrants : exemplaires(livre_id, disponible, etat_id) porte la clé
+    primaire, emprunts(exemplaire_id, date_retour_effectue, date_retour_prevu) la jointure
+    sur les emprunts en cours et la date agrégée.
+    """
+    exemplaire, emprunt = models.Exemplaire, models.Emprunt
+    return (
+        select(
+            exemplaire.livre_id,
+            func.count(distinct(exemplaire.exemplaire_id)).label("exemplaires"),
+            func.count(
+                distinct(case((exemplaire.disponible.is_(True), exemplaire.exemplaire_id)))
+            ).label("disponibles"),
+            func.min(emprunt.date_retour_prevu).label("prochain_retour"),
+        )
+        .outerjoin(
+            emprunt,
+            and_(
+                emprunt.exemplaire_id == exemplaire.exemplaire_id,
+                emprunt.date_retour_effectue.is_(None),  # Emprunts en cours
+            ),
+        )
+        .where(exemplaire.livre_id.in_(livre_ids))
+        .group_by(exemplaire.livre_id)
+    )
+
+
+def disponibilite(db: Session, livre_ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    Disponibilité des livres demandés, dans l'ordre de `livre_ids`.
+    Un livre sans exemplaire (ou inexistant) a 0 exemplaire et pas de retour prévu.
+    """
+    if not livre_ids:
+        return []
+    rows = {row.livre_id: row for row in db.execute(_select_disponibilite(livre_ids))}
+    resultat = []
+    for livre_id in livre_ids:
+        row = rows.get(livre_id)
+        resultat.append({
+            "livre_id": livre_id,
+            "exemplaires": row.exemplaires if row else 0,
+            "disponibles": row.disponibles if row else 0,
+            "prochain_retour": row.prochain_retour if row else None,
+        })
+    return resultat
+
+
+def _select_page_catalogue(
+    limit: int, sort_column=None, descending: bool = False, after: Optional[List[Any]] = None
+):
+    """
+    Page du catalogue en une requête : la page de livres est choisie par curseur dans une
+    table dérivée (LIMIT), puis jointe à sa catégorie et agrégée sur ses seuls exemplaires
+    (index exemplaires(livre_id, disponible, etat_id)). Le coût ne dépend pas de la profondeur.
+    """
+    pk = models.Livre.livre_id
+    page = pagination.seek(select(*COLONNES_CATALOGUE), pk, sort_column, descending, after)
+    page = page.limit(limit + 1).subquery("page")
+    colonnes = [page.c[c.name] for c in COLONNES_CATALOGUE]
+    exemplaire, categorie = models.Exemplaire, models.Categorie
+    stmt = (
+        select(
+            *colonnes,
+            categorie.nom.label("categorie"),
+            func.count(exemplaire.exemplaire_id).label("exemplaires"),
+            func.count(case((exemplaire.disponible.is_(True), exemplaire.exemplaire_id))).label("disponibles"),
+        )
+        .select_from(page)
+        .outerjoin(categorie, categorie.categorie_id == page.c.categorie_id)
+        .outerjoin(exemplaire, exemplaire.livre_id == page.c.livre_id)
+        .group_by(*colonnes, categorie.nom)
+    )
+    tri = page.c[sort_column.name] if sort_column is not None else None
+    return pagination.seek(stmt, page.c.livre_id, tri, descending)
+
+
+def page_catalogue(
+    db: Session, limit: int, sort: Optional[str] = None, cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Livres avec le nom de leur catégorie, leurs exemplaires et leur disponibilité,
+    triés par `sort` (comme GET /livres/) puis livre_id, paginés par curseur.
+
+    Returns:
+        (livres au format LivreCatalogueResponse, curseur de la page suivante ou None)
+
+    Raises:
+        ValueError: clé de tri non autorisée
+        pagination.InvalidCursor: si le curseur ne correspond pas à ce tri
+    """
+    sort_name, descending = pagination.parse_sort(sort, TRIS_CATALOGUE)
+    sort_column = models.Livre.__table__.c[sort_name] if sort_name else None
+    seek_columns = [sort_column, models.Livre.livre_id] if sort_column is not None else [models.Livre.livre_id]
+    sort_spec = f"catalogue:{sort or ''}"
+    after = pagination.decode_cursor(cursor, sort_spec, seek_columns) if cursor else None
+
+    rows = db.execute(_select_page_catalogue(limit, sort_column, descending, after)).all()
+    rows, next_cursor = pagination.split_page(
+        rows, limit, sort_spec, lambda last: [getattr(last, c.name) for c in seek_columns]
+    )
+    # Clés dans l'ordre du schéma : le JSON est écrit sans passer par Pydantic
+    return [{**row._mapping, "disponible": row.disponibles > 0} for row in rows], next_cursor
@@ -0,0 +1,269 @@
+"""
+Pool de connexions : réglages et statistiques
+
+Les réglages (taille, débordement, attente max, recyclage, pre-ping) s'appliquent
+à tous les moteurs MySQL de database.py. Chaque moteur utilise une sous-classe de QueuePool
+qui chronomètre l'obtention d'une connexion : les attentes au-delà de
+DB_POOL_SLOW_WAIT_MS sont journalisées, et /admin/db-pool publie l'état courant
+(connexions prêtées, débordement) avec les temps d'attente cumulés.
+
+Base SQLite (DATABASE_URL=sqlite:///...) : journal WAL et pragmas posés à chaque
+connexion, une connexion par thread de travail (voir options()).
+"""
+
+import logging
+import os
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+
+logger = logging.getLogger(__name__)
+
+# Connexions gardées ouvertes, et connexions supplémentaires fermées au retour.
+# Ensemble, au moins les 40 jetons du threadpool AnyIO (voir benchmarks/bench_pool.py)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# Attente max d'une connexion libre avant l'erreur (s)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Âge max d'une connexion (s), sous le wait_timeout de MySQL ; -1 pour désactiver
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# SELECT 1 à chaque emprunt : une connexion coupée par MySQL est remplacée sans erreur
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Attente au-delà de laquelle l'emprunt d'une connexion est journalisé (ms)
+DB_POOL_SLOW_WAIT_MS = float(os.getenv("DB_POOL_SLOW_WAIT_MS", "100"))
+
+# SQLite : une connexion par jeton du threadpool AnyIO, aucune n'est partagée en cours d'usage
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "40"))
+# Attente d'un verrou d'écriture tenu par une autre connexion avant "database is locked" (ms)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# NORMAL en WAL : pas de fsync à chaque commit, la base reste cohérente après un crash
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+# Cache de pages par connexion (Kio) et fichier projeté en mémoire (octets)
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "32768"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Bornes (en secondes) de l'histogramme des temps d'attente
+POOL_WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolMetrics:
+    """Compteurs d'un pool (lus par /admin/db-pool)"""
+
+    def __init__(self, nom: str):
+        self.nom = nom
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.slow_waits = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_seconds = 0.0
+        self.wait_seconds_max = 0.0
+        self.buckets = [0] * (len(POOL_WAIT_BUCKETS) + 1)
+
+    def observe(self, waited: float) -> None:
+        with self.lock:
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            for i, bound in enumerate(POOL_WAIT_BUCKETS):
+                if waited <= bound:
+                    self.buckets[i] += 1
+                    break
+            else:
+                self.buckets[-1] += 1
+
+    def snapshot(self, pool: QueuePool) -> Dict[str, Any]:
+        with self.lock:
+            checkouts = self.checkouts or 1
+            return {
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "slow_waits": self.slow_waits,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "avg_wait_ms": round(self.wait_seconds / checkouts * 1000, 3),
+                "max_wait_ms": round(self.wait_seconds_max * 1000, 2),
+                "wait_buckets": {
+                    **{f"le_{b}": n for b, n in zip(POOL_WAIT_BUCKETS, self.buckets)},
+                    "le_inf": self.buckets[-1],
+                },
+            }
+
+
+class _Chronometre:
+    """Mesure le temps passé dans _do_get : file d'attente, débordement, ouverture"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics("pool")
+
+    def recreate(self):
+        # engine.dispose() remplace le pool : les compteurs suivent
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            with self.metrics.lock:
+                self.metrics.timeouts += 1
+            logger.warning(
+                "Pool %s : aucune connexion libre après %.1f s (%d prêtées)",
+                self.metrics.nom, time.perf_counter() - start, self.checkedout(),
+            )
+            raise
+        waited = time.perf_counter() - start
+        self.metrics.observe(waited)
+        if waited * 1000 >= DB_POOL_SLOW_WAIT_MS:
+            with self.metrics.lock:
+                self.metrics.slow_waits += 1
+            logger.warning(
+                "Pool %s : connexion obtenue après %.0f ms (%d prêtées, débordement %d)",
+                self.metrics.nom, waited * 1000, self.checkedout(), max(0, self.overflow()),
+            )
+        return connection
+
+
+class TimedQueuePool(_Chronometre, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_Chronometre, AsyncAdaptedQueuePool):
+    pass
+
+
+# Moteurs suivis, par nom (le pool est relu à chaque fois : dispose() le remplace)
+_moteurs: Dict[str, Any] = {}
+
+
+def est_sqlite(url) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def options(asynchrone: bool = False, url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Arguments de create_engine / create_async_engine pour les réglages du pool.
+
+    SQLite (fichier) : SQLITE_POOL_SIZE connexions sans débordement ni pre-ping ; une
+    connexion passe d'un thread à l'autre entre deux emprunts, jamais pendant
+    (check_same_thread=False). SQLite en mémoire : une connexion unique.
+    """
+    if url is not None and est_sqlite(url):
+        if make_url(url).database in (None, "", ":memory:"):
+            return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+        return {
+            "poolclass": TimedAsyncAdaptedQueuePool if asynchrone else TimedQueuePool,
+            "pool_size": SQLITE_POOL_SIZE,
+            "max_overflow": 0,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": -1,
+            "pool_pre_ping": False,
+            "connect_args": {"check_same_thread": False},
+        }
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if asynchrone else TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def replier(texte: Optional[str]) -> Optional[str]:
+    """Texte sans casse ni accents, comme la collation utf8mb4_0900_ai_ci de MySQL"""
+    if texte is None:
+        return None
+    decompose = unicodedata.normalize("NFKD", texte.casefold())
+    return "".join(c for c in decompose if not unicodedata.combining(c))
+
+
+def configurer_sqlite(engine):
+    """
+    Pragmas posés à chaque nouvelle connexion SQLite (moteur sync ou async) :
+    journal WAL (les lectures ne bloquent plus les écritures), clés étrangères
+    vérifiées comme InnoDB, attente des verrous, cache et mmap ; fonction SQL
+    replier() pour la recherche insensible aux accents.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if sync_engine.dialect.name != "sqlite":
+        return engine
+    memoire = sync_engine.url.database in (None, "", ":memory:")
+
+    @event.listens_for(sync_engine, "connect")
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not memoire:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.close()
+        dbapi_connection.create_function("replier", 1, replier, deterministic=True)
+
+    return engine
+
+
+def surveiller(engine, nom: str):
+    """Rattache les compteurs au pool du moteur (sync ou async) et le retourne"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    pool = sync_engine.pool
+    if not isinstance(pool, _Chronometre):
+        return engine
+    pool.metrics.nom = nom
+
+    @event.listens_for(pool, "connect")
+    def _connect(dbapi_connection, connection_record):
+        metrics = sync_engine.pool.metrics
+        with metrics.lock:
+            metrics.connects += 1
+
+    @event.listens_for(pool, "invalidate")
+    def _invalidate(dbapi_connection, connection_record, exception):
+        metrics = sync_engine.pool.metrics
+        with metrics.lock:
+            metrics.invalidations += 1
+        if exception is not None:
+            logger.info("Pool %s : connexion invalidée (%s)", nom, exception)
+
+    _moteurs[nom] = sync_engine
+    return engine
+
+
+def pools() -> Iterator[Tuple[str, QueuePool]]:
+    """(nom, pool courant) de chaque moteur suivi"""
+    for nom, sync_engine in list(_moteurs.items()):
+        yield nom, sync_engine.pool
+
+
+def snapshot() -> Dict[str, Any]:
+    """État et compteurs de chaque pool suivi"""
+    return {
+        "settings": {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+            "slow_wait_ms": DB_POOL_SLOW_WAIT_MS,
+        },
+        "pools": {nom: pool.metrics.snapshot(pool) for nom, pool in pools()},
+    }
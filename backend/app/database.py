@@ -1,25 +1,198 @@
 import os
+import time
+from typing import Union
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from . import connexions
 
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = "db"
-DB_PORT = "3306"
+DB_HOST = os.getenv("DB_HOST", "db")
+DB_PORT = os.getenv("DB_PORT", "3306")
 DB_DATABASE = os.getenv("DB_DATABASE")
 
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_DATABASE}"
+# Réplique pour les lectures, par hôte MySQL ou URL complète DB_REPLICA_URL
+# (vide : toutes les requêtes vont au primaire)
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST", "")
+DB_REPLICA_PORT = os.getenv("DB_REPLICA_PORT", DB_PORT)
+# Durée pendant laquelle un client qui vient d'écrire lit sur le primaire (read-your-writes)
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+PRIMARY_PIN_COOKIE = "db_primary_until"
+
+
+def _url(driver: str, host: str, port: str) -> str:
+    return f"mysql+{driver}://{DB_USER}:{DB_PASSWORD}@{host}:{port}/{DB_DATABASE}"
+
+
+# Pilote de la pile async pour chaque pilote sync
+PILOTES_ASYNC = {"mysql": "aiomysql", "sqlite": "aiosqlite"}
+
+
+def _url_async(url: str) -> str:
+    """URL du moteur async : même base, pilote aiomysql ou aiosqlite"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    url = url.set(drivername=f"{backend}+{PILOTES_ASYNC[backend]}")
+    return url.render_as_string(hide_password=False)
+
+
+# URL complète (ex. sqlite:///bibliotheque.db) : remplace DB_USER, DB_HOST... ;
+# sinon MySQL sur DB_HOST:DB_PORT
+DATABASE_URL = os.getenv("DATABASE_URL") or _url("pymysql", DB_HOST, DB_PORT)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _url_async(DATABASE_URL)
+REPLICA_DATABASE_URL = os.getenv("DB_REPLICA_URL") or (
+    _url("pymysql", DB_REPLICA_HOST, DB_REPLICA_PORT) if DB_REPLICA_HOST else ""
+)
+REPLICA_ENABLED = bool(REPLICA_DATABASE_URL)
+ASYNC_REPLICA_DATABASE_URL = _url_async(REPLICA_DATABASE_URL) if REPLICA_ENABLED else ""
+
+# Clé de Session.info : session ouverte sur la réplique, en lecture seule
+REPLICA = "replica"
+
+# Choix de la pile : sessions sync (threadpool) ou async (boucle asyncio)
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+
 
-engine = create_engine(DATABASE_URL)
+def _moteur(url: str, nom: str, asynchrone: bool = False):
+    """
+    Moteur sync ou async : réglages du pool (taille, débordement, recyclage, pre-ping)
+    et pragmas SQLite, voir connexions.py
+    """
+    creer = create_async_engine if asynchrone else create_engine
+    engine = creer(url, **connexions.options(asynchrone=asynchrone, url=url))
+    return connexions.surveiller(connexions.configurer_sqlite(engine), nom)
+
+
+engine = _moteur(DATABASE_URL, "primaire")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Le moteur async n'est créé que s'il est utilisé (aiomysql ou aiosqlite est alors requis)
+async_engine = _moteur(ASYNC_DATABASE_URL, "primaire_async", asynchrone=True) if DB_ASYNC else None
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    if DB_ASYNC
+    else None
+)
+
+# Sessions de lecture : sur la réplique si elle est configurée, sinon sur le primaire
+if REPLICA_ENABLED:
+    replica_engine = _moteur(REPLICA_DATABASE_URL, "replique")
+    ReplicaSessionLocal = sessionmaker(
+        autocommit=False, autoflush=False, bind=replica_engine, info={REPLICA: True}
+    )
+    async_replica_engine = (
+        _moteur(ASYNC_REPLICA_DATABASE_URL, "replique_async", asynchrone=True) if DB_ASYNC else None
+    )
+    AsyncReplicaSessionLocal = (
+        async_sessionmaker(
+            async_replica_engine, autoflush=False, expire_on_commit=False, info={REPLICA: True}
+        )
+        if DB_ASYNC
+        else None
+    )
+else:
+    replica_engine = async_replica_engine = None
+    ReplicaSessionLocal = SessionLocal
+    AsyncReplicaSessionLocal = AsyncSessionLocal
+
 Base = declarative_base()
 
+# Session de l'une ou l'autre pile, selon DB_ASYNC
+DbSession = Union[Session, AsyncSession]
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Dependency used by the routes: follows the DB_ASYNC setting
+get_session = get_async_db if DB_ASYNC else get_db
+
+
+# --- Routage primaire / réplique ---
+
+
+def lit_sur_primaire(request: Request) -> bool:
+    """Vrai si le client a écrit il y a moins de READ_YOUR_WRITES_SECONDS (cookie posé à l'écriture)"""
+    try:
+        return float(request.cookies.get(PRIMARY_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+# Dependency for read-only routes: replica, unless the client just wrote
+def get_read_db(request: Request):
+    db = SessionLocal() if lit_sur_primaire(request) else ReplicaSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    factory = AsyncSessionLocal if lit_sur_primaire(request) else AsyncReplicaSessionLocal
+    async with factory() as db:
+        yield db
+
+
+get_read_session = get_async_read_db if DB_ASYNC else get_read_db
+
+
+class ReadYourWritesMiddleware:
+    """
+    Middleware ASGI : après une écriture réussie (méthode autre que GET/HEAD/OPTIONS,
+    statut < 400), pose le cookie qui envoie les lectures du client sur le primaire
+    pendant READ_YOUR_WRITES_SECONDS, le temps que la réplique rattrape son retard.
+    """
+
+    LECTURES = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in self.LECTURES:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_avec_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                jusqu_a = time.time() + READ_YOUR_WRITES_SECONDS
+                cookie = (
+                    f"{PRIMARY_PIN_COOKIE}={jusqu_a:.3f}; Max-Age={READ_YOUR_WRITES_SECONDS}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())],
+                }
+            await send(message)
+
+        await self.app(scope, receive, send_avec_cookie)
+
+
+async def run_db(db: DbSession, fn, *args, **kwargs):
+    """
+    Exécute fn(session, *args) sur la session fournie.
+    - Pile async : via run_sync, sans occuper de thread pendant l'attente MySQL
+    - Pile sync : dans le threadpool, comme un handler `def` classique
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
@@ -0,0 +1,218 @@
+"""
+Prêt et retour d'un exemplaire, chacun en une transaction courte
+- Prêt (POST /emprunts/checkout) : exemplaire demandé, ou le meilleur exemplaire
+  disponible d'un livre (ordre des états), verrouillé par SELECT ... ORDER BY
+  exemplaire_id LIMIT 1 FOR UPDATE SKIP LOCKED : deux guichets ne prêtent jamais
+  le même exemplaire, et un guichet ne patiente pas derrière un autre
+- Retour (POST /emprunts/{id}/retour) : date de retour, statut à temps / en retard,
+  exemplaire libéré ; rejouer un retour déjà enregistré ne change rien
+- Emprunt et exemplaire modifiés dans le même commit ; digest des notifications de
+  l'emprunteur rafraîchi après le commit, hors des verrous ; ids des statuts lus dans
+  le référentiel en mémoire
+"""
+
+import logging
+import os
+from datetime import date, timedelta
+from typing import Iterator, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from . import models
+from . import notifications
+from .referentiel import registre
+
+logger = logging.getLogger(__name__)
+
+# Durée d'un prêt quand la date de retour n'est pas fournie (jours)
+EMPRUNT_DUREE_JOURS = int(os.getenv("EMPRUNT_DUREE_JOURS", "21"))
+# États des exemplaires, du meilleur au moins bon (noms de initdb.py)
+ORDRE_ETATS = ["Neuf", "Très bon", "Bon", "Acceptable", "Abîmé", "Très abîmé"]
+STATUT_EN_COURS = "En cours"
+STATUT_RENDU_A_TEMPS = "Rendu à temps"
+STATUT_RENDU_EN_RETARD = "Rendu en retard"
+
+
+class ExemplaireIntrouvable(LookupError):
+    """L'exemplaire demandé n'existe pas"""
+
+
+class LivreIntrouvable(LookupError):
+    """Le livre demandé n'existe pas"""
+
+
+class ExemplaireIndisponible(Exception):
+    """Aucun exemplaire disponible (déjà prêté, ou verrouillé par un autre prêt en cours)"""
+
+
+class EmpruntIntrouvable(LookupError):
+    """L'emprunt demandé n'existe pas"""
+
+
+def _id_statut(nom: str) -> int:
+    statut_id = registre.id("statuts", nom)
+    if statut_id is None:
+        raise RuntimeError(f"Statut '{nom}' absent de la table statuts (lancer initdb.py)")
+    return statut_id
+
+
+def _selections(livre_id: int) -> Iterator:
+    """
+    Exemplaires disponibles du livre, un état après l'autre du meilleur au moins bon,
+    puis les états inconnus de ORDRE_ETATS. Chaque requête suit l'index
+    (livre_id, disponible, etat_id) : verrouillée avec LIMIT 1, elle s'arrête au premier
+    exemplaire libre sans verrouiller les autres (un tri sur le rang de l'état
+    verrouillerait tous les exemplaires lus).
+    """
+    exemplaire = models.Exemplaire
+    disponibles = select(exemplaire).where(
+        exemplaire.livre_id == livre_id, exemplaire.disponible.is_(True)
+    )
+    connus = []
+    for nom in ORDRE_ETATS:
+        etat_id = registre.id("etats", nom)
+        if etat_id is not None:
+            connus.append(etat_id)
+            yield disponibles.where(exemplaire.etat_id == etat_id)
+    yield disponibles.where(or_(exemplaire.etat_id.is_(None), exemplaire.etat_id.not_in(connus)))
+
+
+def _verrouiller(db: Session, stmt) -> Optional[models.Exemplaire]:
+    """
+    Verrouille le premier exemplaire de la requête, en ignorant sans attendre ceux
+    qu'un autre prêt a déjà verrouillés. SQLite ignore FOR UPDATE : le numéro de version
+    de la ligne détecte le conflit au flush.
+    """
+    stmt = (
+        stmt.order_by(models.Exemplaire.exemplaire_id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .execution_options(populate_existing=True)
+    )
+    return db.execute(stmt).scalar_one_or_none()
+
+
+def _premier_disponible(
+    db: Session, exemplaire_id: Optional[int], livre_id: Optional[int]
+) -> Optional[models.Exemplaire]:
+    if exemplaire_id is not None:
+        return _verrouiller(
+            db,
+            select(models.Exemplaire).where(
+                models.Exemplaire.exemplaire_id == exemplaire_id,
+                models.Exemplaire.disponible.is_(True),
+            ),
+        )
+    for stmt in _selections(livre_id):
+        exemplaire = _verrouiller(db, stmt)
+        if exemplaire is not None:
+            return exemplaire
+    return None
+
+
+def emprunter(
+    db: Session,
+    utilisateur_id: int,
+    exemplaire_id: Optional[int] = None,
+    livre_id: Optional[int] = None,
+    date_retour_prevu: Optional[date] = None,
+) -> models.Emprunt:
+    """
+    Prête l'exemplaire donné, ou le meilleur exemplaire disponible du livre donné, et valide.
+
+    Raises:
+        ExemplaireIntrouvable: l'exemplaire demandé n'existe pas
+        LivreIntrouvable: le livre demandé n'existe pas
+        ExemplaireIndisponible: aucun exemplaire ne peut être prêté
+        IntegrityError: utilisateur inconnu
+    """
+    today = date.today()
+    statut_id = _id_statut(STATUT_EN_COURS)
+
+    while (exemplaire := _premier_disponible(db, exemplaire_id, livre_id)) is not None:
+        emprunt = models.Emprunt(
+            exemplaire_id=exemplaire.exemplaire_id,
+            utilisateur_id=utilisateur_id,
+            date_emprunt=today,
+            date_retour_prevu=date_retour_prevu or today + timedelta(days=EMPRUNT_DUREE_JOURS),
+            statut_id=statut_id,
+        )
+        exemplaire.disponible = False
+        db.add(emprunt)
+        try:
+            db.flush()
+            # Détaché avant le commit : la réponse se sérialise sans relire la ligne
+            db.expunge(emprunt)
+            db.commit()
+        except StaleDataError:
+            # Sans verrou de ligne (SQLite) : un autre prêt de cet exemplaire a été validé
+            # avant ; l'exemplaire n'est plus disponible, la requête suivante en trouve un autre
+            db.rollback()
+            logger.info("Exemplaire %d prêté par une autre transaction, suivant", emprunt.exemplaire_id)
+            continue
+        notifications.apres_emprunts_valides(db, [utilisateur_id])
+        return emprunt
+
+    if exemplaire_id is not None and db.get(models.Exemplaire, exemplaire_id) is None:
+        raise ExemplaireIntrouvable(f"Exemplaire {exemplaire_id} not found")
+    if exemplaire_id is not None:
+        raise ExemplaireIndisponible(f"Exemplaire {exemplaire_id} is not available")
+    if db.get(models.Livre, livre_id) is None:
+        raise LivreIntrouvable(f"Livre {livre_id} not found")
+    raise ExemplaireIndisponible(f"No available copy of livre {livre_id}")
+
+
+def _lire_emprunt(db: Session, emprunt_id: int) -> models.Emprunt:
+    """Emprunt verrouillé jusqu'au commit : un retour rejoué attend le premier puis le voit rendu"""
+    stmt = (
+        select(models.Emprunt)
+        .where(models.Emprunt.emprunt_id == emprunt_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    emprunt = db.execute(stmt).scalar_one_or_none()
+    if emprunt is None:
+        raise EmpruntIntrouvable(f"Emprunt {emprunt_id} not found")
+    return emprunt
+
+
+def rendre(db: Session, emprunt_id: int) -> models.Emprunt:
+    """
+    Enregistre le retour de l'emprunt et libère l'exemplaire, puis valide.
+    Idempotent : un emprunt déjà rendu est renvoyé tel quel, sans écriture.
+
+    Raises:
+        EmpruntIntrouvable: l'emprunt n'existe pas
+        StaleDataError: l'emprunt a été modifié autrement pendant le retour
+    """
+    emprunt = _lire_emprunt(db, emprunt_id)
+    if emprunt.date_retour_effectue is None:
+        today = date.today()
+        en_retard = emprunt.date_retour_prevu is not None and today > emprunt.date_retour_prevu
+        emprunt.date_retour_effectue = today
+        emprunt.statut_id = _id_statut(STATUT_RENDU_EN_RETARD if en_retard else STATUT_RENDU_A_TEMPS)
+        try:
+            db.flush()
+            # Sans charger l'exemplaire ; la version change comme pour une écriture de l'ORM
+            db.execute(
+                update(models.Exemplaire)
+                .where(models.Exemplaire.exemplaire_id == emprunt.exemplaire_id)
+                .values(disponible=True, version=models.Exemplaire.version + 1)
+            )
+            db.expunge(emprunt)
+            db.commit()
+        except StaleDataError:
+            # Sans verrou de ligne (SQLite) : un retour simultané a été validé avant
+            db.rollback()
+            emprunt = _lire_emprunt(db, emprunt_id)
+            if emprunt.date_retour_effectue is None:
+                raise
+        else:
+            notifications.apres_emprunts_valides(db, [emprunt.utilisateur_id])
+            return emprunt
+    # Déjà rendu : fin de la transaction de lecture, l'emprunt reste lisible
+    db.expunge(emprunt)
+    db.rollback()
+    return emprunt
@@ -0,0 +1,62 @@
+"""
+ETags et GET conditionnels des routes CRUD
+- Élément : ETag fort "<id>.<version>", la colonne version étant incrémentée à chaque UPDATE
+- Page de liste : ETag faible, empreinte des couples (id, version) de la page et du curseur suivant
+- If-None-Match : comparaison faible (RFC 9110), 304 sans sérialiser le corps
+"""
+
+import hashlib
+from typing import Any, Iterable, Optional
+
+from fastapi import Response, status
+
+# Les caches (navigateur, nginx) gardent la réponse mais la revalident à chaque fois
+CACHE_CONTROL = "no-cache"
+
+
+def _cles(model) -> tuple:
+    mapper = model.__mapper__
+    return mapper.primary_key[0].key, mapper.version_id_col.key
+
+
+def etag_element(model, item: Any) -> str:
+    """ETag fort d'un élément (instance ORM ou ligne Core)"""
+    pk, version = _cles(model)
+    return f'"{getattr(item, pk)}.{getattr(item, version)}"'
+
+
+def etag_page(model, items: Iterable[Any], next_cursor: Optional[str] = None) -> str:
+    """ETag faible d'une page : change dès qu'un élément de la page est ajouté, retiré ou modifié"""
+    pk, version = _cles(model)
+    empreinte = hashlib.blake2b(digest_size=12)
+    for item in items:
+        empreinte.update(f"{getattr(item, pk)}.{getattr(item, version)},".encode())
+    empreinte.update((next_cursor or "").encode())
+    return f'W/"{empreinte.hexdigest()}"'
+
+
+def _opaque(etag: str) -> str:
+    return etag.strip().removeprefix("W/")
+
+
+def correspond(if_none_match: Optional[str], etag: str) -> bool:
+    """Vrai si l'en-tête If-None-Match désigne la représentation courante"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(candidat) for candidat in if_none_match.split(",")}
+
+
+def non_modifie(etag: str) -> Response:
+    """Réponse 304, sans corps"""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
+
+
+def marquer(response: Response, etag: str) -> None:
+    """Ajoute ETag et Cache-Control à la réponse 200"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
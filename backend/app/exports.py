@@ -0,0 +1,134 @@
+"""
+Export de l'historique des emprunts (audit) en NDJSON ou CSV
+- Une seule requête : emprunt, utilisateur, exemplaire et livre joints en SQL,
+  le nom du statut vient du référentiel en mémoire
+- Curseur côté serveur (stream_results) : MySQL envoie les lignes au fil de la lecture,
+  la mémoire reste bornée par la taille d'un lot quel que soit le nombre d'emprunts
+- Filtre sur la période d'emprunt, servi par l'index ix_emprunts_date_emprunt
+- Lu sur la réplique MySQL quand elle est configurée
+- Les lignes sont écrites par lots de texte, sans objets ORM ni modèles Pydantic
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+from datetime import date
+from typing import Iterator, Optional
+
+from sqlalchemy import select, text
+
+from . import models, referentiel
+from .database import engine, replica_engine
+
+logger = logging.getLogger(__name__)
+
+# Lignes lues puis écrites à la fois
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+# Secondes pendant lesquelles MySQL attend un client lent avant de couper le flux
+EXPORT_NET_WRITE_TIMEOUT = int(os.getenv("EXPORT_NET_WRITE_TIMEOUT", "600"))
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _select_emprunts(debut: Optional[date] = None, fin: Optional[date] = None):
+    """Emprunts de la période [debut, fin] (bornes incluses), dans l'ordre de l'index"""
+    emprunt = models.Emprunt
+    stmt = (
+        select(
+            emprunt.emprunt_id,
+            emprunt.date_emprunt,
+            emprunt.date_retour_prevu,
+            emprunt.date_retour_effectue,
+            # Nom du statut ajouté à l'écriture, depuis le référentiel
+            emprunt.statut_id.label("statut"),
+            emprunt.utilisateur_id,
+            models.Utilisateur.nom,
+            models.Utilisateur.prenom,
+            models.Utilisateur.email,
+            emprunt.exemplaire_id,
+            models.Livre.livre_id,
+            models.Livre.titre,
+            models.Livre.auteur,
+            models.Livre.isbn,
+        )
+        .outerjoin(models.Utilisateur, models.Utilisateur.utilisateurs_id == emprunt.utilisateur_id)
+        .outerjoin(models.Exemplaire, models.Exemplaire.exemplaire_id == emprunt.exemplaire_id)
+        .outerjoin(models.Livre, models.Livre.livre_id == models.Exemplaire.livre_id)
+        .order_by(emprunt.date_emprunt, emprunt.emprunt_id)
+    )
+    if debut is not None:
+        stmt = stmt.where(emprunt.date_emprunt >= debut)
+    if fin is not None:
+        stmt = stmt.where(emprunt.date_emprunt <= fin)
+    return stmt
+
+
+def _texte(valeur) -> object:
+    return valeur.isoformat() if isinstance(valeur, date) else valeur
+
+
+def _ndjson(colonnes, lignes) -> str:
+    return "".join(
+        json.dumps(dict(zip(colonnes, map(_texte, ligne))), ensure_ascii=False) + "\n"
+        for ligne in lignes
+    )
+
+
+def _nommer_statuts(lignes, position: int, statuts):
+    """Remplace l'id du statut par son nom"""
+    for ligne in lignes:
+        ligne = list(ligne)
+        ligne[position] = statuts.get(ligne[position])
+        yield ligne
+
+
+def exporter(
+    format: str,
+    debut: Optional[date] = None,
+    fin: Optional[date] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[bytes]:
+    """
+    Produit l'export par morceaux (un par lot de lignes), en-tête CSV compris.
+    Générateur synchrone : à itérer dans le threadpool (StreamingResponse le fait).
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported format '{format}', expected one of: {', '.join(FORMATS)}")
+
+    # Lecture longue sur la réplique si elle existe : le primaire reste aux écritures
+    conn = (replica_engine or engine).connect()
+    termine = False
+    try:
+        if conn.dialect.name == "mysql":
+            conn.execute(text(f"SET SESSION net_write_timeout = {EXPORT_NET_WRITE_TIMEOUT}"))
+        result = conn.execution_options(yield_per=batch_size).execute(_select_emprunts(debut, fin))
+        colonnes = list(result.keys())
+        position_statut = colonnes.index("statut")
+        statuts = referentiel.registre.elements("statuts")
+
+        if format == "csv":
+            tampon = io.StringIO()
+            writer = csv.writer(tampon, lineterminator="\n")
+            writer.writerow(colonnes)
+            for lignes in result.partitions():
+                writer.writerows(_nommer_statuts(lignes, position_statut, statuts))
+                yield tampon.getvalue().encode()
+                tampon.seek(0)
+                tampon.truncate()
+            if tampon.tell():
+                yield tampon.getvalue().encode()
+        else:
+            for lignes in result.partitions():
+                yield _ndjson(colonnes, _nommer_statuts(lignes, position_statut, statuts)).encode()
+        termine = True
+    finally:
+        if termine:
+            conn.close()
+        else:
+            # Client parti en cours de route : fermer le curseur côté serveur obligerait à lire
+            # toutes les lignes restantes, on abandonne la connexion à la place
+            logger.info("Export des emprunts interrompu, connexion abandonnée")
+            conn.invalidate()
+            conn.close()
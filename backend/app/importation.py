@@ -0,0 +1,257 @@
+"""
+Import du catalogue depuis un fichier fournisseur (CSV ou JSONL)
+- Lecture en flux : une ligne à la fois, le fichier n'est jamais chargé en entier
+- Une ligne = un livre et ses exemplaires (colonne `exemplaires`, 1 par défaut)
+- Catégorie et état donnés par leur nom, résolus par le référentiel en mémoire
+- Dédoublonnage sur l'ISBN : dans le fichier (lignes suivantes rejetées) et
+  en base (le livre existant reçoit les exemplaires)
+- Écriture par lots : livres puis exemplaires d'un lot dans une même transaction, chacun
+  en un INSERT multi-lignes (ids des livres relus par l'ISBN sur MySQL 8) ; un lot en
+  échec est annulé en entier et l'import continue
+- Événements de progression et d'erreur, consommés par la route et par le CLI
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import unicodedata
+from datetime import date
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import bulk, models, referentiel, schemas, trigrammes
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+FORMATS = ("csv", "jsonl")
+# État des exemplaires quand la colonne `etat` est absente ou vide
+ETAT_PAR_DEFAUT = "Neuf"
+
+
+def format_depuis_nom(nom_fichier: Optional[str]) -> Optional[str]:
+    """Déduit le format de l'extension du fichier (.csv, .jsonl, .ndjson)"""
+    extension = os.path.splitext(nom_fichier or "")[1].lower()
+    return {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}.get(extension)
+
+
+def _cle_nom(nom: str) -> str:
+    """Nom comparé sans casse ni accents ("Bande dessinée" == "bande dessinee")"""
+    decompose = unicodedata.normalize("NFKD", nom.strip().casefold())
+    return "".join(c for c in decompose if not unicodedata.combining(c))
+
+
+def _table_noms(table: str) -> Dict[str, int]:
+    """Nom normalisé -> id, depuis le référentiel en mémoire (la ligne la plus ancienne l'emporte)"""
+    lignes = sorted(referentiel.registre.elements(table).items(), reverse=True)
+    return {_cle_nom(nom): id_ for id_, nom in lignes if nom}
+
+
+# --- Lecture ---
+
+
+def _lire_csv(flux: BinaryIO) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    texte = io.TextIOWrapper(flux, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(texte)
+    try:
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, "Too many columns"
+                continue
+            yield reader.line_num, row, None
+    finally:
+        texte.detach()
+
+
+def _lire_jsonl(flux: BinaryIO) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    texte = io.TextIOWrapper(flux, encoding="utf-8-sig")
+    try:
+        for numero, ligne in enumerate(texte, 1):
+            if not ligne.strip():
+                continue
+            try:
+                row = json.loads(ligne)
+            except ValueError as e:
+                yield numero, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield numero, None, "Expected a JSON object"
+                continue
+            yield numero, row, None
+    finally:
+        texte.detach()
+
+
+def lire(flux: BinaryIO, format: str) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """Lignes du fichier : (numéro de ligne, valeurs ou None, erreur de lecture ou None)"""
+    if format == "csv":
+        return _lire_csv(flux)
+    if format == "jsonl":
+        return _lire_jsonl(flux)
+    raise ValueError(f"Unsupported format '{format}', expected one of: {', '.join(FORMATS)}")
+
+
+# --- Validation ---
+
+
+def _valider(
+    row: Dict[str, Any], categories: Dict[str, int], etats: Dict[str, int]
+) -> schemas.LivreImport:
+    """
+    Résout les noms de catégorie et d'état puis valide la ligne.
+
+    Raises:
+        ValueError: catégorie ou état inconnu, ou ligne invalide
+    """
+    # Cellules CSV vides = valeur absente
+    valeurs = {k.strip(): v for k, v in row.items() if k and v not in ("", None)}
+
+    if "categorie_id" not in valeurs:
+        nom = str(valeurs.pop("categorie", ""))
+        if _cle_nom(nom) not in categories:
+            raise ValueError(f"Unknown categorie '{nom}'")
+        valeurs["categorie_id"] = categories[_cle_nom(nom)]
+
+    nom_etat = str(valeurs.pop("etat", ETAT_PAR_DEFAUT))
+    if _cle_nom(nom_etat) not in etats:
+        raise ValueError(f"Unknown etat '{nom_etat}'")
+    valeurs["etat_id"] = etats[_cle_nom(nom_etat)]
+
+    if "isbn" in valeurs:
+        valeurs["isbn"] = str(valeurs["isbn"]).strip()
+    try:
+        return schemas.LivreImport(**valeurs)
+    except ValidationError as e:
+        raise ValueError(
+            "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+        )
+
+
+# --- Écriture ---
+
+
+def _ecrire_lot(db: Session, lot: List[Tuple[int, schemas.LivreImport]]) -> Tuple[int, int, int]:
+    """
+    Écrit un lot dans une transaction : livres absents de la base, puis exemplaires.
+
+    Returns:
+        (livres créés, livres déjà en base, exemplaires créés)
+    """
+    isbns = [ligne.isbn for _, ligne in lot]
+    existants = dict(
+        db.execute(
+            select(models.Livre.isbn, models.Livre.livre_id)
+            .where(models.Livre.isbn.in_(isbns))
+            .order_by(models.Livre.livre_id.desc())
+        ).all()
+    )
+
+    champs_livre = set(schemas.LivreCreate.model_fields)
+    nouveaux = [ligne for _, ligne in lot if ligne.isbn not in existants]
+    livres = [ligne.model_dump(include=champs_livre) for ligne in nouveaux]
+    ids = bulk.inserer(db, models.Livre, livres, len(livres) or 1)
+    livre_ids = {**existants, **{ligne.isbn: id_ for ligne, id_ in zip(nouveaux, ids)}}
+
+    today = date.today()
+    exemplaires = [
+        {
+            "livre_id": livre_ids[ligne.isbn],
+            "etat_id": ligne.etat_id,
+            "disponible": True,
+            "date_ajout": ligne.date_ajout or today,
+        }
+        for _, ligne in lot
+        for _ in range(ligne.exemplaires)
+    ]
+    if exemplaires:
+        db.execute(insert(models.Exemplaire.__table__), exemplaires)
+
+    # Index trigrammes, mis à jour au commit
+    trigrammes.on_livres_written(
+        db, [models.Livre(**livre, livre_id=id_) for livre, id_ in zip(livres, ids)]
+    )
+    db.commit()
+    return len(nouveaux), len(lot) - len(nouveaux), len(exemplaires)
+
+
+def importer(flux: BinaryIO, format: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Importe le fichier en flux et produit des événements :
+    - {"type": "erreur", "ligne": n, "message": ...} pour chaque ligne rejetée
+    - {"type": "erreur", "lignes": [premiere, derniere], "message": ...} pour un lot annulé
+    - {"type": "progression", ...compteurs} après chaque lot écrit
+    - {"type": "resume", ...compteurs} à la fin
+    """
+    compteurs = {
+        "lignes": 0,
+        "livres_crees": 0,
+        "livres_existants": 0,
+        "exemplaires_crees": 0,
+        "erreurs": 0,
+    }
+    # ISBN déjà vus dans le fichier -> numéro de ligne
+    vus: Dict[str, int] = {}
+    lot: List[Tuple[int, schemas.LivreImport]] = []
+
+    categories = _table_noms("categories")
+    # Les ids sont aussi acceptés tels quels
+    categories.update({str(id_): id_ for id_ in referentiel.registre.elements("categories")})
+    etats = _table_noms("etats")
+
+    db = SessionLocal()
+    try:
+
+        def _vider_lot():
+            premiere, derniere = lot[0][0], lot[-1][0]
+            try:
+                crees, existants, exemplaires = _ecrire_lot(db, lot)
+            except (SQLAlchemyError, bulk.IdsAmbigus) as e:
+                db.rollback()
+                logger.warning("Import : lot %d-%d annulé : %s", premiere, derniere, e)
+                for _, ligne in lot:
+                    vus.pop(ligne.isbn, None)
+                compteurs["erreurs"] += len(lot)
+                yield {
+                    "type": "erreur",
+                    "lignes": [premiere, derniere],
+                    "message": f"Chunk rolled back: {getattr(e, 'orig', e)}",
+                }
+            else:
+                compteurs["livres_crees"] += crees
+                compteurs["livres_existants"] += existants
+                compteurs["exemplaires_crees"] += exemplaires
+                yield {"type": "progression", **compteurs}
+            lot.clear()
+
+        for numero, row, erreur in lire(flux, format):
+            compteurs["lignes"] += 1
+            if erreur is None:
+                try:
+                    ligne = _valider(row, categories, etats)
+                    if ligne.isbn in vus:
+                        raise ValueError(f"Duplicate isbn '{ligne.isbn}' (line {vus[ligne.isbn]})")
+                except ValueError as e:
+                    erreur = str(e)
+            if erreur is not None:
+                compteurs["erreurs"] += 1
+                yield {"type": "erreur", "ligne": numero, "message": erreur}
+                continue
+
+            vus[ligne.isbn] = numero
+            lot.append((numero, ligne))
+            if len(lot) >= chunk_size:
+                yield from _vider_lot()
+
+        if lot:
+            yield from _vider_lot()
+    finally:
+        db.close()
+
+    yield {"type": "resume", **compteurs}
@@ -1,32 +1,129 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, File, Header, HTTPException, Query, Response, UploadFile, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session, joinedload
-from typing import List, Type, TypeVar, Optional
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, TimeoutError as PoolTimeout
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from typing import Callable, Dict, List, Tuple, Type, TypeVar, Optional
 from pydantic import BaseModel
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from jose import JWTError, jwt
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import json
+import orjson
 import os
+import secrets
+import threading
+import time
 
 from . import models, schemas
-from .database import engine, get_db, Base
-from .utils import verify_password, get_password_hash
+from .database import (
+    REPLICA_ENABLED,
+    Base,
+    DbSession,
+    ReadYourWritesMiddleware,
+    SessionLocal,
+    get_read_session,
+    get_session,
+    run_db,
+)
+from .utils import (
+    HASH_RETRY_AFTER,
+    MAX_BULK_UTILISATEURS,
+    HashingSaturated,
+    get_password_hash_async,
+    hash_metrics,
+    verify_password_async,
+)
+from . import bulk
+from . import catalogue
+from . import connexions
+from . import emprunts
+from . import etags
+from . import exports
+from . import importation
+from . import metriques
 from . import notifications
+from . import pagination
+from . import referentiel
+from . import serialisation
+from . import trigrammes
 
 # --- Configuration & Security ---
 SECRET_KEY = os.getenv("SECRET_KEY", "YOUR_SUPER_SECRET_KEY_CHANGE_IN_PRODUCTION")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Daily notification_digest rebuild inside the API process (disable when run from cron)
+NOTIFICATION_DIGEST_JOB = os.getenv("NOTIFICATION_DIGEST_JOB", "true").lower() in ("1", "true", "yes")
+
+# In-memory trigram index for /livres/fuzzy, loaded at startup
+TRIGRAM_INDEX = os.getenv("TRIGRAM_INDEX", "true").lower() in ("1", "true", "yes")
+
+# Prometheus metrics (GET /metrics) and the per-request instrumentation behind them
+METRICS = os.getenv("METRICS", "true").lower() in ("1", "true", "yes")
+# Static bearer token for the Prometheus scraper; without it /metrics needs a Bibliothecaire token
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 security = HTTPBearer()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(referentiel.charger_referentiel)
+    if TRIGRAM_INDEX:
+        await run_in_threadpool(trigrammes.charger_index)
+    digest_job = (
+        asyncio.create_task(notifications.job_digest_quotidien())
+        if NOTIFICATION_DIGEST_JOB
+        else None
+    )
+    yield
+    if digest_job:
+        digest_job.cancel()
+
+
 app = FastAPI(
     title="Library Management API",
     description="API de gestion de bibliothèque avec authentification JWT",
     version="1.0.0",
     openapi_version="3.1.0",
+    lifespan=lifespan,
 )
 
-Base.metadata.create_all(bind=engine)
+# Le schéma est géré par les migrations Alembic (alembic upgrade head)
+
+# Reads go to the replica; a client that just wrote is pinned to the primary for a few seconds
+if REPLICA_ENABLED:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+# Outermost: per-route count, latency and SQL time cover the whole request
+if METRICS:
+    app.add_middleware(metriques.MetriquesMiddleware)
+
+
+@app.exception_handler(HashingSaturated)
+async def hashing_saturated_handler(request, exc: HashingSaturated):
+    # Fail fast instead of queueing behind a login burst
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication service busy, retry later"},
+        headers={"Retry-After": str(HASH_RETRY_AFTER)},
+    )
+
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request, exc: PoolTimeout):
+    # No free DB connection within DB_POOL_TIMEOUT: logged and counted in /admin/db-pool
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database busy, retry later"},
+        headers={"Retry-After": "1"},
+    )
+
 
 ModelType = TypeVar("ModelType", bound=Base)
 SchemaType = TypeVar("SchemaType", bound=BaseModel)
@@ -45,13 +142,51 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+# Per-user token versions: a token is only accepted if its "ver" claim matches the version
+# column of its utilisateurs row, which the ORM bumps on every UPDATE (Versionne). Any write on
+# the user revokes the tokens already issued, in every worker and across restarts.
+# Cached per process for TOKEN_VERSION_TTL seconds: a revocation made through another worker
+# applies within that delay, a token newer than the cache re-reads the row at once.
+TOKEN_VERSION_TTL = float(os.getenv("TOKEN_VERSION_TTL", "5"))
+_token_versions: Dict[int, Tuple[Optional[int], float]] = {}
+_token_versions_lock = threading.Lock()
+
+
+def _read_token_version(user_id: int) -> Optional[int]:
+    with SessionLocal() as db:
+        return db.execute(
+            select(models.Utilisateur.version).where(models.Utilisateur.utilisateurs_id == user_id)
+        ).scalar_one_or_none()
+
+
+async def get_token_version(user_id: int, refresh: bool = False) -> Optional[int]:
+    """Current version of the user's row (None once deleted), from the cache when fresh"""
+    now = time.monotonic()
+    cached = _token_versions.get(user_id)
+    if cached is not None and not refresh and cached[1] > now:
+        return cached[0]
+    version = await run_in_threadpool(_read_token_version, user_id)
+    with _token_versions_lock:
+        _token_versions[user_id] = (version, now + TOKEN_VERSION_TTL)
+    return version
+
+
+def forget_token_version(user_id: int) -> None:
+    """Drop the cached version after a write on the user: this worker revokes at once"""
+    with _token_versions_lock:
+        _token_versions.pop(user_id, None)
+
+
 # --- Auth Dependencies ---
 
 
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-):
+) -> schemas.TokenData:
+    """
+    Authentifie la requête à partir des claims du token, sans requête SQL.
+    Les routes qui ont besoin de la ligne complète utilisent get_current_user_row.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -60,21 +195,48 @@ def get_current_user(
     try:
         token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
+        claims = schemas.TokenData(
+            email=payload.get("sub"),
+            utilisateurs_id=payload.get("uid"),
+            groupe_id=payload.get("gid"),
+            groupe=payload.get("grp"),
+            version=payload.get("ver", 0),
+        )
+    except (JWTError, ValueError):
         raise credentials_exception
 
-    # Fetch user and eager load the group to check permissions
-    user = (
-        db.query(models.Utilisateur)
-        .options(joinedload(models.Utilisateur.groupe))
-        .filter(models.Utilisateur.email == email)
-        .first()
-    )
-    if user is None:
+    # Current group name from the registry: a renamed group applies without a new login
+    if claims.groupe_id is not None:
+        claims.groupe = referentiel.registre.nom("groupes", claims.groupe_id)
+
+    if claims.email is None or claims.utilisateurs_id is None:
+        raise credentials_exception
+
+    # Revoked by a later write on the user; a token newer than the cache was issued meanwhile
+    version = await get_token_version(claims.utilisateurs_id)
+    if claims.version != version and (version is None or claims.version > version):
+        version = await get_token_version(claims.utilisateurs_id, refresh=True)
+    if claims.version != version:
         raise credentials_exception
+    return claims
+
+
+async def get_current_user_row(
+    claims: schemas.TokenData = Depends(get_current_user),
+    db: DbSession = Depends(get_session),
+) -> models.Utilisateur:
+    """Charge la ligne Utilisateur de l'appelant (uniquement pour les routes qui en ont besoin)"""
+
+    def _get(db: Session):
+        return db.get(models.Utilisateur, claims.utilisateurs_id)
+
+    user = await run_db(db, _get)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
@@ -82,12 +244,12 @@ class PermissionChecker:
     def __init__(self, allowed_groups: List[str]):
         self.allowed_groups = allowed_groups
 
-    def __call__(self, user: models.Utilisateur = Depends(get_current_user)):
+    async def __call__(self, user: schemas.TokenData = Depends(get_current_user)):
         # If no groups are specified, allow access (or default to stricter logic if preferred)
         if not self.allowed_groups:
             return user
 
-        if user.groupe and user.groupe.nom in self.allowed_groups:
+        if user.groupe in self.allowed_groups:
             return user
 
         raise HTTPException(
@@ -105,93 +267,108 @@ class PermissionChecker:
     tags=["Auth"],
     status_code=status.HTTP_201_CREATED,
 )
-def register(user_data: schemas.UtilisateurRegister, db: Session = Depends(get_db)):
+async def register(
+    user_data: schemas.UtilisateurRegister, db: DbSession = Depends(get_session)
+):
     """
     Inscription d'un nouvel utilisateur.
     Email doit être unique.
     Le mot de passe est automatiquement hashé.
     """
-    # Vérifier si l'email existe déjà
-    existing_user = (
-        db.query(models.Utilisateur)
-        .filter(models.Utilisateur.email == user_data.email)
-        .first()
-    )
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
-        )
 
-    # Vérifier que le département existe
-    departement = (
-        db.query(models.Departement)
-        .filter(models.Departement.departement_id == user_data.departement_id)
-        .first()
-    )
-    if not departement:
+    # Vérifier que le département et le groupe existent (référentiel en mémoire)
+    if not referentiel.registre.existe("departements", user_data.departement_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Departement not found"
         )
-
-    # Vérifier que le groupe existe
-    groupe = (
-        db.query(models.Groupe)
-        .filter(models.Groupe.groupe_id == user_data.groupe_id)
-        .first()
-    )
-    if not groupe:
+    if not referentiel.registre.existe("groupes", user_data.groupe_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Groupe not found"
         )
 
-    # Créer le nouvel utilisateur avec mot de passe hashé
-    new_user = models.Utilisateur(
-        nom=user_data.nom,
-        prenom=user_data.prenom,
-        email=user_data.email,
-        password=get_password_hash(user_data.password),
-        departement_id=user_data.departement_id,
-        groupe_id=user_data.groupe_id,
-    )
+    def _check(db: Session):
+        # Vérifier si l'email existe déjà
+        existing_user = (
+            db.query(models.Utilisateur)
+            .filter(models.Utilisateur.email == user_data.email)
+            .first()
+        )
+        if existing_user:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered",
+            )
+
+    await run_db(db, _check)
+
+    # Hash hors session, dans le pool bcrypt borné
+    password = await get_password_hash_async(user_data.password)
+
+    def _create(db: Session):
+        # Créer le nouvel utilisateur avec mot de passe hashé
+        new_user = models.Utilisateur(
+            nom=user_data.nom,
+            prenom=user_data.prenom,
+            email=user_data.email,
+            password=password,
+            departement_id=user_data.departement_id,
+            groupe_id=user_data.groupe_id,
+        )
 
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+        db.add(new_user)
+        db.commit()
+        db.refresh(new_user)
+        return new_user
 
-    return new_user
+    return await run_db(db, _create)
 
 
 @app.post("/login", response_model=schemas.Token, tags=["Auth"])
-def login_for_access_token(login_data: schemas.Login, db: Session = Depends(get_db)):
+async def login_for_access_token(
+    login_data: schemas.Login, db: DbSession = Depends(get_session)
+):
     """
     Connexion avec email et mot de passe.
     Retourne un token JWT Bearer.
     """
+
+    def _find(db: Session):
+        return (
+            db.query(models.Utilisateur)
+            .filter(models.Utilisateur.email == login_data.email)
+            .first()
+        )
+
     # Find user
-    user = (
-        db.query(models.Utilisateur)
-        .filter(models.Utilisateur.email == login_data.email)
-        .first()
-    )
+    user = await run_db(db, _find)
 
     # Check if user exists and password matches
-    if not user or not verify_password(login_data.password, user.password):
+    if not user or not await verify_password_async(login_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Create Token
+    # Create Token: the claims carry everything the permission checks need
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={
+            "sub": user.email,
+            "uid": user.utilisateurs_id,
+            "gid": user.groupe_id,
+            "grp": referentiel.registre.nom("groupes", user.groupe_id),
+            "ver": user.version,
+        },
+        expires_delta=access_token_expires,
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @app.get("/me", response_model=schemas.UtilisateurResponse, tags=["Auth"])
-def get_current_user_info(current_user: models.Utilisateur = Depends(get_current_user)):
+async def get_current_user_info(
+    current_user: models.Utilisateur = Depends(get_current_user_row),
+):
     """
     Récupère les informations de l'utilisateur connecté.
     """
@@ -209,11 +386,18 @@ def create_crud_routes(
     tag: str,
     write_groups: Optional[List[str]] = None,
     schema_update: Optional[Type[SchemaType]] = None,  # Nouveau paramètre
+    sort_keys: Optional[List[str]] = None,
+    on_write: Optional[Callable[[Session, List[ModelType]], None]] = None,
+    upsert_key: Optional[str] = None,
 ):
     """
     Generates CRUD routes.
     write_groups: List of group names allowed to POST, PUT, PATCH, DELETE.
     schema_update: Optional schema for PATCH with optional fields
+    sort_keys: Columns (non-null) the list route may be sorted on, besides the primary key
+    on_write: Called with the written items just before commit, in the same transaction
+        (for POST /bulk: detached instances built from the written rows)
+    upsert_key: Natural key column enabling POST /bulk?upsert=true
     """
 
     # Determine dependencies based on permissions
@@ -230,112 +414,308 @@ def create_crud_routes(
         dependencies=write_deps,
         status_code=status.HTTP_201_CREATED,
     )
-    def create_item(item: schema_create, db: Session = Depends(get_db)):
+    async def create_item(item: schema_create, db: DbSession = Depends(get_session)):
         item_data = item.model_dump()
 
         # Security: Hash password if creating a generic user via this route
         if model == models.Utilisateur and "password" in item_data:
-            # Vérifier email unique
-            if (
-                db.query(models.Utilisateur)
-                .filter(models.Utilisateur.email == item_data["email"])
-                .first()
-            ):
-                raise HTTPException(status_code=400, detail="Email already registered")
-            item_data["password"] = get_password_hash(item_data["password"])
-
-        db_item = model(**item_data)
-        db.add(db_item)
-        db.commit()
-        db.refresh(db_item)
-        return db_item
+
+            def _check_email(db: Session):
+                # Vérifier email unique
+                if (
+                    db.query(models.Utilisateur)
+                    .filter(models.Utilisateur.email == item_data["email"])
+                    .first()
+                ):
+                    raise HTTPException(
+                        status_code=400, detail="Email already registered"
+                    )
+
+            await run_db(db, _check_email)
+            item_data["password"] = await get_password_hash_async(item_data["password"])
+
+        def _create(db: Session):
+            db_item = model(**item_data)
+            db.add(db_item)
+            if on_write:
+                on_write(db, [db_item])
+            db.commit()
+            db.refresh(db_item)
+            return db_item
+
+        return await run_db(db, _create)
+
+    # Bulk create (POST): one validation pass, chunked executemany, one transaction
+    @app.post(
+        f"/{prefix}/bulk",
+        response_model=schemas.BulkResponse,
+        tags=[tag],
+        dependencies=write_deps,
+        status_code=status.HTTP_201_CREATED,
+    )
+    async def create_items_bulk(
+        items: List[schema_create],
+        upsert: bool = Query(
+            False,
+            description=f"Met à jour les lignes existantes ayant le même {upsert_key}"
+            if upsert_key
+            else "Non disponible pour cette ressource",
+        ),
+        chunk_size: int = Query(bulk.BULK_CHUNK_SIZE, ge=1, le=bulk.MAX_BULK_CHUNK_SIZE),
+        db: DbSession = Depends(get_session),
+    ):
+        if len(items) > bulk.MAX_BULK_ITEMS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"At most {bulk.MAX_BULK_ITEMS} items per bulk request",
+            )
+        if upsert and not upsert_key:
+            raise HTTPException(status_code=400, detail=f"Upsert is not supported for {tag}")
+
+        rows = [item.model_dump() for item in items]
+
+        if model == models.Utilisateur:
+            # Each password is a bcrypt hash: keep the request within the bounded pool's queue
+            if len(rows) > MAX_BULK_UTILISATEURS:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"At most {MAX_BULK_UTILISATEURS} utilisateurs per bulk request",
+                )
+            emails = [row["email"] for row in rows]
+            if len(set(emails)) != len(emails):
+                raise HTTPException(status_code=400, detail="Duplicate emails in request")
+
+            def _check_emails(db: Session):
+                taken = db.execute(
+                    select(models.Utilisateur.email).where(models.Utilisateur.email.in_(emails))
+                ).scalars().all()
+                if taken:
+                    raise HTTPException(
+                        status_code=400, detail=f"Email already registered: {', '.join(taken)}"
+                    )
+
+            await run_db(db, _check_emails)
+            # Queued like any other hash: a full pool answers 503 instead of starving /login
+            hashes = await asyncio.gather(*(get_password_hash_async(row["password"]) for row in rows))
+            for row, hashed in zip(rows, hashes):
+                row["password"] = hashed
+
+        def _bulk(db: Session):
+            pk = model.__mapper__.primary_key[0]
+            try:
+                if upsert:
+                    ids, created, updated = bulk.upsert(db, model, upsert_key, rows, chunk_size)
+                else:
+                    ids = bulk.inserer(db, model, rows, chunk_size)
+                    created, updated = len(ids), 0
+                if on_write:
+                    on_write(db, [model(**row, **{pk.key: id_}) for row, id_ in zip(rows, ids)])
+                db.commit()
+            except IntegrityError as e:
+                db.rollback()
+                raise HTTPException(status_code=400, detail=f"Bulk write rejected: {e.orig}")
+            except StaleDataError:
+                db.rollback()
+                raise HTTPException(status_code=409, detail=f"{tag} was modified concurrently, retry")
+            except bulk.IdsAmbigus as e:
+                db.rollback()
+                raise HTTPException(status_code=409, detail=str(e))
+            return {"ids": ids, "created": created, "updated": updated}
+
+        return await run_db(db, _bulk)
+
+    allowed_sorts = sort_keys or []
+
+    # Precompiled Core + orjson path for list pages (None: the schema needs the ORM path)
+    fast = serialisation.compiler(model, schema_response, allowed_sorts)
+
+    def _list_query(db: Session):
+        return select(*fast.colonnes) if fast else db.query(model)
+
+    def _fetch(db: Session, query):
+        return db.execute(query).all() if fast else query.all()
+
+    def _list_response(response: Response, items, etag: str, next_cursor: Optional[str] = None):
+        body = fast.encoder(items) if fast else None
+        if body is not None:
+            # Same bytes as the response_model path, without validating each row
+            response = Response(content=body, media_type="application/json")
+        etags.marquer(response, etag)
+        if next_cursor:
+            response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+        return response if body is not None else items
 
     # Read All (GET)
     @app.get(f"/{prefix}/", response_model=List[schema_response], tags=[tag])
-    def read_items(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-        return db.query(model).offset(skip).limit(limit).all()
+    async def read_items(
+        response: Response,
+        skip: int = 0,
+        limit: int = Query(100, ge=1),
+        cursor: Optional[str] = Query(
+            None,
+            description="Pagination par curseur : vide pour la première page, "
+            f"puis la valeur de l'en-tête {pagination.NEXT_CURSOR_HEADER}",
+        ),
+        sort: Optional[str] = Query(
+            None, description=f"Tri : {', '.join(allowed_sorts) or 'aucun'} (préfixe '-' pour décroissant)"
+        ),
+        if_none_match: Optional[str] = Header(None),
+        db: DbSession = Depends(get_read_session),
+    ):
+        limit = pagination.clamp_limit(limit)
+        pk = model.__mapper__.primary_key[0]
+        try:
+            sort_name, descending = pagination.parse_sort(sort, allowed_sorts)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        sort_column = getattr(model, sort_name) if sort_name else None
+
+        # Offset mode (historique)
+        if cursor is None:
+
+            def _page(db: Session):
+                query = _list_query(db)
+                if sort_column is not None:
+                    query = pagination.seek(query, pk, sort_column, descending)
+                return _fetch(db, query.offset(skip).limit(limit))
+
+            items = await run_db(db, _page)
+            etag = etags.etag_page(model, items)
+            if etags.correspond(if_none_match, etag):
+                return etags.non_modifie(etag)
+            return _list_response(response, items, etag)
+
+        # Keyset mode: the cost of a page does not depend on its depth
+        seek_columns = [sort_column, pk] if sort_column is not None else [pk]
+        sort_spec = sort or ""
+        try:
+            after = pagination.decode_cursor(cursor, sort_spec, seek_columns) if cursor else None
+        except pagination.InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        def _seek_page(db: Session):
+            query = pagination.seek(_list_query(db), pk, sort_column, descending, after)
+            return _fetch(db, query.limit(limit + 1))
+
+        items, next_cursor = pagination.split_page(
+            await run_db(db, _seek_page),
+            limit,
+            sort_spec,
+            lambda last: [getattr(last, c.key) for c in seek_columns],
+        )
+        etag = etags.etag_page(model, items, next_cursor)
+        if etags.correspond(if_none_match, etag):
+            return etags.non_modifie(etag)
+        return _list_response(response, items, etag, next_cursor)
 
     # Read One (GET)
-    @app.get(f"/{prefix}/{{item_id}}", response_model=schema_response, tags=[tag])
-    def read_item(item_id: int, db: Session = Depends(get_db)):
+    @app.get(f"/{prefix}/{{item_id:int}}", response_model=schema_response, tags=[tag])
+    async def read_item(
+        item_id: int,
+        response: Response,
+        if_none_match: Optional[str] = Header(None),
+        db: DbSession = Depends(get_read_session),
+    ):
+        def _get(db: Session):
+            pk = model.__mapper__.primary_key[0]
+            return db.query(model).filter(pk == item_id).first()
+
+        db_item = await run_db(db, _get)
+        if db_item is None:
+            raise HTTPException(status_code=404, detail=f"{tag} not found")
+        # Unchanged since the client's copy: 304 without serializing the body
+        etag = etags.etag_element(model, db_item)
+        if etags.correspond(if_none_match, etag):
+            return etags.non_modifie(etag)
+        etags.marquer(response, etag)
+        return db_item
+
+    def _apply_update(db: Session, item_id: int, item_data: dict):
         pk = model.__mapper__.primary_key[0]
         db_item = db.query(model).filter(pk == item_id).first()
+
         if db_item is None:
             raise HTTPException(status_code=404, detail=f"{tag} not found")
+
+        for key, value in item_data.items():
+            setattr(db_item, key, value)
+
+        if on_write:
+            on_write(db, [db_item])
+        try:
+            # The ORM bumps the row version (ETag) and checks it was not changed meanwhile
+            db.commit()
+        except StaleDataError:
+            db.rollback()
+            raise HTTPException(status_code=409, detail=f"{tag} was modified concurrently, retry")
+        db.refresh(db_item)
+
+        if model == models.Utilisateur:
+            forget_token_version(item_id)
         return db_item
 
     # PUT (Full Update - Replaces data, keeps ID)
     @app.put(
-        f"/{prefix}/{{item_id}}",
+        f"/{prefix}/{{item_id:int}}",
         response_model=schema_response,
         tags=[tag],
         dependencies=write_deps,
     )
-    def update_item_full(
-        item_id: int, item: schema_create, db: Session = Depends(get_db)
+    async def update_item_full(
+        item_id: int, item: schema_create, db: DbSession = Depends(get_session)
     ):
-        pk = model.__mapper__.primary_key[0]
-        db_item = db.query(model).filter(pk == item_id).first()
-
-        if db_item is None:
-            raise HTTPException(status_code=404, detail=f"{tag} not found")
-
         item_data = item.model_dump()
 
         # Handle password hashing on update if it's a user
         if model == models.Utilisateur and "password" in item_data:
-            item_data["password"] = get_password_hash(item_data["password"])
-
-        for key, value in item_data.items():
-            setattr(db_item, key, value)
+            item_data["password"] = await get_password_hash_async(item_data["password"])
 
-        db.commit()
-        db.refresh(db_item)
-        return db_item
+        return await run_db(db, _apply_update, item_id, item_data)
 
     # PATCH (Partial Update)
     @app.patch(
-        f"/{prefix}/{{item_id}}",
+        f"/{prefix}/{{item_id:int}}",
         response_model=schema_response,
         tags=[tag],
         dependencies=write_deps,
     )
-    def update_item_partial(
-        item_id: int, item: patch_schema, db: Session = Depends(get_db)
+    async def update_item_partial(
+        item_id: int, item: patch_schema, db: DbSession = Depends(get_session)
     ):
-        pk = model.__mapper__.primary_key[0]
-        db_item = db.query(model).filter(pk == item_id).first()
-
-        if db_item is None:
-            raise HTTPException(status_code=404, detail=f"{tag} not found")
-
         # exclude_unset=True is key for PATCH (only update fields sent)
         item_data = item.model_dump(exclude_unset=True)
 
         if model == models.Utilisateur and "password" in item_data:
-            item_data["password"] = get_password_hash(item_data["password"])
-
-        for key, value in item_data.items():
-            setattr(db_item, key, value)
+            item_data["password"] = await get_password_hash_async(item_data["password"])
 
-        db.commit()
-        db.refresh(db_item)
-        return db_item
+        return await run_db(db, _apply_update, item_id, item_data)
 
     # Delete
     @app.delete(
-        f"/{prefix}/{{item_id}}",
+        f"/{prefix}/{{item_id:int}}",
         tags=[tag],
         dependencies=write_deps,
         status_code=status.HTTP_204_NO_CONTENT,
     )
-    def delete_item(item_id: int, db: Session = Depends(get_db)):
-        pk = model.__mapper__.primary_key[0]
-        db_item = db.query(model).filter(pk == item_id).first()
-        if db_item is None:
-            raise HTTPException(status_code=404, detail=f"{tag} not found")
-        db.delete(db_item)
-        db.commit()
+    async def delete_item(item_id: int, db: DbSession = Depends(get_session)):
+        def _delete(db: Session):
+            pk = model.__mapper__.primary_key[0]
+            db_item = db.query(model).filter(pk == item_id).first()
+            if db_item is None:
+                raise HTTPException(status_code=404, detail=f"{tag} not found")
+            db.delete(db_item)
+            if on_write:
+                on_write(db, [db_item])
+            try:
+                db.commit()
+            except StaleDataError:
+                db.rollback()
+                raise HTTPException(status_code=409, detail=f"{tag} was modified concurrently, retry")
+
+        await run_db(db, _delete)
+
+        if model == models.Utilisateur:
+            forget_token_version(item_id)
         return None
 
 
@@ -349,6 +729,8 @@ create_crud_routes(
     "groupes",
     "Groupes",
     write_groups=["Bibliothecaire"],
+    sort_keys=["nom"],
+    on_write=referentiel.on_write,  # Référentiel en mémoire, rechargé après commit
 )
 create_crud_routes(
     models.Etat,
@@ -357,6 +739,8 @@ create_crud_routes(
     "etats",
     "Etats",
     write_groups=["Bibliothecaire"],
+    sort_keys=["nom"],
+    on_write=referentiel.on_write,  # Référentiel en mémoire, rechargé après commit
 )
 create_crud_routes(
     models.Categorie,
@@ -365,6 +749,8 @@ create_crud_routes(
     "categories",
     "Categories",
     write_groups=["Bibliothecaire"],
+    sort_keys=["nom"],
+    on_write=referentiel.on_write,  # Référentiel en mémoire, rechargé après commit
 )
 create_crud_routes(
     models.Statut,
@@ -373,6 +759,8 @@ create_crud_routes(
     "statuts",
     "Statuts",
     write_groups=["Bibliothecaire"],
+    sort_keys=["nom"],
+    on_write=referentiel.on_write,  # Référentiel en mémoire, rechargé après commit
 )
 create_crud_routes(
     models.Departement,
@@ -381,6 +769,8 @@ create_crud_routes(
     "departements",
     "Departements",
     write_groups=["Bibliothecaire"],
+    sort_keys=["nom"],
+    on_write=referentiel.on_write,  # Référentiel en mémoire, rechargé après commit
 )
 
 # Books: Only Bibliothecaire can add/edit books - AVEC SCHEMA UPDATE
@@ -392,6 +782,9 @@ create_crud_routes(
     "Livres",
     write_groups=["Bibliothecaire"],
     schema_update=schemas.LivreUpdate,  # Nouveau !
+    sort_keys=["titre", "auteur", "annee_publication"],
+    on_write=trigrammes.on_livres_written,  # Index trigrammes, mis à jour après commit
+    upsert_key="isbn",
 )
 
 create_crud_routes(
@@ -402,6 +795,7 @@ create_crud_routes(
     "Exemplaires",
     write_groups=["Bibliothecaire"],
     schema_update=schemas.ExemplaireUpdate,  # Nouveau !
+    sort_keys=["date_ajout"],
 )
 
 # Users: Bibliothecaire and Professeur can manage - AVEC SCHEMA UPDATE
@@ -413,6 +807,7 @@ create_crud_routes(
     "Utilisateurs",
     write_groups=["Bibliothecaire", "Professeur"],
     schema_update=schemas.UtilisateurUpdate,  # Nouveau !
+    sort_keys=["nom", "email"],
 )
 
 # Loans: Bibliothecaire manages loans - AVEC SCHEMA UPDATE
@@ -424,95 +819,400 @@ create_crud_routes(
     "Emprunts",
     write_groups=["Bibliothecaire"],
     schema_update=schemas.EmpruntUpdate,  # Nouveau !
+    sort_keys=["date_emprunt", "date_retour_prevu"],
+    on_write=notifications.on_emprunts_written,  # Digest des notifications
+)
+
+
+# --- Catalogue ---
+
+
+@app.get("/livres/search", response_model=List[schemas.LivreResponse], tags=["Livres"])
+async def search_livres(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=255, description="Mots recherchés"),
+    limit: int = Query(20, ge=1),
+    cursor: Optional[str] = Query(
+        None, description=f"Valeur de l'en-tête {pagination.NEXT_CURSOR_HEADER}"
+    ),
+    db: DbSession = Depends(get_read_session),
+):
+    """
+    Recherche plein texte dans le titre, l'auteur et le résumé (insensible aux accents).
+    Résultats triés par pertinence, paginés par curseur.
+    """
+    try:
+        livres, next_cursor = await run_db(
+            db, catalogue.rechercher_livres, q, pagination.clamp_limit(limit), cursor
+        )
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return livres
+
+
+@app.get("/livres/fuzzy", response_model=List[schemas.LivreScoreResponse], tags=["Livres"])
+async def fuzzy_search_livres(
+    q: str = Query(..., min_length=1, max_length=255, description="Titre ou auteur, fautes tolérées"),
+    limit: int = 20,
+    seuil: float = Query(trigrammes.SEUIL_DEFAUT, ge=0, le=1, description="Score minimal"),
+    db: DbSession = Depends(get_read_session),
+):
+    """
+    Recherche approximative (fautes de frappe) dans le titre et l'auteur,
+    servie par l'index trigrammes en mémoire. Résultats triés par score décroissant.
+    """
+    if trigrammes.index.derniere_reconstruction is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Fuzzy search index is not loaded",
+        )
+
+    # A few milliseconds of CPU, no I/O: run inline rather than in the threadpool
+    resultats = trigrammes.index.rechercher(q, pagination.clamp_limit(limit), seuil)
+    livres = await run_db(db, catalogue.livres_par_ids, [livre_id for livre_id, _ in resultats])
+    return [
+        {**livres[livre_id]._mapping, "score": score}
+        for livre_id, score in resultats
+        if livre_id in livres
+    ]
+
+
+@app.get("/livres/catalogue", response_model=List[schemas.LivreCatalogueResponse], tags=["Livres"])
+async def catalogue_livres(
+    limit: int = Query(100, ge=1),
+    cursor: Optional[str] = Query(
+        None, description=f"Absent pour la première page, puis la valeur de l'en-tête {pagination.NEXT_CURSOR_HEADER}"
+    ),
+    sort: Optional[str] = Query(
+        None,
+        description=f"Tri : {', '.join(catalogue.TRIS_CATALOGUE)} (préfixe '-' pour décroissant)",
+    ),
+    db: DbSession = Depends(get_read_session),
+):
+    """
+    Page du catalogue pour l'affichage : chaque livre avec le nom de sa catégorie, son nombre
+    d'exemplaires, d'exemplaires disponibles et un indicateur de disponibilité.
+    Une requête SQL par page, paginée par curseur.
+    """
+    try:
+        livres, next_cursor = await run_db(
+            db, catalogue.page_catalogue, pagination.clamp_limit(limit), sort, cursor or None
+        )
+    except (ValueError, pagination.InvalidCursor) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Plain ints, strings and booleans: same bytes as the response_model path
+    response = Response(content=orjson.dumps(livres), media_type="application/json")
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return response
+
+
+@app.get("/livres/disponibilite", response_model=List[schemas.DisponibiliteResponse], tags=["Livres"])
+async def disponibilite_livres(
+    ids: str = Query(..., description="livre_id séparés par des virgules, ex. 1,2,3"),
+    db: DbSession = Depends(get_read_session),
+):
+    """
+    Exemplaires, exemplaires disponibles et prochain retour prévu de chaque livre demandé
+    (une page entière du catalogue en un appel), dans l'ordre des ids.
+    """
+    try:
+        livre_ids = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if len(livre_ids) > pagination.MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=400, detail=f"At most {pagination.MAX_PAGE_SIZE} ids per request"
+        )
+    return await run_db(db, catalogue.disponibilite, livre_ids)
+
+
+@app.post(
+    "/livres/import",
+    tags=["Livres"],
+    dependencies=[Depends(PermissionChecker(["Bibliothecaire"]))],
 )
+async def import_livres(
+    fichier: UploadFile = File(..., description="Fichier fournisseur CSV ou JSONL"),
+    format: Optional[str] = Query(
+        None, pattern="^(csv|jsonl)$", description="Déduit de l'extension si absent"
+    ),
+    chunk_size: int = Query(importation.CHUNK_SIZE, ge=1, le=bulk.MAX_BULK_CHUNK_SIZE),
+):
+    """
+    Importe un catalogue fournisseur : crée les livres absents (dédoublonnés sur l'ISBN)
+    et leurs exemplaires. Réponse en NDJSON, un événement par ligne
+    (erreur, progression, resume), émis au fil de l'import.
+    """
+    fmt = format or importation.format_depuis_nom(fichier.filename)
+    if fmt is None:
+        raise HTTPException(
+            status_code=400, detail="Unknown file format, pass format=csv or format=jsonl"
+        )
+
+    # Sync generator: Starlette iterates it in the threadpool, chunk after chunk
+    evenements = importation.importer(fichier.file, fmt, chunk_size)
+    return StreamingResponse(
+        (json.dumps(evenement, ensure_ascii=False) + "\n" for evenement in evenements),
+        media_type="application/x-ndjson",
+    )
+
+
+# --- Prêts ---
+
+
+@app.post(
+    "/emprunts/checkout",
+    response_model=schemas.EmpruntResponse,
+    tags=["Emprunts"],
+    dependencies=[Depends(PermissionChecker(["Bibliothecaire"]))],
+    status_code=status.HTTP_201_CREATED,
+)
+async def checkout_emprunt(demande: schemas.CheckoutRequest, db: DbSession = Depends(get_session)):
+    """
+    Prête un exemplaire en une transaction : l'exemplaire demandé, ou pour un livre_id le
+    disponible en meilleur état. Emprunt "En cours" créé et exemplaire rendu indisponible
+    ensemble ; 409 si aucun exemplaire n'est libre (y compris prêté au même instant ailleurs).
+    """
+    try:
+        return await run_db(
+            db,
+            emprunts.emprunter,
+            demande.utilisateur_id,
+            demande.exemplaire_id,
+            demande.livre_id,
+            demande.date_retour_prevu,
+        )
+    except (emprunts.ExemplaireIntrouvable, emprunts.LivreIntrouvable) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except emprunts.ExemplaireIndisponible as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Unknown utilisateur_id")
+
+
+@app.post(
+    "/emprunts/{emprunt_id:int}/retour",
+    response_model=schemas.EmpruntResponse,
+    tags=["Emprunts"],
+    dependencies=[Depends(PermissionChecker(["Bibliothecaire"]))],
+)
+async def retour_emprunt(emprunt_id: int, db: DbSession = Depends(get_session)):
+    """
+    Enregistre le retour en une transaction : date de retour, statut "Rendu à temps" ou
+    "Rendu en retard" selon la date prévue, exemplaire de nouveau disponible.
+    Idempotent : rejouer la requête renvoie le même emprunt sans rien modifier.
+    """
+    try:
+        return await run_db(db, emprunts.rendre, emprunt_id)
+    except emprunts.EmpruntIntrouvable as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except StaleDataError:
+        raise HTTPException(status_code=409, detail="Emprunts was modified concurrently, retry")
+
+
+# --- Export ---
+
+
+@app.get(
+    "/emprunts/export",
+    tags=["Emprunts"],
+    dependencies=[Depends(PermissionChecker(["Bibliothecaire"]))],
+)
+async def export_emprunts(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    du: Optional[date] = Query(None, description="Emprunts à partir de cette date (incluse)"),
+    au: Optional[date] = Query(None, description="Emprunts jusqu'à cette date (incluse)"),
+):
+    """
+    Exporte l'historique des emprunts (avec utilisateur, exemplaire et livre) en NDJSON ou CSV.
+    Les lignes sont lues par un curseur côté serveur et envoyées au fil de l'eau :
+    mémoire constante quel que soit le volume.
+    """
+    if du and au and du > au:
+        raise HTTPException(status_code=400, detail="'du' must be before 'au'")
+
+    nom = "_".join(["emprunts", *(d.isoformat() for d in (du, au) if d)])
+    # Sync generator on its own connection: Starlette iterates it in the threadpool
+    return StreamingResponse(
+        exports.exporter(format, du, au),
+        media_type=exports.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{nom}.{format}"'},
+    )
 
 
 # --- Routes de notifications ---
 
 
 @app.get("/notifications/retards", tags=["Notifications"])
-def get_emprunts_en_retard_route(
-    db: Session = Depends(get_db),
-    current_user: models.Utilisateur = Depends(get_current_user),
+async def get_emprunts_en_retard_route(
+    db: DbSession = Depends(get_read_session),
+    current_user: schemas.TokenData = Depends(get_current_user),
 ):
     """
     Récupère tous les emprunts en retard.
     Accessible uniquement aux bibliothécaires.
     """
     # Vérifier que l'utilisateur est bibliothécaire
-    if not current_user.groupe or current_user.groupe.nom != "Bibliothecaire":
+    if current_user.groupe != "Bibliothecaire":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Accès réservé aux bibliothécaires",
         )
 
-    return notifications.get_emprunts_en_retard(db)
+    return await run_db(db, notifications.get_emprunts_en_retard)
 
 
 @app.get("/notifications/rappels/j30", tags=["Notifications"])
-def get_rappels_j30_route(
-    db: Session = Depends(get_db),
-    current_user: models.Utilisateur = Depends(get_current_user),
+async def get_rappels_j30_route(
+    db: DbSession = Depends(get_read_session),
+    current_user: schemas.TokenData = Depends(get_current_user),
 ):
     """
     Récupère les emprunts nécessitant un rappel à J-30.
     Accessible uniquement aux bibliothécaires.
     """
-    if not current_user.groupe or current_user.groupe.nom != "Bibliothecaire":
+    if current_user.groupe != "Bibliothecaire":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Accès réservé aux bibliothécaires",
         )
 
-    return notifications.get_emprunts_rappel_j30(db)
+    return await run_db(db, notifications.get_emprunts_rappel_j30)
 
 
 @app.get("/notifications/rappels/j5", tags=["Notifications"])
-def get_rappels_j5_route(
-    db: Session = Depends(get_db),
-    current_user: models.Utilisateur = Depends(get_current_user),
+async def get_rappels_j5_route(
+    db: DbSession = Depends(get_read_session),
+    current_user: schemas.TokenData = Depends(get_current_user),
 ):
     """
     Récupère les emprunts nécessitant un rappel à J-5.
     Accessible uniquement aux bibliothécaires.
     """
-    if not current_user.groupe or current_user.groupe.nom != "Bibliothecaire":
+    if current_user.groupe != "Bibliothecaire":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Accès réservé aux bibliothécaires",
         )
 
-    return notifications.get_emprunts_rappel_j5(db)
+    return await run_db(db, notifications.get_emprunts_rappel_j5)
 
 
 @app.get("/notifications/tous", tags=["Notifications"])
-def get_tous_les_rappels_route(
-    db: Session = Depends(get_db),
-    current_user: models.Utilisateur = Depends(get_current_user),
+async def get_tous_les_rappels_route(
+    db: DbSession = Depends(get_read_session),
+    current_user: schemas.TokenData = Depends(get_current_user),
 ):
     """
     Récupère tous les types de notifications (retards + rappels J-30 et J-5).
     Accessible uniquement aux bibliothécaires.
     """
-    if not current_user.groupe or current_user.groupe.nom != "Bibliothecaire":
+    if current_user.groupe != "Bibliothecaire":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Accès réservé aux bibliothécaires",
         )
 
-    return notifications.get_tous_les_rappels(db)
+    return await run_db(db, notifications.get_tous_les_rappels)
 
 
 @app.get("/notifications/mes-notifications", tags=["Notifications"])
-def get_mes_notifications_route(
-    db: Session = Depends(get_db),
-    current_user: models.Utilisateur = Depends(get_current_user),
+async def get_mes_notifications_route(
+    db: DbSession = Depends(get_read_session),
+    current_user: schemas.TokenData = Depends(get_current_user),
 ):
     """
     Récupère les notifications pour l'utilisateur connecté.
     Accessible à tous les utilisateurs authentifiés.
     """
-    return notifications.get_notifications_utilisateur(db, current_user.utilisateurs_id)
+    return await run_db(
+        db, notifications.get_notifications_utilisateur, current_user.utilisateurs_id
+    )
+
+
+# --- Admin ---
+
+
+@app.get(
+    "/admin/hashing",
+    tags=["Admin"],
+    dependencies=[Depends(PermissionChecker(["Bibliothecaire"]))],
+)
+async def get_hashing_metrics():
+    """
+    Métriques du pool bcrypt : profondeur de file, rejets, latence des hash.
+    Accessible uniquement aux bibliothécaires.
+    """
+    return hash_metrics.snapshot()
+
+
+@app.get(
+    "/admin/db-pool",
+    tags=["Admin"],
+    dependencies=[Depends(PermissionChecker(["Bibliothecaire"]))],
+)
+async def get_db_pool_stats():
+    """
+    Pools de connexions MySQL : réglages, connexions prêtées et en débordement,
+    temps d'attente d'une connexion, expirations et connexions invalidées.
+    Accessible uniquement aux bibliothécaires.
+    """
+    return connexions.snapshot()
+
+
+@app.get(
+    "/admin/trigram-index",
+    tags=["Admin"],
+    dependencies=[Depends(PermissionChecker(["Bibliothecaire"]))],
+)
+async def get_trigram_index_stats():
+    """
+    Index trigrammes : nombre de livres et de mots, mémoire occupée,
+    date et durée de la dernière reconstruction.
+    Accessible uniquement aux bibliothécaires.
+    """
+    return await run_in_threadpool(trigrammes.index.stats)
+
+
+@app.post(
+    "/admin/trigram-index/rebuild",
+    tags=["Admin"],
+    dependencies=[Depends(PermissionChecker(["Bibliothecaire"]))],
+)
+async def rebuild_trigram_index():
+    """
+    Reconstruit l'index trigrammes depuis la base (les recherches continuent
+    sur l'ancien index pendant la reconstruction). Retourne les nouvelles statistiques.
+    """
+    return await run_in_threadpool(trigrammes.charger_index)
+
+
+async def require_metrics_access(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> None:
+    """Scraper token (METRICS_TOKEN) or a Bibliothecaire access token"""
+    if METRICS_TOKEN and secrets.compare_digest(credentials.credentials.encode(), METRICS_TOKEN.encode()):
+        return
+    await PermissionChecker(["Bibliothecaire"])(await get_current_user(credentials))
+
+
+if METRICS:
+
+    @app.get(
+        "/metrics",
+        tags=["Admin"],
+        include_in_schema=False,
+        dependencies=[Depends(require_metrics_access)],
+    )
+    async def get_metrics():
+        """
+        Métriques au format texte Prometheus.
+        Jeton du collecteur (METRICS_TOKEN) ou bibliothécaire.
+        """
+        return Response(content=metriques.exposer(), media_type=metriques.CONTENT_TYPE)
 
 
 @app.get("/", tags=["Root"])
@@ -0,0 +1,401 @@
+"""
+Métriques au format texte Prometheus (GET /metrics)
+
+- HTTP : requêtes, latence et requêtes en cours par route ; la route est le chemin
+  déclaré (/livres/{item_id}), jamais l'URL brute
+- Base : nombre de requêtes SQL et temps passé en base par requête HTTP,
+  mesurés par les événements SQLAlchemy de tous les moteurs. En mode DEBUG, chaque
+  réponse les porte en en-têtes (X-DB-Queries, Server-Timing) ; avec SQL_N1_DETECTION,
+  une instruction répétée avec des paramètres différents est signalée comme N+1 probable
+- Notifications : durée des requêtes de notifications.py
+- bcrypt et pools de connexions : lus à la collecte dans hash_metrics et connexions
+
+Les séries HTTP ne sont touchées que par la boucle asyncio (middleware et collecte) et
+se passent de verrou : le surcoût reste de quelques microsecondes par requête
+(benchmarks/bench_metriques.py).
+"""
+
+import functools
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import connexions
+from .utils import HASH_LATENCY_BUCKETS, HASH_WORKERS, hash_metrics
+
+logger = logging.getLogger(__name__)
+
+# En-têtes SQL sur chaque réponse (développement uniquement)
+DEBUG = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+# Détection des N+1 : garde une empreinte des paramètres de chaque instruction de la requête
+SQL_N1_DETECTION = os.getenv("SQL_N1_DETECTION", "false").lower() in ("1", "true", "yes")
+# Exécutions d'une même instruction, avec des paramètres différents, signalées comme N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "3"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bornes (en secondes) des histogrammes de latence
+LATENCE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Bornes du nombre de requêtes SQL par requête HTTP
+SQL_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Route des requêtes qui ne correspondent à aucune route déclarée (404)
+HORS_ROUTE = "unmatched"
+
+
+def _echapper(valeur: str) -> str:
+    return valeur.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(noms: Sequence[str], valeurs: Iterable) -> str:
+    return ",".join(f'{nom}="{_echapper(str(v))}"' for nom, v in zip(noms, valeurs))
+
+
+def _lignes_histogramme(
+    nom: str, labels: str, bornes: Sequence[float], comptes: Sequence[int], somme: float
+) -> List[str]:
+    """comptes : un par borne puis +Inf, non cumulés"""
+    prefixe = labels + "," if labels else ""
+    lignes, cumul = [], 0
+    for borne, n in zip(bornes, comptes):
+        cumul += n
+        lignes.append(f'{nom}_bucket{{{prefixe}le="{borne}"}} {cumul}')
+    cumul += comptes[len(bornes)]
+    lignes.append(f'{nom}_bucket{{{prefixe}le="+Inf"}} {cumul}')
+    suffixe = f"{{{labels}}}" if labels else ""
+    lignes.append(f"{nom}_sum{suffixe} {somme}")
+    lignes.append(f"{nom}_count{suffixe} {cumul}")
+    return lignes
+
+
+class Histogramme:
+    def __init__(self, nom: str, aide: str, labels: Sequence[str], bornes: Sequence[float]):
+        self.nom, self.aide, self.labels = nom, aide, tuple(labels)
+        self.bornes = tuple(bornes)
+        self.lock = threading.Lock()
+        # valeurs des labels -> [compte par borne..., +Inf, somme]
+        self.series: Dict[Tuple, list] = {}
+
+    def observe(self, valeur: float, *valeurs) -> None:
+        i = bisect_left(self.bornes, valeur)
+        with self.lock:
+            serie = self.series.get(valeurs)
+            if serie is None:
+                serie = self.series[valeurs] = [0] * (len(self.bornes) + 1) + [0.0]
+            serie[i] += 1
+            serie[-1] += valeur
+
+    def exposer(self) -> List[str]:
+        with self.lock:
+            series = [(valeurs, list(serie)) for valeurs, serie in self.series.items()]
+        lignes = [f"# HELP {self.nom} {self.aide}", f"# TYPE {self.nom} histogram"]
+        for valeurs, serie in series:
+            lignes += _lignes_histogramme(
+                self.nom, _labels(self.labels, valeurs), self.bornes, serie[:-1], serie[-1]
+            )
+        return lignes
+
+
+latence_notifications = Histogramme(
+    "notification_query_duration_seconds", "Durée des requêtes de notifications", ("requete",), LATENCE_BUCKETS
+)
+
+
+# --- Requête SQL par requête HTTP ---
+
+
+class RequeteSQL:
+    """
+    Compteurs SQL de la requête HTTP en cours (partagés avec les threads qu'elle utilise).
+    Avec details=True, garde aussi chaque instruction et l'empreinte de ses jeux de paramètres
+    (hash, jamais les valeurs ; les executemany, écritures en masse, ne sont pas suivis).
+    """
+
+    __slots__ = ("requetes", "secondes", "debut", "instructions")
+
+    def __init__(self, details: bool = False):
+        self.requetes = 0
+        self.secondes = 0.0
+        # Début de l'instruction en cours : celles d'une requête s'exécutent l'une après
+        # l'autre (une session), sans attribut à poser sur le contexte SQLAlchemy
+        self.debut = 0.0
+        # instruction -> [exécutions, empreintes distinctes des paramètres]
+        self.instructions: Optional[Dict[str, list]] = {} if details else None
+
+    def n_plus_un(self, seuil: int = None) -> List[Tuple[str, int]]:
+        """(instruction, exécutions) des instructions répétées avec des paramètres différents"""
+        seuil = seuil or N_PLUS_ONE_THRESHOLD
+        return [
+            (instruction, executions)
+            for instruction, (executions, parametres) in (self.instructions or {}).items()
+            if executions >= seuil and len(parametres) > 1
+        ]
+
+
+_requete_courante: ContextVar[Optional[RequeteSQL]] = ContextVar("metriques_sql", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _avant_execution(conn, cursor, statement, parameters, context, executemany):
+    sql = _requete_courante.get()
+    if sql is not None and context is not None:
+        sql.debut = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _apres_execution(conn, cursor, statement, parameters, context, executemany):
+    sql = _requete_courante.get()
+    if sql is None or not sql.debut:
+        return
+    sql.requetes += 1
+    sql.secondes += time.perf_counter() - sql.debut
+    sql.debut = 0.0
+    if sql.instructions is not None and not executemany:
+        suivi = sql.instructions.get(statement)
+        if suivi is None:
+            suivi = sql.instructions[statement] = [0, set()]
+        suivi[0] += 1
+        suivi[1].add(hash(repr(parameters)))
+
+
+@contextmanager
+def compter_requetes() -> Iterator[RequeteSQL]:
+    """
+    Compte les requêtes SQL exécutées dans le bloc (même thread ou threads lancés depuis
+    celui-ci), avec le détail par instruction. Pour les budgets de requêtes des tests :
+
+        with compter_requetes() as sql:
+            notifications.get_notifications_utilisateur(db, 42)
+        assert sql.requetes <= 2 and not sql.n_plus_un()
+    """
+    sql = RequeteSQL(details=True)
+    jeton = _requete_courante.set(sql)
+    try:
+        yield sql
+    finally:
+        _requete_courante.reset(jeton)
+
+
+# --- Requêtes HTTP ---
+
+
+class _SerieHTTP:
+    """Séries HTTP d'un couple (méthode, route) : compteurs par statut et histogrammes"""
+
+    __slots__ = ("statuts", "latence", "latence_somme", "sql", "sql_somme", "db", "db_somme")
+
+    def __init__(self):
+        self.statuts: Dict[int, int] = {}
+        self.latence = [0] * (len(LATENCE_BUCKETS) + 1)
+        self.latence_somme = 0.0
+        self.sql = [0] * (len(SQL_BUCKETS) + 1)
+        self.sql_somme = 0
+        self.db = [0] * (len(LATENCE_BUCKETS) + 1)
+        self.db_somme = 0.0
+
+
+# (méthode, route) -> séries ; écrites et lues depuis la boucle asyncio uniquement, sans verrou
+_series_http: Dict[Tuple[str, str], _SerieHTTP] = {}
+# Requêtes en cours (scope ASGI), regroupées par route à la collecte
+_en_cours: Dict[int, dict] = {}
+
+
+def _route(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or HORS_ROUTE
+
+
+def _observer(methode: str, route: str, statut: int, duree: float, sql: RequeteSQL) -> None:
+    serie = _series_http.get((methode, route))
+    if serie is None:
+        serie = _series_http[(methode, route)] = _SerieHTTP()
+    serie.statuts[statut] = serie.statuts.get(statut, 0) + 1
+    serie.latence[bisect_left(LATENCE_BUCKETS, duree)] += 1
+    serie.latence_somme += duree
+    serie.sql[bisect_left(SQL_BUCKETS, sql.requetes)] += 1
+    serie.sql_somme += sql.requetes
+    serie.db[bisect_left(LATENCE_BUCKETS, sql.secondes)] += 1
+    serie.db_somme += sql.secondes
+
+
+def _entetes_sql(scope, sql: RequeteSQL) -> List[Tuple[bytes, bytes]]:
+    """En-têtes de débogage : requêtes et temps SQL jusqu'à l'envoi de la réponse, N+1 probables"""
+    entetes = [
+        (b"x-db-queries", str(sql.requetes).encode()),
+        (b"server-timing", f'db;dur={sql.secondes * 1000:.2f};desc="{sql.requetes} queries"'.encode()),
+    ]
+    candidats = sql.n_plus_un()
+    if candidats:
+        entetes.append((b"x-db-n-plus-one", str(len(candidats)).encode()))
+        for instruction, executions in candidats:
+            logger.warning(
+                "N+1 probable sur %s %s : %d exécutions de %s",
+                scope["method"], _route(scope), executions, " ".join(instruction.split()),
+            )
+    return entetes
+
+
+class MetriquesMiddleware:
+    """
+    Middleware ASGI : compte et chronomètre chaque requête HTTP sous le chemin
+    déclaré de sa route (connu après le routage, via scope["route"]).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        sql = RequeteSQL(details=SQL_N1_DETECTION)
+        jeton = _requete_courante.set(sql)
+        statut = 500
+
+        async def send_statut(message):
+            nonlocal statut
+            if message["type"] == "http.response.start":
+                statut = message["status"]
+                if DEBUG:
+                    message = {**message, "headers": [*message.get("headers", []), *_entetes_sql(scope, sql)]}
+            await send(message)
+
+        cle = id(scope)
+        _en_cours[cle] = scope
+        try:
+            await self.app(scope, receive, send_statut)
+        finally:
+            duree = time.perf_counter() - start
+            del _en_cours[cle]
+            _requete_courante.reset(jeton)
+            _observer(scope["method"], _route(scope), statut, duree, sql)
+
+
+# --- Notifications ---
+
+
+def chronometrer(requete: str):
+    """Décorateur : durée de la fonction dans notification_query_duration_seconds{requete=...}"""
+
+    def decorateur(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                latence_notifications.observe(time.perf_counter() - start, requete)
+
+        return wrapper
+
+    return decorateur
+
+
+# --- Collecte ---
+
+
+def _http() -> List[str]:
+    series = list(_series_http.items())
+    familles = {
+        "total": [
+            "# HELP http_requests_total Requêtes HTTP par méthode, route et statut",
+            "# TYPE http_requests_total counter",
+        ],
+        "latence": [
+            "# HELP http_request_duration_seconds Durée des requêtes HTTP",
+            "# TYPE http_request_duration_seconds histogram",
+        ],
+        "sql": [
+            "# HELP http_request_db_queries Requêtes SQL exécutées par requête HTTP",
+            "# TYPE http_request_db_queries histogram",
+        ],
+        "db": [
+            "# HELP http_request_db_duration_seconds Temps passé en base par requête HTTP",
+            "# TYPE http_request_db_duration_seconds histogram",
+        ],
+    }
+    for (methode, route), serie in series:
+        labels = _labels(("method", "route"), (methode, route))
+        familles["total"] += [
+            f'http_requests_total{{{labels},status="{statut}"}} {n}' for statut, n in list(serie.statuts.items())
+        ]
+        familles["latence"] += _lignes_histogramme(
+            "http_request_duration_seconds", labels, LATENCE_BUCKETS, serie.latence, serie.latence_somme
+        )
+        familles["sql"] += _lignes_histogramme(
+            "http_request_db_queries", labels, SQL_BUCKETS, serie.sql, serie.sql_somme
+        )
+        familles["db"] += _lignes_histogramme(
+            "http_request_db_duration_seconds", labels, LATENCE_BUCKETS, serie.db, serie.db_somme
+        )
+    return [ligne for lignes in familles.values() for ligne in lignes]
+
+
+def _en_cours_par_route() -> List[str]:
+    comptes: Dict[Tuple[str, str], int] = {}
+    for scope in list(_en_cours.values()):
+        cle = (scope["method"], _route(scope))
+        comptes[cle] = comptes.get(cle, 0) + 1
+    return [
+        "# HELP http_requests_in_flight Requêtes HTTP en cours par route",
+        "# TYPE http_requests_in_flight gauge",
+    ] + [f"http_requests_in_flight{{{_labels(('method', 'route'), cle)}}} {n}" for cle, n in comptes.items()]
+
+
+def _bcrypt() -> List[str]:
+    with hash_metrics.lock:
+        pending, submitted, rejected = hash_metrics.pending, hash_metrics.submitted, hash_metrics.rejected
+        buckets, secondes = list(hash_metrics.buckets), hash_metrics.hash_seconds
+    return [
+        "# HELP bcrypt_hash_submitted_total Calculs bcrypt soumis au pool dédié",
+        "# TYPE bcrypt_hash_submitted_total counter",
+        f"bcrypt_hash_submitted_total {submitted}",
+        "# HELP bcrypt_hash_rejected_total Calculs bcrypt refusés (pool saturé, 503)",
+        "# TYPE bcrypt_hash_rejected_total counter",
+        f"bcrypt_hash_rejected_total {rejected}",
+        "# HELP bcrypt_hash_queue_depth Calculs bcrypt en attente d'un thread",
+        "# TYPE bcrypt_hash_queue_depth gauge",
+        f"bcrypt_hash_queue_depth {max(0, pending - HASH_WORKERS)}",
+        "# HELP bcrypt_hash_duration_seconds Durée des calculs bcrypt",
+        "# TYPE bcrypt_hash_duration_seconds histogram",
+        *_lignes_histogramme("bcrypt_hash_duration_seconds", "", HASH_LATENCY_BUCKETS, buckets, secondes),
+    ]
+
+
+def _pools() -> List[str]:
+    etats = []
+    for nom, pool in connexions.pools():
+        with pool.metrics.lock:
+            etats.append((
+                _labels(("pool",), (nom,)), pool.checkedout(), max(0, pool.overflow()),
+                pool.metrics.timeouts, list(pool.metrics.buckets), pool.metrics.wait_seconds,
+            ))
+    lignes = ["# HELP db_pool_checked_out Connexions prêtées", "# TYPE db_pool_checked_out gauge"]
+    lignes += [f"db_pool_checked_out{{{labels}}} {prets}" for labels, prets, *_ in etats]
+    lignes += ["# HELP db_pool_overflow Connexions ouvertes au-delà de DB_POOL_SIZE", "# TYPE db_pool_overflow gauge"]
+    lignes += [f"db_pool_overflow{{{labels}}} {debordement}" for labels, _, debordement, *_ in etats]
+    lignes += [
+        "# HELP db_pool_timeouts_total Attentes d'une connexion expirées (503)",
+        "# TYPE db_pool_timeouts_total counter",
+    ]
+    lignes += [f"db_pool_timeouts_total{{{e[0]}}} {e[3]}" for e in etats]
+    lignes += ["# HELP db_pool_wait_seconds Attente d'une connexion libre", "# TYPE db_pool_wait_seconds histogram"]
+    for labels, _, _, _, buckets, secondes in etats:
+        lignes += _lignes_histogramme("db_pool_wait_seconds", labels, connexions.POOL_WAIT_BUCKETS, buckets, secondes)
+    return lignes
+
+
+def exposer() -> str:
+    """Toutes les séries, au format texte Prometheus"""
+    lignes = _http() + _en_cours_par_route() + latence_notifications.exposer() + _bcrypt() + _pools()
+    return "\n".join(lignes) + "\n"
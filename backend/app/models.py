@@ -1,39 +1,53 @@
-from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey, Index, Text
+from sqlalchemy.dialects.mysql import MEDIUMTEXT
+from sqlalchemy.orm import declared_attr, relationship
 from .database import Base
 
+
+class Versionne:
+    """
+    Numéro de version de la ligne, incrémenté par l'ORM à chaque UPDATE
+    (ETags des routes CRUD). Un UPDATE sur une version périmée lève StaleDataError.
+    """
+    version = Column(Integer, nullable=False, server_default="1")
+
+    @declared_attr.directive
+    def __mapper_args__(cls):
+        return {"version_id_col": cls.__table__.c.version}
+
+
 # 1. GROUPES
-class Groupe(Base):
+class Groupe(Versionne, Base):
     __tablename__ = "groupes"
     groupe_id = Column(Integer, primary_key=True, index=True)
     nom = Column(String(255))
 
 # 2. ETATS
-class Etat(Base):
+class Etat(Versionne, Base):
     __tablename__ = "etats"
     etat_id = Column(Integer, primary_key=True, index=True)
     nom = Column(String(255))
 
 # 3. CATEGORIES
-class Categorie(Base):
+class Categorie(Versionne, Base):
     __tablename__ = "categories"
     categorie_id = Column(Integer, primary_key=True, index=True)
     nom = Column(String(255))
 
 # 4. STATUTS
-class Statut(Base):
+class Statut(Versionne, Base):
     __tablename__ = "statuts"
     statut_id = Column(Integer, primary_key=True, index=True)
     nom = Column(String(255))
 
 # 5. DEPARTEMENTS
-class Departement(Base):
+class Departement(Versionne, Base):
     __tablename__ = "departements"
     departement_id = Column(Integer, primary_key=True, index=True)
     nom = Column(String(255))
 
 # 6. LIVRES
-class Livre(Base):
+class Livre(Versionne, Base):
     __tablename__ = "livres"
     livre_id = Column(Integer, primary_key=True, index=True)
     titre = Column(String(255))
@@ -46,8 +60,16 @@ class Livre(Base):
 
     categorie = relationship("Categorie")
 
+    __table_args__ = (
+        Index("ix_livres_isbn", "isbn"),
+        # Recherche plein texte (MySQL uniquement)
+        Index(
+            "ft_livres_recherche", "titre", "auteur", "resume", mysql_prefix="FULLTEXT"
+        ).ddl_if(dialect="mysql"),
+    )
+
 # 7. EXEMPLAIRES
-class Exemplaire(Base):
+class Exemplaire(Versionne, Base):
     __tablename__ = "exemplaires"
     exemplaire_id = Column(Integer, primary_key=True, index=True)
     livre_id = Column(Integer, ForeignKey("livres.livre_id"))
@@ -58,13 +80,18 @@ class Exemplaire(Base):
     livre = relationship("Livre")
     etat = relationship("Etat")
 
+    __table_args__ = (
+        Index("ix_exemplaires_livre_disponible_etat", "livre_id", "disponible", "etat_id"),
+    )
+
 # 8. UTILISATEURS
-class Utilisateur(Base):
+class Utilisateur(Versionne, Base):
     __tablename__ = "utilisateurs"
     utilisateurs_id = Column(Integer, primary_key=True, index=True)
     nom = Column(String(255))
     prenom = Column(String(255))
-    email = Column(String(255), unique=True)
+    # Comparaisons insensibles à la casse sur les deux bases (collation MySQL *_ci)
+    email = Column(String(255).with_variant(String(255, collation="NOCASE"), "sqlite"), unique=True)
     password = Column(String(255))
     departement_id = Column(Integer, ForeignKey("departements.departement_id"))
     groupe_id = Column(Integer, ForeignKey("groupes.groupe_id"))
@@ -73,7 +100,7 @@ class Utilisateur(Base):
     groupe = relationship("Groupe")
 
 # 9. EMPRUNTS
-class Emprunt(Base):
+class Emprunt(Versionne, Base):
     __tablename__ = "emprunts"
     emprunt_id = Column(Integer, primary_key=True, index=True)
     exemplaire_id = Column(Integer, ForeignKey("exemplaires.exemplaire_id"))
@@ -85,4 +112,26 @@ class Emprunt(Base):
 
     exemplaire = relationship("Exemplaire")
     utilisateur = relationship("Utilisateur")
-    statut = relationship("Statut")
\ No newline at end of file
+    statut = relationship("Statut")
+
+    __table_args__ = (
+        # Notifications de tous les utilisateurs
+        Index("ix_emprunts_retour", "date_retour_effectue", "date_retour_prevu"),
+        # Notifications d'un utilisateur
+        Index("ix_emprunts_utilisateur_retour", "utilisateur_id", "date_retour_effectue"),
+        # Export de l'historique par période
+        Index("ix_emprunts_date_emprunt", "date_emprunt"),
+        # Disponibilité des livres : emprunts en cours d'un exemplaire (index couvrant)
+        Index("ix_emprunts_exemplaire_retour", "exemplaire_id", "date_retour_effectue", "date_retour_prevu"),
+    )
+
+# 10. NOTIFICATION DIGEST (notifications précalculées par utilisateur)
+class NotificationDigest(Base):
+    __tablename__ = "notification_digest"
+    utilisateur_id = Column(
+        Integer,
+        ForeignKey("utilisateurs.utilisateurs_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    date_calcul = Column(Date, nullable=False)
+    contenu = Column(Text().with_variant(MEDIUMTEXT(), "mysql"), nullable=False)  # JSON
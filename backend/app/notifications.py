@@ -2,180 +2,413 @@
 Gestion des notifications pour les emprunts
 - Emprunts en retard
 - Rappels J-30 et J-5 avant la date de retour prévue
+
+Une seule requête classe chaque emprunt ouvert dans son panier (retard, J-30, J-5)
+directement en SQL, en ne lisant que les colonnes utiles au JSON renvoyé.
+
+Les notifications par utilisateur sont matérialisées dans la table notification_digest :
+reconstruite chaque jour par lots (un seul processus à la fois), mise à jour par les
+écritures sur les emprunts, et lue par clé primaire.
 """
 
-from datetime import date, timedelta
-from typing import List, Dict, Any
-from sqlalchemy.orm import Session, joinedload
+import asyncio
+import json
+import logging
+import os
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Collection, List, Dict, Any, Iterable, Iterator, Optional, Sequence
+from sqlalchemy import case, exists, insert, or_, select, text, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, attributes
+from starlette.concurrency import run_in_threadpool
 from . import models
+from .database import REPLICA, SessionLocal, engine
+from .metriques import chronometrer
 
+logger = logging.getLogger(__name__)
 
-def get_emprunts_en_retard(db: Session) -> List[Dict[str, Any]]:
-    """
-    Récupère tous les emprunts en retard (date_retour_prevu dépassée et pas encore rendu)
+# Heure (locale) du job quotidien de reconstruction des digests
+DIGEST_JOB_HOUR = int(os.getenv("DIGEST_JOB_HOUR", "1"))
 
-    Returns:
-        Liste de dicts avec les infos de l'emprunt + utilisateur + livre
+# Verrou nommé MySQL (GET_LOCK) : un seul worker reconstruit les digests
+VERROU_DIGEST = "notification_digest"
+
+EN_RETARD = "en_retard"
+RAPPEL_J30 = "rappel_j30"
+RAPPEL_J5 = "rappel_j5"
+PANIERS = (EN_RETARD, RAPPEL_J30, RAPPEL_J5)
+
+# Nombre de jours avant la date de retour prévue pour chaque rappel
+JOURS_RAPPEL = {RAPPEL_J30: 30, RAPPEL_J5: 5}
+
+
+def _select_notifications(
+    today: date,
+    paniers: Sequence[str] = PANIERS,
+    utilisateur_ids: Optional[Collection[int]] = None,
+    avec_utilisateur: bool = True,
+):
     """
+    Construit la requête unique : emprunts non rendus en retard ou à J-30/J-5,
+    avec une colonne `panier` calculée par un CASE.
+    Sans `utilisateur_ids`, couvre tous les utilisateurs.
+    """
+    prevu = models.Emprunt.date_retour_prevu
+    dates_rappel = {p: today + timedelta(days=JOURS_RAPPEL[p]) for p in paniers if p in JOURS_RAPPEL}
+
+    conditions = []
+    whens = []
+    if EN_RETARD in paniers:
+        conditions.append(prevu < today)
+        whens.append((prevu < today, EN_RETARD))
+    if dates_rappel:
+        conditions.append(prevu.in_(list(dates_rappel.values())))
+        whens.extend((prevu == d, p) for p, d in dates_rappel.items())
+
+    columns = [
+        case(*whens).label("panier"),
+        models.Emprunt.utilisateur_id,
+        models.Emprunt.emprunt_id,
+        models.Emprunt.date_emprunt,
+        models.Emprunt.date_retour_prevu,
+        models.Emprunt.exemplaire_id,
+        models.Livre.livre_id,
+        models.Livre.titre,
+        models.Livre.auteur,
+    ]
+    if avec_utilisateur:
+        columns += [
+            models.Utilisateur.utilisateurs_id,
+            models.Utilisateur.nom,
+            models.Utilisateur.prenom,
+            models.Utilisateur.email,
+        ]
+
+    stmt = (
+        select(*columns)
+        .join(models.Exemplaire, models.Exemplaire.exemplaire_id == models.Emprunt.exemplaire_id)
+        .join(models.Livre, models.Livre.livre_id == models.Exemplaire.livre_id)
+        .where(
+            models.Emprunt.date_retour_effectue.is_(None),  # Pas encore rendu
+            or_(*conditions),
+        )
+        # Ordre de l'index ix_emprunts_retour : pas de tri supplémentaire
+        .order_by(models.Emprunt.date_retour_prevu, models.Emprunt.emprunt_id)
+    )
+    if avec_utilisateur:
+        stmt = stmt.join(
+            models.Utilisateur,
+            models.Utilisateur.utilisateurs_id == models.Emprunt.utilisateur_id,
+        )
+    if utilisateur_ids is not None:
+        stmt = stmt.where(models.Emprunt.utilisateur_id.in_(list(utilisateur_ids)))
+    return stmt
+
+
+def _format_notification(row, today: date, avec_utilisateur: bool) -> Dict[str, Any]:
+    """Formate une ligne de la requête au format JSON historique des notifications"""
+    if row.panier == EN_RETARD:
+        jours_info = {"jours_retard": (today - row.date_retour_prevu).days}
+    else:
+        jours_info = {"jours_restants": JOURS_RAPPEL[row.panier]}
+
+    notification = {
+        "emprunt_id": row.emprunt_id,
+        "date_emprunt": row.date_emprunt.isoformat(),
+        "date_retour_prevu": row.date_retour_prevu.isoformat(),
+        **jours_info,
+    }
+    if avec_utilisateur:
+        notification["utilisateur"] = {
+            "id": row.utilisateurs_id,
+            "nom": row.nom,
+            "prenom": row.prenom,
+            "email": row.email,
+        }
+    notification["livre"] = {
+        "id": row.livre_id,
+        "titre": row.titre,
+        "auteur": row.auteur,
+    }
+    notification["exemplaire_id"] = row.exemplaire_id
+    return notification
+
+
+def _classer_notifications(
+    db: Session, paniers: Sequence[str] = PANIERS
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Exécute la requête unique et répartit les lignes formatées par panier"""
     today = date.today()
+    result = {panier: [] for panier in paniers}
+    for row in db.execute(_select_notifications(today, paniers)):
+        result[row.panier].append(_format_notification(row, today, avec_utilisateur=True))
+    return result
+
+
+def _digest_vide() -> Dict[str, Any]:
+    return {**{panier: [] for panier in PANIERS}, "total_notifications": 0}
 
-    # Requête : emprunts non rendus (date_retour_effectue == NULL) et en retard
-    emprunts = (
-        db.query(models.Emprunt)
-        .options(
-            joinedload(models.Emprunt.utilisateur),
-            joinedload(models.Emprunt.exemplaire).joinedload(models.Exemplaire.livre),
+
+def _calculer_digests(
+    db: Session, today: date, utilisateur_ids: Optional[Collection[int]] = None
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Calcule en une requête les notifications de plusieurs utilisateurs
+    (tous ceux qui ont un emprunt concerné si `utilisateur_ids` est None)
+    """
+    digests: Dict[int, Dict[str, Any]] = {}
+    stmt = _select_notifications(
+        today, utilisateur_ids=utilisateur_ids, avec_utilisateur=False
+    )
+    for row in db.execute(stmt):
+        digest = digests.setdefault(row.utilisateur_id, _digest_vide())
+        digest[row.panier].append(_format_notification(row, today, avec_utilisateur=False))
+    for digest in digests.values():
+        digest["total_notifications"] = sum(len(digest[p]) for p in PANIERS)
+    return digests
+
+
+def _ecrire_digests(db: Session, today: date, digests: Dict[int, Dict[str, Any]]) -> None:
+    """Insère ou remplace les lignes de digest des utilisateurs donnés (sans commit)"""
+    if not digests:
+        return
+    table = models.NotificationDigest.__table__
+    dialecte = db.get_bind().dialect.name
+    if dialecte in ("mysql", "mariadb"):
+        stmt = mysql.insert(table)
+        stmt = stmt.on_duplicate_key_update(
+            date_calcul=stmt.inserted.date_calcul, contenu=stmt.inserted.contenu
         )
-        .filter(
-            models.Emprunt.date_retour_effectue.is_(None),  # Pas encore rendu
-            models.Emprunt.date_retour_prevu < today,  # En retard
+    elif dialecte == "sqlite":
+        stmt = sqlite.insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.utilisateur_id],
+            set_={"date_calcul": stmt.excluded.date_calcul, "contenu": stmt.excluded.contenu},
         )
-        .all()
+    else:
+        stmt = insert(table)
+    db.execute(
+        stmt,
+        [
+            {"utilisateur_id": uid, "date_calcul": today, "contenu": json.dumps(digest)}
+            for uid, digest in digests.items()
+        ],
     )
 
-    result = []
+
+@chronometrer("rafraichir_digests")
+def rafraichir_digests(db: Session, utilisateur_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Recalcule le digest des utilisateurs donnés dans la transaction courante (sans commit).
+    Appelé après chaque écriture sur les emprunts.
+    """
+    ids = {uid for uid in utilisateur_ids if uid is not None}
+    if not ids:
+        return {}
+    today = date.today()
+    digests = _calculer_digests(db, today, ids)
+    for uid in ids:
+        digests.setdefault(uid, _digest_vide())
+    _ecrire_digests(db, today, digests)
+    return digests
+
+
+def on_emprunts_written(db: Session, emprunts: List[models.Emprunt]) -> None:
+    """
+    Hook des routes CRUD emprunts (avant commit) : rafraîchit le digest de
+    l'emprunteur actuel et, si l'emprunt a changé de main, de l'ancien.
+    """
+    ids = set()
     for emprunt in emprunts:
-        jours_retard = (today - emprunt.date_retour_prevu).days
-
-        result.append(
-            {
-                "emprunt_id": emprunt.emprunt_id,
-                "date_emprunt": emprunt.date_emprunt.isoformat(),
-                "date_retour_prevu": emprunt.date_retour_prevu.isoformat(),
-                "jours_retard": jours_retard,
-                "utilisateur": {
-                    "id": emprunt.utilisateur.utilisateurs_id,
-                    "nom": emprunt.utilisateur.nom,
-                    "prenom": emprunt.utilisateur.prenom,
-                    "email": emprunt.utilisateur.email,
-                },
-                "livre": {
-                    "id": emprunt.exemplaire.livre.livre_id,
-                    "titre": emprunt.exemplaire.livre.titre,
-                    "auteur": emprunt.exemplaire.livre.auteur,
-                },
-                "exemplaire_id": emprunt.exemplaire_id,
-            }
-        )
+        ids.add(emprunt.utilisateur_id)
+        ids.update(attributes.get_history(emprunt, "utilisateur_id").deleted or ())
+    db.flush()
+    rafraichir_digests(db, ids)
 
-    return result
 
+def apres_emprunts_valides(db: Session, utilisateur_ids: Iterable[int]) -> None:
+    """
+    Rafraîchit le digest après le commit d'un prêt ou d'un retour, dans sa propre
+    transaction : le calcul ne prolonge pas les verrous de l'écriture. Un échec est
+    journalisé sans annuler l'écriture ; le job du lendemain recalcule le digest.
+    """
+    try:
+        rafraichir_digests(db, utilisateur_ids)
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        logger.exception("Échec du rafraîchissement du digest de %s", sorted(utilisateur_ids))
 
-def get_emprunts_rappel_j30(db: Session) -> List[Dict[str, Any]]:
+
+@chronometrer("reconstruction")
+def reconstruire_digests(db: Session, chunk_size: int = 1000) -> int:
     """
-    Récupère les emprunts nécessitant un rappel à J-30
-    (date de retour prévue dans 30 jours)
+    Job quotidien : reconstruit le digest de tous les utilisateurs, par lots.
+
+    Chaque lot est une transaction qui commence par verrouiller les lignes de digest
+    du lot (sur SQLite : le verrou d'écriture de la base), puis calcule et écrit :
+    une écriture sur les emprunts validée entre-temps est lue par le calcul au lieu
+    d'être écrasée. Les digests déjà calculés aujourd'hui (par une écriture, ou par
+    une reconstruction interrompue ou concurrente) sont gardés.
 
     Returns:
-        Liste de dicts avec les infos de l'emprunt + utilisateur + livre
+        Nombre de lignes écrites
     """
-    date_j30 = date.today() + timedelta(days=30)
-
-    emprunts = (
-        db.query(models.Emprunt)
-        .options(
-            joinedload(models.Emprunt.utilisateur),
-            joinedload(models.Emprunt.exemplaire).joinedload(models.Exemplaire.livre),
+    today = date.today()
+    table = models.NotificationDigest.__table__
+    user_ids = db.execute(
+        select(models.Utilisateur.utilisateurs_id).order_by(models.Utilisateur.utilisateurs_id)
+    ).scalars().all()
+    db.commit()
+
+    ecrits = 0
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start : start + chunk_size]
+        # Écriture sans effet : verrous posés avant la première lecture de la transaction
+        db.execute(
+            update(table)
+            .where(table.c.utilisateur_id.in_(chunk))
+            .values(date_calcul=table.c.date_calcul)
         )
-        .filter(
-            models.Emprunt.date_retour_effectue.is_(None),  # Pas encore rendu
-            models.Emprunt.date_retour_prevu == date_j30,  # Exactement dans 30 jours
+        a_jour = set(
+            db.execute(
+                select(table.c.utilisateur_id).where(
+                    table.c.utilisateur_id.in_(chunk), table.c.date_calcul == today
+                )
+            ).scalars()
         )
-        .all()
+        ids = [uid for uid in chunk if uid not in a_jour]
+        digests = _calculer_digests(db, today, ids) if ids else {}
+        _ecrire_digests(db, today, {uid: digests.get(uid) or _digest_vide() for uid in ids})
+        db.commit()
+        ecrits += len(ids)
+    return ecrits
+
+
+def digests_perimes(db: Session) -> bool:
+    """Vrai si un digest date d'un jour précédent ou si un utilisateur n'en a pas"""
+    digest = models.NotificationDigest
+    sans_digest = select(models.Utilisateur.utilisateurs_id).where(
+        ~exists().where(digest.utilisateur_id == models.Utilisateur.utilisateurs_id)
+    )
+    return bool(
+        db.execute(
+            select(or_(exists().where(digest.date_calcul < date.today()), sans_digest.exists()))
+        ).scalar()
     )
 
-    result = []
-    for emprunt in emprunts:
-        result.append(
-            {
-                "emprunt_id": emprunt.emprunt_id,
-                "date_emprunt": emprunt.date_emprunt.isoformat(),
-                "date_retour_prevu": emprunt.date_retour_prevu.isoformat(),
-                "jours_restants": 30,
-                "utilisateur": {
-                    "id": emprunt.utilisateur.utilisateurs_id,
-                    "nom": emprunt.utilisateur.nom,
-                    "prenom": emprunt.utilisateur.prenom,
-                    "email": emprunt.utilisateur.email,
-                },
-                "livre": {
-                    "id": emprunt.exemplaire.livre.livre_id,
-                    "titre": emprunt.exemplaire.livre.titre,
-                    "auteur": emprunt.exemplaire.livre.auteur,
-                },
-                "exemplaire_id": emprunt.exemplaire_id,
-            }
-        )
 
-    return result
+@contextmanager
+def _verrou_job() -> Iterator[bool]:
+    """
+    Exclusion entre processus (workers, cron) pour le job quotidien : GET_LOCK sur
+    MySQL, tenu par une connexion dédiée pendant toute la reconstruction ; False sans
+    attendre si un autre processus le tient. SQLite n'a pas de verrou nommé : les
+    lots de reconstruire_digests s'y sérialisent sur le verrou d'écriture de la base.
+    """
+    if engine.dialect.name not in ("mysql", "mariadb"):
+        yield True
+        return
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT GET_LOCK(:nom, 0)"), {"nom": VERROU_DIGEST}).scalar():
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:nom)"), {"nom": VERROU_DIGEST})
+
+
+def _reconstruire_si_perime() -> Optional[int]:
+    with _verrou_job() as obtenu:
+        if not obtenu:
+            return None
+        db = SessionLocal()
+        try:
+            if not digests_perimes(db):
+                return None
+            return reconstruire_digests(db)
+        finally:
+            db.close()
+
+
+def _secondes_avant_prochain_job(now: datetime) -> float:
+    prochain = now.replace(hour=DIGEST_JOB_HOUR, minute=0, second=0, microsecond=0)
+    if prochain <= now:
+        prochain += timedelta(days=1)
+    return (prochain - now).total_seconds()
+
+
+async def job_digest_quotidien() -> None:
+    """
+    Boucle du job quotidien, démarrée avec l'application :
+    rattrapage au démarrage si un digest date d'un jour précédent,
+    puis reconstruction chaque jour à DIGEST_JOB_HOUR, par le seul worker
+    qui obtient le verrou du job.
+    """
+    while True:
+        try:
+            count = await run_in_threadpool(_reconstruire_si_perime)
+            if count is not None:
+                logger.info("notification_digest reconstruit (%d utilisateurs)", count)
+        except Exception:
+            logger.exception("Échec de la reconstruction de notification_digest")
+        await asyncio.sleep(_secondes_avant_prochain_job(datetime.now()))
 
 
-def get_emprunts_rappel_j5(db: Session) -> List[Dict[str, Any]]:
+@chronometrer("retards")
+def get_emprunts_en_retard(db: Session) -> List[Dict[str, Any]]:
     """
-    Récupère les emprunts nécessitant un rappel à J-5
-    (date de retour prévue dans 5 jours)
+    Récupère tous les emprunts en retard (date_retour_prevu dépassée et pas encore rendu)
 
     Returns:
         Liste de dicts avec les infos de l'emprunt + utilisateur + livre
     """
-    date_j5 = date.today() + timedelta(days=5)
+    return _classer_notifications(db, (EN_RETARD,))[EN_RETARD]
 
-    emprunts = (
-        db.query(models.Emprunt)
-        .options(
-            joinedload(models.Emprunt.utilisateur),
-            joinedload(models.Emprunt.exemplaire).joinedload(models.Exemplaire.livre),
-        )
-        .filter(
-            models.Emprunt.date_retour_effectue.is_(None),  # Pas encore rendu
-            models.Emprunt.date_retour_prevu == date_j5,  # Exactement dans 5 jours
-        )
-        .all()
-    )
 
-    result = []
-    for emprunt in emprunts:
-        result.append(
-            {
-                "emprunt_id": emprunt.emprunt_id,
-                "date_emprunt": emprunt.date_emprunt.isoformat(),
-                "date_retour_prevu": emprunt.date_retour_prevu.isoformat(),
-                "jours_restants": 5,
-                "utilisateur": {
-                    "id": emprunt.utilisateur.utilisateurs_id,
-                    "nom": emprunt.utilisateur.nom,
-                    "prenom": emprunt.utilisateur.prenom,
-                    "email": emprunt.utilisateur.email,
-                },
-                "livre": {
-                    "id": emprunt.exemplaire.livre.livre_id,
-                    "titre": emprunt.exemplaire.livre.titre,
-                    "auteur": emprunt.exemplaire.livre.auteur,
-                },
-                "exemplaire_id": emprunt.exemplaire_id,
-            }
-        )
+@chronometrer("rappel_j30")
+def get_emprunts_rappel_j30(db: Session) -> List[Dict[str, Any]]:
+    """
+    Récupère les emprunts nécessitant un rappel à J-30
+    (date de retour prévue dans 30 jours)
 
-    return result
+    Returns:
+        Liste de dicts avec les infos de l'emprunt + utilisateur + livre
+    """
+    return _classer_notifications(db, (RAPPEL_J30,))[RAPPEL_J30]
 
 
+@chronometrer("rappel_j5")
+def get_emprunts_rappel_j5(db: Session) -> List[Dict[str, Any]]:
+    """
+    Récupère les emprunts nécessitant un rappel à J-5
+    (date de retour prévue dans 5 jours)
+
+    Returns:
+        Liste de dicts avec les infos de l'emprunt + utilisateur + livre
+    """
+    return _classer_notifications(db, (RAPPEL_J5,))[RAPPEL_J5]
+
+
+@chronometrer("rappels")
 def get_tous_les_rappels(db: Session) -> Dict[str, Any]:
     """
-    Récupère tous les emprunts nécessitant une notification
+    Récupère tous les emprunts nécessitant une notification (une seule requête)
 
     Returns:
         Dict avec les catégories de rappels
     """
-    return {
-        "en_retard": get_emprunts_en_retard(db),
-        "rappel_j30": get_emprunts_rappel_j30(db),
-        "rappel_j5": get_emprunts_rappel_j5(db),
-    }
+    return _classer_notifications(db)
 
 
+@chronometrer("utilisateur")
 def get_notifications_utilisateur(db: Session, utilisateur_id: int) -> Dict[str, Any]:
     """
     Récupère les notifications pour un utilisateur spécifique
+    (lecture par clé primaire dans notification_digest)
 
     Args:
         utilisateur_id: ID de l'utilisateur
@@ -183,74 +416,18 @@ def get_notifications_utilisateur(db: Session, utilisateur_id: int) -> Dict[str,
     Returns:
         Dict avec les emprunts en retard et les rappels pour cet utilisateur
     """
-    today = date.today()
-    date_j30 = today + timedelta(days=30)
-    date_j5 = today + timedelta(days=5)
-
-    # Emprunts en retard
-    emprunts_retard = (
-        db.query(models.Emprunt)
-        .options(
-            joinedload(models.Emprunt.exemplaire).joinedload(models.Exemplaire.livre)
-        )
-        .filter(
-            models.Emprunt.utilisateur_id == utilisateur_id,
-            models.Emprunt.date_retour_effectue.is_(None),
-            models.Emprunt.date_retour_prevu < today,
-        )
-        .all()
-    )
-
-    # Rappels J-30
-    emprunts_j30 = (
-        db.query(models.Emprunt)
-        .options(
-            joinedload(models.Emprunt.exemplaire).joinedload(models.Exemplaire.livre)
-        )
-        .filter(
-            models.Emprunt.utilisateur_id == utilisateur_id,
-            models.Emprunt.date_retour_effectue.is_(None),
-            models.Emprunt.date_retour_prevu == date_j30,
-        )
-        .all()
-    )
-
-    # Rappels J-5
-    emprunts_j5 = (
-        db.query(models.Emprunt)
-        .options(
-            joinedload(models.Emprunt.exemplaire).joinedload(models.Exemplaire.livre)
-        )
-        .filter(
-            models.Emprunt.utilisateur_id == utilisateur_id,
-            models.Emprunt.date_retour_effectue.is_(None),
-            models.Emprunt.date_retour_prevu == date_j5,
-        )
-        .all()
-    )
-
-    def format_emprunt(emprunt, jours_info):
-        return {
-            "emprunt_id": emprunt.emprunt_id,
-            "date_emprunt": emprunt.date_emprunt.isoformat(),
-            "date_retour_prevu": emprunt.date_retour_prevu.isoformat(),
-            **jours_info,
-            "livre": {
-                "id": emprunt.exemplaire.livre.livre_id,
-                "titre": emprunt.exemplaire.livre.titre,
-                "auteur": emprunt.exemplaire.livre.auteur,
-            },
-            "exemplaire_id": emprunt.exemplaire_id,
-        }
-
-    return {
-        "en_retard": [
-            format_emprunt(e, {"jours_retard": (today - e.date_retour_prevu).days})
-            for e in emprunts_retard
-        ],
-        "rappel_j30": [format_emprunt(e, {"jours_restants": 30}) for e in emprunts_j30],
-        "rappel_j5": [format_emprunt(e, {"jours_restants": 5}) for e in emprunts_j5],
-        "total_notifications": len(emprunts_retard)
-        + len(emprunts_j30)
-        + len(emprunts_j5),
-    }
+    row = db.execute(
+        select(
+            models.NotificationDigest.date_calcul, models.NotificationDigest.contenu
+        ).where(models.NotificationDigest.utilisateur_id == utilisateur_id)
+    ).first()
+    if row is not None and row.date_calcul == date.today():
+        return json.loads(row.contenu)
+
+    # Absent ou calculé un jour précédent (job pas encore passé) : recalcul immédiat
+    if db.info.get(REPLICA):
+        # Réplique en lecture seule : calcul sans mise à jour de la table
+        return _calculer_digests(db, date.today(), [utilisateur_id]).get(utilisateur_id, _digest_vide())
+    digest = rafraichir_digests(db, [utilisateur_id])[utilisateur_id]
+    db.commit()
+    return digest
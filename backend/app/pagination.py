@@ -0,0 +1,125 @@
+"""
+Pagination par curseur (keyset) pour les routes de liste
+- Curseur opaque : base64url d'un JSON {tri, valeurs}
+- Prédicat de recherche (seek) : WHERE pk > :last, ou (tri, pk) > (:v, :last)
+- Taille de page plafonnée côté serveur (MAX_PAGE_SIZE)
+"""
+
+import base64
+import json
+import os
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+# En-tête renvoyé quand une page suivante existe
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    """Curseur illisible ou émis pour un autre tri"""
+
+
+def clamp_limit(limit: int) -> int:
+    """Ramène la taille de page demandée dans [1, MAX_PAGE_SIZE]"""
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _from_json(value: Any, column) -> Any:
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(sort: str, values: List[Any]) -> str:
+    """Construit le curseur opaque à partir de la clé de tri et des valeurs de la dernière ligne"""
+    raw = json.dumps({"s": sort, "v": [_to_json(v) for v in values]})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, columns: List[Any]) -> List[Any]:
+    """
+    Décode un curseur et convertit ses valeurs selon le type des colonnes
+
+    Raises:
+        InvalidCursor: si le curseur est corrompu ou ne correspond pas au tri demandé
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["s"] != sort or len(payload["v"]) != len(columns):
+            raise InvalidCursor("Cursor does not match the requested sort")
+        return [_from_json(v, c) for v, c in zip(payload["v"], columns)]
+    except InvalidCursor:
+        raise
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+
+
+def parse_sort(sort: Optional[str], allowed: List[str]) -> Tuple[Optional[str], bool]:
+    """
+    Analyse le paramètre `sort` ("champ" ou "-champ")
+
+    Returns:
+        (nom du champ ou None, tri décroissant)
+    """
+    if not sort:
+        return None, False
+    descending = sort.startswith("-")
+    name = sort.lstrip("-")
+    if name not in allowed:
+        raise ValueError(f"Unsupported sort key '{name}', allowed: {', '.join(allowed)}")
+    return name, descending
+
+
+def seek(query, pk, sort_column=None, descending: bool = False, after: Optional[List[Any]] = None):
+    """
+    Applique l'ordre (tri, pk) et, si `after` est fourni, le prédicat de recherche.
+    Fonctionne sur une Query ORM comme sur un select() Core.
+    """
+    if sort_column is None:
+        if after is not None:
+            query = query.filter(pk > after[0])
+        return query.order_by(pk)
+
+    if after is not None:
+        value, last_pk = after
+        if descending:
+            query = query.filter(or_(sort_column < value, and_(sort_column == value, pk < last_pk)))
+        else:
+            query = query.filter(or_(sort_column > value, and_(sort_column == value, pk > last_pk)))
+    if descending:
+        return query.order_by(sort_column.desc(), pk.desc())
+    return query.order_by(sort_column, pk)
+
+
+def split_page(rows: List[Any], limit: int, sort: str, key) -> Tuple[List[Any], Optional[str]]:
+    """
+    Coupe le résultat d'une requête lancée avec limit + 1 lignes.
+
+    Args:
+        key: fonction donnant les valeurs (tri, pk) d'une ligne
+
+    Returns:
+        (lignes de la page, curseur de la page suivante ou None)
+    """
+    if limit <= 0:
+        return [], None
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(sort, key(rows[-1]))
@@ -0,0 +1,106 @@
+"""
+Référentiel en mémoire des tables de référence
+(groupes, etats, categories, statuts, departements)
+- Quelques dizaines de lignes, rarement modifiées : chargées au démarrage de l'API
+  (ou au premier accès), puis servies sans SQL
+- Correspondances id <-> nom et tests d'existence en O(1)
+- Rechargé après le commit de toute écriture des routes CRUD de ces tables
+  (hook on_write) ; le rechargement est propre au processus
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+TABLES = {
+    "groupes": models.Groupe,
+    "etats": models.Etat,
+    "categories": models.Categorie,
+    "statuts": models.Statut,
+    "departements": models.Departement,
+}
+
+# Clé de Session.info : la transaction a écrit dans une table de référence
+_A_RECHARGER = "referentiel_a_recharger"
+
+
+class Referentiel:
+    """Tables de référence : id -> nom et nom -> id, remplacées d'un bloc à chaque chargement"""
+
+    def __init__(self):
+        # (noms, ids) : {table: {id: nom}}, {table: {nom: id}}
+        self._contenu: Optional[Tuple[Dict[str, Dict[int, str]], Dict[str, Dict[str, int]]]] = None
+
+    def charger(self, db: Session) -> Dict[str, int]:
+        """Lit les cinq tables ; les lecteurs voient l'ancien ou le nouveau contenu, jamais un mélange"""
+        noms = {}
+        for table, model in TABLES.items():
+            pk = model.__mapper__.primary_key[0]
+            noms[table] = dict(db.execute(select(pk, model.nom)).all())
+        # Homonymes : la ligne la plus ancienne l'emporte
+        ids = {
+            table: {nom: id_ for id_, nom in sorted(lignes.items(), reverse=True) if nom is not None}
+            for table, lignes in noms.items()
+        }
+        self._contenu = (noms, ids)
+        logger.info("Référentiel chargé : %s", {t: len(l) for t, l in noms.items()})
+        return {table: len(lignes) for table, lignes in noms.items()}
+
+    def _lire(self):
+        if self._contenu is None:
+            # Premier accès hors API (scripts) ou avant le démarrage
+            charger_referentiel()
+        return self._contenu
+
+    def nom(self, table: str, id_: Optional[int]) -> Optional[str]:
+        """Nom de la ligne `id_`, None si elle n'existe pas"""
+        return self._lire()[0][table].get(id_)
+
+    def id(self, table: str, nom: str) -> Optional[int]:
+        """Id de la ligne nommée `nom`, None si elle n'existe pas"""
+        return self._lire()[1][table].get(nom)
+
+    def existe(self, table: str, id_: Optional[int]) -> bool:
+        return id_ in self._lire()[0][table]
+
+    def elements(self, table: str) -> Dict[int, str]:
+        """Toutes les lignes de la table (id -> nom), à ne pas modifier"""
+        return self._lire()[0][table]
+
+
+registre = Referentiel()
+
+
+def charger_referentiel() -> Dict[str, int]:
+    """(Re)charge le référentiel depuis une session dédiée"""
+    db = SessionLocal()
+    try:
+        return registre.charger(db)
+    finally:
+        db.close()
+
+
+# --- Synchronisation avec les écritures ---
+
+
+def on_write(db: Session, items: List) -> None:
+    """Hook on_write des routes CRUD des tables de référence : rechargement après le commit"""
+    db.info[_A_RECHARGER] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _recharger(session: Session) -> None:
+    if session.info.pop(_A_RECHARGER, False):
+        charger_referentiel()
+
+
+@event.listens_for(Session, "after_rollback")
+def _annuler(session: Session) -> None:
+    session.info.pop(_A_RECHARGER, None)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field, model_validator
+from typing import List, Optional
 from datetime import date
 
 
@@ -16,8 +16,13 @@ class Token(BaseModel):
 
 
 class TokenData(BaseModel):
+    """Claims du token JWT : suffisent aux contrôles d'accès sans requête SQL"""
+
     email: Optional[str] = None
+    utilisateurs_id: Optional[int] = None
+    groupe_id: Optional[int] = None
     groupe: Optional[str] = None
+    version: int = 0
 
 
 class Login(BaseModel):
@@ -123,6 +128,38 @@ class LivreResponse(SchemaBase):
     editeur: str
 
 
+class LivreScoreResponse(LivreResponse):
+    """Livre trouvé par la recherche approximative, avec sa similarité (0 à 1)"""
+
+    score: float
+
+
+class LivreCatalogueResponse(LivreResponse):
+    """Livre du catalogue avec le nom de sa catégorie et ses exemplaires"""
+
+    categorie: Optional[str]
+    exemplaires: int
+    disponibles: int
+    disponible: bool
+
+
+class DisponibiliteResponse(SchemaBase):
+    """Exemplaires d'un livre : total, disponibles, et prochain retour prévu s'il y a des emprunts en cours"""
+
+    livre_id: int
+    exemplaires: int
+    disponibles: int
+    prochain_retour: Optional[date]
+
+
+class LivreImport(LivreCreate):
+    """Ligne d'un fichier d'import catalogue : un livre et ses exemplaires"""
+
+    exemplaires: int = Field(1, ge=0, le=1000)
+    etat_id: int
+    date_ajout: Optional[date] = None
+
+
 # --- Exemplaire Schemas ---
 class ExemplaireCreate(SchemaBase):
     livre_id: int
@@ -208,3 +245,29 @@ class EmpruntResponse(SchemaBase):
     date_retour_prevu: date
     date_retour_effectue: Optional[date]
     statut_id: int
+
+
+class CheckoutRequest(BaseModel):
+    """Prêt : un exemplaire précis, ou le meilleur exemplaire disponible d'un livre"""
+
+    utilisateur_id: int
+    exemplaire_id: Optional[int] = None
+    livre_id: Optional[int] = None
+    date_retour_prevu: Optional[date] = None
+
+    @model_validator(mode="after")
+    def un_seul_exemplaire_ou_livre(self):
+        if (self.exemplaire_id is None) == (self.livre_id is None):
+            raise ValueError("Provide exactly one of exemplaire_id or livre_id")
+        if self.date_retour_prevu is not None and self.date_retour_prevu < date.today():
+            raise ValueError("date_retour_prevu must not be in the past")
+        return self
+
+
+# --- Bulk Schemas ---
+class BulkResponse(BaseModel):
+    """Résultat d'un POST /{ressource}/bulk : ids dans l'ordre des éléments envoyés"""
+
+    ids: List[int]
+    created: int
+    updated: int = 0
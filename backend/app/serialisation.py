@@ -0,0 +1,84 @@
+"""
+Sérialisation rapide des routes de liste CRUD, sans ORM ni validation Pydantic
+- SELECT Core des seules colonnes du schéma de réponse (plus clé primaire et version pour l'ETag)
+- Lignes encodées en JSON par orjson, octet pour octet comme le chemin Pydantic
+  (ordre des champs du schéma, JSON compact, UTF-8 non échappé, dates ISO)
+- Sérialiseur précompilé une fois par route : colonnes, clés et champs obligatoires
+- Une valeur NULL dans un champ obligatoire renvoie vers le chemin Pydantic,
+  qui lève la même erreur de validation qu'avant
+"""
+
+from datetime import date
+from types import UnionType
+from typing import Any, List, Optional, Sequence, Union, get_args, get_origin
+
+import orjson
+from pydantic import BaseModel
+
+
+class SerialiseurListe:
+    """Sérialiseur précompilé d'une liste de lignes vers le JSON de List[schema]"""
+
+    def __init__(self, colonnes: List[Any], cles: Sequence[str], obligatoires: Sequence[int]):
+        # Colonnes du SELECT : celles du schéma, dans son ordre, puis les colonnes techniques
+        self.colonnes = colonnes
+        self._cles = tuple(cles)
+        self._obligatoires = tuple(obligatoires)
+
+    def encoder(self, lignes: Sequence[Any]) -> Optional[bytes]:
+        """JSON de la liste, ou None si une ligne doit passer par la validation Pydantic"""
+        cles, obligatoires = self._cles, self._obligatoires
+        if obligatoires:
+            for ligne in lignes:
+                for position in obligatoires:
+                    if ligne[position] is None:
+                        return None
+        return orjson.dumps([dict(zip(cles, ligne)) for ligne in lignes])
+
+
+# Types rendus à l'identique par orjson et par Pydantic
+_TYPES_SURS = (int, str, bool, date)
+
+
+def compiler(model, schema: type[BaseModel], extra: Sequence[str] = ()) -> Optional[SerialiseurListe]:
+    """
+    Prépare le sérialiseur de `schema` pour `model`.
+    `extra` : noms des colonnes lues en plus sans être renvoyées (clés de tri du curseur).
+    None si un champ du schéma n'est pas une simple colonne de la table (relation, champ calculé,
+    alias) ou d'un type qu'orjson n'écrirait pas comme Pydantic : la route garde alors l'ORM.
+    """
+    table = model.__table__
+    mapper = model.__mapper__
+    colonnes = []
+    obligatoires = []
+    for position, (nom, champ) in enumerate(schema.model_fields.items()):
+        colonne = table.columns.get(nom)
+        if colonne is None or champ.alias not in (None, nom):
+            return None
+        try:
+            python_type = colonne.type.python_type
+        except NotImplementedError:
+            return None
+        # Le champ doit avoir le type exact de la colonne : Pydantic n'aurait rien à convertir
+        types = _types(champ.annotation)
+        if python_type not in _TYPES_SURS or types - {python_type, type(None)}:
+            return None
+        colonnes.append(colonne)
+        if type(None) not in types:
+            obligatoires.append(position)
+
+    cles = [c.name for c in colonnes]
+    techniques = [mapper.primary_key[0], *(table.columns[nom] for nom in extra)]
+    if mapper.version_id_col is not None:
+        techniques.append(mapper.version_id_col)
+    for colonne in techniques:
+        if colonne.name not in {c.name for c in colonnes}:
+            colonnes.append(colonne)
+    return SerialiseurListe(colonnes, cles, obligatoires)
+
+
+def _types(annotation) -> set:
+    """Types d'une annotation simple ou d'un Optional/Union"""
+    if get_origin(annotation) in (Union, UnionType):
+        return set(get_args(annotation))
+    return {annotation}
@@ -0,0 +1,449 @@
+"""
+Index trigrammes en mémoire pour la recherche approximative (titre, auteur)
+- Chargé au démarrage depuis la table livres
+- Tenu à jour après chaque commit des routes d'écriture de /livres (on_write + after_commit)
+- Deux niveaux : trigramme -> mots du vocabulaire, mot -> livres
+- Score d'un livre : moyenne pondérée (IDF) de la similarité trigramme de chaque
+  mot de la requête avec le mot le plus proche du titre ou de l'auteur (0 à 1)
+"""
+
+import bisect
+import heapq
+import logging
+import math
+import re
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from collections import Counter
+from datetime import datetime
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Similarité minimale (Jaccard sur les trigrammes, comme pg_trgm) entre deux mots
+SEUIL_MOT = 0.3
+# Score minimal par défaut d'un livre
+SEUIL_DEFAUT = 0.3
+# Mots de la requête pris en compte
+MAX_MOTS_REQUETE = 8
+
+# Taille des lots lus lors d'une reconstruction
+CHUNK_SIZE = 10000
+
+# Clés de Session.info utilisées par les hooks
+_ECRITS = "trigrammes_ecrits"
+_EN_ATTENTE = "trigrammes_en_attente"
+
+_VIDE = array("i")
+_ACCENTS = re.compile(r"[\u0300-\u036f]")
+_MOT = re.compile(r"[^\W_]+")
+
+
+def mots(texte: Optional[str]) -> List[str]:
+    """Mots distincts du texte, en minuscules et sans accents, dans l'ordre"""
+    if not texte:
+        return []
+    texte = _ACCENTS.sub("", unicodedata.normalize("NFKD", texte.lower()))
+    return list(dict.fromkeys(_MOT.findall(texte)))
+
+
+def trigrammes(mot: str) -> Set[str]:
+    """Trigrammes d'un mot, complété comme pg_trgm ("  mot ")"""
+    mot = f"  {mot} "
+    return {mot[i : i + 3] for i in range(len(mot) - 2)}
+
+
+def ecart_longueur(mot: str) -> int:
+    """
+    Écart de longueur toléré entre un mot de la requête et un mot indexé :
+    aucun sous 3 lettres (correspondance exacte), 1 jusqu'à 5 lettres, 2 au-delà.
+    Évite qu'un mot court ne ramène tous les mots qui commencent pareil.
+    """
+    if len(mot) <= 2:
+        return 0
+    return 1 if len(mot) <= 5 else 2
+
+
+class TrigramIndex:
+    """
+    Vocabulaire indexé par trigrammes, et listes triées des livres de chaque mot
+    (array d'entiers 32 bits). Les mots de chaque livre sont conservés pour le
+    retirer sans relire la base.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._vocabulaire: Dict[str, int] = {}
+        self._mots: List[str] = []  # mot complété ("  mot "), par identifiant
+        self._tailles = array("H")  # nombre de trigrammes, par identifiant
+        # (trigramme, longueur du mot) -> identifiants de mots
+        self._trigrammes: Dict[Tuple[str, int], array] = {}
+        self._postings: List[array] = []  # identifiant de mot -> livre_id triés
+        self._livres: Dict[int, Tuple[int, ...]] = {}  # livre_id -> identifiants de mots
+        # Modifications reçues pendant une reconstruction, rejouées à la fin
+        self._journal: Optional[List[Tuple[int, Optional[Tuple[str, str]]]]] = None
+        self.derniere_reconstruction: Optional[datetime] = None
+        self.duree_reconstruction: Optional[float] = None
+
+    # --- Écriture ---
+
+    def _id_mot(self, mot: str) -> int:
+        mot_id = self._vocabulaire.get(mot)
+        if mot_id is None:
+            mot_id = len(self._mots)
+            self._vocabulaire[mot] = mot_id
+            self._mots.append(f"  {mot} ")
+            tri = trigrammes(mot)
+            self._tailles.append(len(tri))
+            self._postings.append(array("i"))
+            for t in tri:
+                self._trigrammes.setdefault((t, len(mot)), array("i")).append(mot_id)
+        return mot_id
+
+    def _ajouter(self, livre_id: int, titre: str, auteur: str) -> None:
+        ids = tuple(self._id_mot(m) for m in mots(f"{titre} {auteur}"))
+        self._livres[livre_id] = ids
+        for mot_id in ids:
+            posting = self._postings[mot_id]
+            if not posting or posting[-1] < livre_id:
+                posting.append(livre_id)
+            else:
+                bisect.insort(posting, livre_id)
+
+    def _retirer(self, livre_id: int) -> None:
+        # Les mots devenus inutilisés restent dans le vocabulaire (liste vide)
+        for mot_id in self._livres.pop(livre_id, ()):
+            posting = self._postings[mot_id]
+            i = bisect.bisect_left(posting, livre_id)
+            if i < len(posting) and posting[i] == livre_id:
+                del posting[i]
+
+    def appliquer(self, changements: Iterable[Tuple[int, Optional[Tuple[str, str]]]]) -> None:
+        """Applique des changements (livre_id, (titre, auteur)) ; None retire le livre"""
+        with self._lock:
+            for livre_id, textes in changements:
+                self._retirer(livre_id)
+                if textes is not None:
+                    self._ajouter(livre_id, *textes)
+                if self._journal is not None:
+                    self._journal.append((livre_id, textes))
+
+    def charger(self, livres: Iterable[Tuple[int, Optional[str], Optional[str]]]) -> Dict:
+        """
+        Remplace tout l'index par les livres (livre_id, titre, auteur) fournis.
+        Les recherches continuent sur l'ancien index pendant la construction.
+        """
+        start = time.perf_counter()
+        nouveau = TrigramIndex()
+        with self._lock:
+            self._journal = []
+        try:
+            for livre_id, titre, auteur in livres:
+                nouveau._ajouter(livre_id, titre or "", auteur or "")
+        except BaseException:
+            with self._lock:
+                self._journal = None
+            raise
+
+        with self._lock:
+            journal, self._journal = self._journal, None
+            self._vocabulaire = nouveau._vocabulaire
+            self._mots = nouveau._mots
+            self._tailles = nouveau._tailles
+            self._trigrammes = nouveau._trigrammes
+            self._postings = nouveau._postings
+            self._livres = nouveau._livres
+            self.appliquer(journal)
+            self.derniere_reconstruction = datetime.now()
+            self.duree_reconstruction = time.perf_counter() - start
+
+        logger.info(
+            "Index trigrammes reconstruit : %d livres en %.2fs",
+            len(self._livres),
+            self.duree_reconstruction,
+        )
+        return self.stats()
+
+    def reconstruire(self, db: Session, chunk_size: int = CHUNK_SIZE) -> Dict:
+        """Recharge l'index depuis la table livres, par lots de chunk_size lignes"""
+
+        def _lire():
+            last_id = 0
+            while True:
+                rows = db.execute(
+                    select(models.Livre.livre_id, models.Livre.titre, models.Livre.auteur)
+                    .where(models.Livre.livre_id > last_id)
+                    .order_by(models.Livre.livre_id)
+                    .limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+                yield from rows
+                last_id = rows[-1].livre_id
+
+        try:
+            return self.charger(_lire())
+        finally:
+            db.rollback()
+
+    # --- Lecture ---
+
+    def _mots_proches(self, mot: str) -> Dict[int, float]:
+        """
+        Mots du vocabulaire dont la similarité avec `mot` atteint SEUIL_MOT et dont
+        la longueur est compatible avec une faute de frappe (voir ecart_longueur)
+        """
+        ecart = ecart_longueur(mot)
+        if ecart == 0:
+            mot_id = self._vocabulaire.get(mot)
+            return {mot_id: 1.0} if mot_id is not None and self._postings[mot_id] else {}
+
+        # Listes des mots de longueur compatible, par trigramme de la requête
+        longueurs = range(len(mot) - ecart, len(mot) + ecart + 1)
+        listes = {
+            t: [self._trigrammes.get((t, longueur), _VIDE) for longueur in longueurs]
+            for t in trigrammes(mot)
+        }
+        tri = sorted(listes, key=lambda t: sum(len(ids) for ids in listes[t]))
+        n = len(tri)
+        # Filtrage par préfixe : un mot assez proche partage forcément l'un des
+        # (n - minimum + 1) trigrammes les plus rares ; les autres sont vérifiés ensuite
+        minimum = max(1, math.ceil(SEUIL_MOT * n))
+        rares = n - minimum + 1
+        communs = tri[rares:]
+        compteur = Counter()
+        for t in tri[:rares]:
+            for ids in listes[t]:
+                compteur.update(ids)
+
+        proches = {}
+        for mot_id, commun in compteur.items():
+            taille = self._tailles[mot_id]
+            # Borne haute de la similarité, avant de vérifier les trigrammes communs
+            borne = commun + len(communs)
+            if borne < SEUIL_MOT * (n + taille - borne):
+                continue
+            complete = self._mots[mot_id]
+            commun += sum(t in complete for t in communs)
+            similarite = commun / (n + taille - commun)
+            if similarite >= SEUIL_MOT and self._postings[mot_id]:
+                proches[mot_id] = similarite
+        return proches
+
+    def rechercher(
+        self, q: str, limit: int = 20, seuil: float = SEUIL_DEFAUT
+    ) -> List[Tuple[int, float]]:
+        """
+        Livres dont le titre ou l'auteur ressemble à `q` avec un score d'au moins `seuil`.
+
+        Returns:
+            [(livre_id, score)] du meilleur au moins bon score, puis par livre_id
+        """
+        requete = mots(q)[:MAX_MOTS_REQUETE]
+        if not requete or limit <= 0:
+            return []
+
+        with self._lock:
+            proches = [self._mots_proches(m) for m in requete]
+
+            # Un seul mot : le score est la similarité du mot le plus proche
+            if len(requete) == 1:
+                return self._top_un_mot(proches[0], limit, seuil)
+
+            # Poids IDF du mot le plus proche : "de", "la"... comptent peu
+            total_livres = max(1, len(self._livres))
+            poids = []
+            for candidats in proches:
+                frequence = 0
+                if candidats:
+                    meilleur = max(candidats, key=lambda m: (candidats[m], len(self._postings[m])))
+                    frequence = len(self._postings[meilleur])
+                poids.append(math.log(1 + total_livres / (1 + frequence)))
+            total = sum(poids)
+
+            scores = self._scores_ponderes(proches, poids, limit, seuil * total)
+
+        meilleurs = heapq.nsmallest(limit, ((-score, livre_id) for livre_id, score in scores.items()))
+        return [(livre_id, round(-score / total, 4)) for score, livre_id in meilleurs]
+
+    def _scores_ponderes(
+        self, proches: List[Dict[int, float]], poids: List[float], limit: int, minimum: float
+    ) -> Dict[int, float]:
+        """
+        Scores pondérés (non normalisés) des livres pouvant entrer dans le top `limit`.
+
+        Les mots sont traités du plus discriminant au moins discriminant (élagage
+        MaxScore) : dès qu'un livre absent des mots déjà traités ne peut plus
+        atteindre le seuil courant (score minimal, ou `limit`-ième meilleur score
+        partiel), les mots restants ne font que compléter les scores des candidats.
+        """
+        ordre = sorted(range(len(proches)), key=lambda i: -poids[i])
+        restant = sum(poids)
+        seuil = minimum
+        scores: Dict[int, float] = {}
+
+        for i in ordre:
+            poids_mot = poids[i]
+            restant -= poids_mot
+            candidats = proches[i]
+            if not candidats:
+                continue
+            max_sim = max(candidats.values())
+
+            determinant = poids_mot * max_sim + restant >= seuil
+            if not determinant:
+                # Seuls les candidats qui peuvent encore atteindre le seuil sont complétés
+                plafond = seuil - poids_mot * max_sim - restant
+                scores = {l: s for l, s in scores.items() if s >= plafond}
+
+            taille = sum(len(self._postings[mot_id]) for mot_id in candidats)
+            if determinant or taille < 20 * len(scores):
+                # Contribution pondérée par livre, construite en C (la plus forte écrase)
+                contributions: Dict[int, float] = {}
+                for mot_id, similarite in sorted(candidats.items(), key=lambda item: item[1]):
+                    contributions.update(dict.fromkeys(self._postings[mot_id], poids_mot * similarite))
+                for livre_id in scores.keys() & contributions.keys():
+                    scores[livre_id] += contributions.pop(livre_id)
+                if determinant:
+                    # Mot encore déterminant : ses autres livres deviennent candidats
+                    scores.update(contributions)
+            else:
+                # Peu de candidats face à des listes longues : on lit les mots du livre
+                for livre_id in scores:
+                    similarite = max(
+                        (candidats.get(mot_id, 0.0) for mot_id in self._livres[livre_id]), default=0.0
+                    )
+                    if similarite:
+                        scores[livre_id] += poids_mot * similarite
+
+            if len(scores) >= limit:
+                seuil = max(seuil, heapq.nlargest(limit, scores.values())[-1])
+
+        return {livre_id: score for livre_id, score in scores.items() if score >= minimum}
+
+    def _top_un_mot(self, proches: Dict[int, float], limit: int, seuil: float) -> List[Tuple[int, float]]:
+        """
+        Parcourt les niveaux de similarité décroissants ; les listes étant triées
+        par livre_id, il suffit de lire le début de chacune.
+        """
+        resultats = []
+        vus = set()
+        niveaux = sorted(proches.items(), key=lambda item: -item[1])
+        for similarite, groupe in groupby(niveaux, key=lambda item: item[1]):
+            if similarite < seuil:
+                break
+            for livre_id in heapq.merge(*(self._postings[mot_id] for mot_id, _ in groupe)):
+                if livre_id in vus:
+                    continue
+                vus.add(livre_id)
+                resultats.append((livre_id, round(similarite, 4)))
+                if len(resultats) >= limit:
+                    return resultats
+        return resultats
+
+    def stats(self) -> Dict:
+        """Taille de l'index et durée de la dernière reconstruction"""
+        with self._lock:
+            octets_vocabulaire = (
+                sys.getsizeof(self._vocabulaire)
+                + sys.getsizeof(self._mots)
+                + sys.getsizeof(self._tailles)
+                + sum(2 * sys.getsizeof(m) for m in self._mots)
+                + sys.getsizeof(self._trigrammes)
+                + sum(sys.getsizeof(t) + sys.getsizeof(p) for t, p in self._trigrammes.items())
+            )
+            octets_postings = sys.getsizeof(self._postings) + sum(
+                sys.getsizeof(p) for p in self._postings
+            )
+            octets_livres = sys.getsizeof(self._livres) + sum(
+                sys.getsizeof(ids) for ids in self._livres.values()
+            )
+            stats = {
+                "livres": len(self._livres),
+                "mots": len(self._mots),
+                "trigrammes": len({t for t, _ in self._trigrammes}),
+                "entrees": sum(len(p) for p in self._postings),
+            }
+
+        return {
+            **stats,
+            "memoire_octets": octets_vocabulaire + octets_postings + octets_livres,
+            "memoire_vocabulaire_octets": octets_vocabulaire,
+            "memoire_postings_octets": octets_postings,
+            "memoire_livres_octets": octets_livres,
+            "derniere_reconstruction": self.derniere_reconstruction.isoformat()
+            if self.derniere_reconstruction
+            else None,
+            "duree_reconstruction_s": round(self.duree_reconstruction, 3)
+            if self.duree_reconstruction is not None
+            else None,
+        }
+
+
+index = TrigramIndex()
+
+
+def charger_index() -> Dict:
+    """Construit l'index au démarrage (ou à la demande) depuis une session dédiée"""
+    db = SessionLocal()
+    try:
+        return index.reconstruire(db)
+    finally:
+        db.close()
+
+
+# --- Synchronisation avec les écritures ---
+
+
+def on_livres_written(db: Session, livres: List[models.Livre]) -> None:
+    """
+    Hook on_write des routes /livres : l'index sera mis à jour après le commit.
+    Les livres pas encore insérés sont relevés au flush, une fois leur livre_id connu.
+    Accepte aussi des instances détachées construites à partir des lignes insérées (bulk).
+    """
+    en_attente = db.info.setdefault(_EN_ATTENTE, {})
+    for livre in livres:
+        if livre.livre_id is None:
+            db.info.setdefault(_ECRITS, []).append(livre)
+        else:
+            en_attente[livre.livre_id] = _valeurs(db, livre)
+
+
+def _valeurs(db: Session, livre: models.Livre) -> Optional[Tuple[str, str]]:
+    etat = inspect(livre)
+    if livre in db.deleted or etat.deleted or etat.was_deleted:
+        return None
+    return (livre.titre or "", livre.auteur or "")
+
+
+@event.listens_for(Session, "after_flush")
+def _relever_livres(session: Session, flush_context) -> None:
+    livres = session.info.pop(_ECRITS, None)
+    if not livres:
+        return
+    en_attente = session.info.setdefault(_EN_ATTENTE, {})
+    for livre in livres:
+        en_attente[livre.livre_id] = _valeurs(session, livre)
+
+
+@event.listens_for(Session, "after_commit")
+def _appliquer_livres(session: Session) -> None:
+    en_attente = session.info.pop(_EN_ATTENTE, None)
+    if en_attente:
+        index.appliquer(en_attente.items())
+
+
+@event.listens_for(Session, "after_rollback")
+def _annuler_livres(session: Session) -> None:
+    session.info.pop(_ECRITS, None)
+    session.info.pop(_EN_ATTENTE, None)
@@ -1,13 +1,37 @@
 """
 Fonctions utilitaires pour l'authentification
 Centralise le hashage des mots de passe pour garantir la cohérence
+
+Le travail bcrypt des routes passe par un pool de threads dédié et borné :
+une rafale de connexions ne consomme pas le threadpool des lectures, et au-delà
+de la file d'attente autorisée la requête est refusée (503) au lieu d'attendre.
 """
 
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
 from passlib.context import CryptContext
 
 # Configuration unique du contexte de hashage
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "16"))
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", "2"))
+# Utilisateurs par POST /utilisateurs/bulk : leurs hash passent ensemble par la file du pool
+MAX_BULK_UTILISATEURS = int(os.getenv("MAX_BULK_UTILISATEURS", str(HASH_QUEUE_LIMIT)))
+
+# Bornes (en secondes) de l'histogramme de latence
+HASH_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class HashingSaturated(Exception):
+    """Le pool bcrypt et sa file d'attente sont pleins"""
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Vérifie qu'un mot de passe correspond au hash"""
@@ -17,3 +41,91 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     """Hash un mot de passe"""
     return pwd_context.hash(password)
+
+
+class HashMetrics:
+    """Compteurs du pool bcrypt (lus par /admin/hashing)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = 0  # en cours + en file
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.wait_seconds = 0.0
+        self.hash_seconds = 0.0
+        self.hash_seconds_max = 0.0
+        self.buckets = [0] * (len(HASH_LATENCY_BUCKETS) + 1)
+
+    def observe(self, waited: float, duration: float) -> None:
+        with self.lock:
+            self.completed += 1
+            self.wait_seconds += waited
+            self.hash_seconds += duration
+            self.hash_seconds_max = max(self.hash_seconds_max, duration)
+            for i, bound in enumerate(HASH_LATENCY_BUCKETS):
+                if duration <= bound:
+                    self.buckets[i] += 1
+                    break
+            else:
+                self.buckets[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            completed = self.completed or 1
+            return {
+                "workers": HASH_WORKERS,
+                "queue_limit": HASH_QUEUE_LIMIT,
+                "in_flight": min(self.pending, HASH_WORKERS),
+                "queue_depth": max(0, self.pending - HASH_WORKERS),
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "avg_wait_ms": round(self.wait_seconds / completed * 1000, 2),
+                "avg_hash_ms": round(self.hash_seconds / completed * 1000, 2),
+                "max_hash_ms": round(self.hash_seconds_max * 1000, 2),
+                "hash_latency_buckets": {
+                    **{f"le_{b}": n for b, n in zip(HASH_LATENCY_BUCKETS, self.buckets)},
+                    "le_inf": self.buckets[-1],
+                },
+            }
+
+
+hash_metrics = HashMetrics()
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+
+
+def _timed(fn, submitted_at: float, *args):
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        hash_metrics.observe(started - submitted_at, time.perf_counter() - started)
+
+
+def _release(_future) -> None:
+    with hash_metrics.lock:
+        hash_metrics.pending -= 1
+
+
+async def _run_bounded(fn, *args):
+    with hash_metrics.lock:
+        if hash_metrics.pending >= HASH_WORKERS + HASH_QUEUE_LIMIT:
+            hash_metrics.rejected += 1
+            raise HashingSaturated()
+        hash_metrics.pending += 1
+        hash_metrics.submitted += 1
+    # Libéré à la fin du calcul, même si la requête est annulée entre-temps
+    future = _executor.submit(_timed, fn, time.perf_counter(), *args)
+    future.add_done_callback(_release)
+    return await asyncio.wrap_future(future)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password exécuté dans le pool bcrypt borné"""
+    return await _run_bounded(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash exécuté dans le pool bcrypt borné"""
+    return await _run_bounded(get_password_hash, password)
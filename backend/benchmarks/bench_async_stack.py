@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark comparatif des piles sync (pymysql + threadpool) et async (aiomysql)
+
+Simule des requêtes lentes (SELECT SLEEP) et mesure combien peuvent attendre
+MySQL en même temps. La pile sync passe par run_in_threadpool, donc par le
+limiteur AnyIO (40 jetons par défaut) ; la pile async n'occupe aucun thread.
+
+Usage (depuis backend/, avec la base MySQL du docker-compose démarrée) :
+    python -m benchmarks.bench_async_stack --requests 200 --sleep 0.2
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import ASYNC_DATABASE_URL, DATABASE_URL, run_db
+
+
+class Colors:
+    GREEN = "\033[92m"
+    YELLOW = "\033[93m"
+    CYAN = "\033[96m"
+    RESET = "\033[0m"
+    BOLD = "\033[1m"
+
+
+def slow_query(db, seconds: float):
+    return db.execute(text("SELECT SLEEP(:s)"), {"s": seconds}).scalar()
+
+
+async def run_stack(session_factory, requests: int, seconds: float) -> float:
+    """Lance `requests` requêtes lentes simultanées et retourne la durée totale"""
+
+    async def one():
+        if isinstance(session_factory, async_sessionmaker):
+            async with session_factory() as db:
+                await run_db(db, slow_query, seconds)
+        else:
+            db = session_factory()
+            try:
+                await run_db(db, slow_query, seconds)
+            finally:
+                db.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return time.perf_counter() - start
+
+
+def report(name: str, elapsed: float, requests: int, seconds: float):
+    # Concurrence effective : combien de requêtes attendaient MySQL en parallèle
+    concurrency = requests * seconds / elapsed
+    print(
+        f"{Colors.BOLD}{name:<6}{Colors.RESET} {elapsed:7.2f}s  "
+        f"{requests / elapsed:8.1f} req/s  concurrence effective ≈ {concurrency:6.1f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--sleep", type=float, default=0.2, help="durée de la requête lente (s)")
+    args = parser.parse_args()
+
+    # Pools dimensionnés au-delà de la charge : seul le modèle d'exécution est mesuré
+    pool = {"pool_size": args.requests, "max_overflow": 0}
+    sync_engine = create_engine(DATABASE_URL, **pool)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool)
+
+    print(f"{Colors.CYAN}{args.requests} requêtes simultanées, SLEEP({args.sleep}){Colors.RESET}")
+    try:
+        elapsed = await run_stack(sessionmaker(bind=sync_engine), args.requests, args.sleep)
+        report("sync", elapsed, args.requests, args.sleep)
+        elapsed = await run_stack(
+            async_sessionmaker(async_engine, expire_on_commit=False), args.requests, args.sleep
+        )
+        report("async", elapsed, args.requests, args.sleep)
+    finally:
+        sync_engine.dispose()
+        await async_engine.dispose()
+
+    print(
+        f"{Colors.YELLOW}La pile sync plafonne au nombre de jetons du threadpool AnyIO ; "
+        f"la pile async n'est limitée que par le pool de connexions.{Colors.RESET}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
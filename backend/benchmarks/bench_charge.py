@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Test de charge de l'API : charges mixtes, latences p50/p95/p99 et débit par route
+
+L'application est démarrée dans le processus (uvicorn dans un thread, port local libre)
+sur la base configurée, peuplée de données marquées CHARGE puis nettoyée. Des clients
+simultanés (httpx) jouent quatre scénarios pendant --duree secondes :
+- catalogue : pages de /livres/ (curseur), détail d'un livre, recherche, catégories
+- connexions : rafale de POST /login (pool bcrypt, 503 attendus à saturation)
+- emprunts : création d'un emprunt puis retour, exemplaire indisponible entre les deux
+- notifications : GET /notifications/mes-notifications par des élèves connectés
+
+Le résultat est écrit en JSON (--sortie) ; avec --baseline, chaque route est comparée
+à un résultat précédent et le script échoue si le p95 ou le débit régressent au-delà
+de --tolerance.
+
+Usage (depuis backend/, base migrée et initialisée) :
+    python -m benchmarks.bench_charge --duree 30 --sortie charge.json
+    python -m benchmarks.bench_charge --duree 30 --baseline charge.json
+    DATABASE_URL=sqlite:///charge.db python -m benchmarks.bench_charge --duree 30
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+# Avant l'import de l'application : pas de job de fond pendant la mesure
+os.environ.setdefault("NOTIFICATION_DIGEST_JOB", "false")
+
+import httpx
+import uvicorn
+from sqlalchemy import delete, insert, select
+
+from app import models, notifications
+from app.database import SessionLocal, engine
+from app.main import app
+from app.pagination import NEXT_CURSOR_HEADER
+from app.utils import get_password_hash
+
+TAG = "CHARGE"
+MOT_DE_PASSE = "charge-123"
+ADMIN = {"email": "admin@library.com", "password": "admin123"}
+MOTS_RECHERCHE = ("mémoires", "voyage", "histoire", "jardin", "nuit", "ville")
+# En dessous, les centiles d'une route sont trop bruités pour être comparés
+MIN_REQUETES_COMPARAISON = 50
+# Paramètres qui doivent être identiques pour comparer deux résultats
+PARAMETRES_CHARGE = ("duree", "catalogue", "connexions", "emprunts", "notifications", "livres", "utilisateurs")
+
+
+class Colors:
+    GREEN = "\033[92m"
+    YELLOW = "\033[93m"
+    RED = "\033[91m"
+    CYAN = "\033[96m"
+    RESET = "\033[0m"
+    BOLD = "\033[1m"
+
+
+# --- Données ---
+
+
+def seed(db, nb_livres: int, nb_utilisateurs: int, rng: random.Random) -> Dict[str, list]:
+    """Catalogue, élèves (même mot de passe) et emprunts ouverts, marqués par TAG"""
+    today = date.today()
+    groupe_id = db.execute(select(models.Groupe.groupe_id).where(models.Groupe.nom == "Eleve")).scalar()
+    statut_id = db.execute(select(models.Statut.statut_id).where(models.Statut.nom == "En cours")).scalar()
+    categorie_ids = db.execute(select(models.Categorie.categorie_id)).scalars().all()
+    etat_id = db.execute(select(models.Etat.etat_id)).scalars().first()
+    departement_id = db.execute(select(models.Departement.departement_id)).scalars().first()
+
+    password = get_password_hash(MOT_DE_PASSE)
+    db.execute(
+        insert(models.Utilisateur),
+        [
+            {"nom": TAG, "prenom": str(i), "email": f"{TAG.lower()}_{i}@example.com", "password": password,
+             "departement_id": departement_id, "groupe_id": groupe_id}
+            for i in range(nb_utilisateurs)
+        ],
+    )
+    db.execute(
+        insert(models.Livre),
+        [
+            {
+                "titre": f"{rng.choice(MOTS_RECHERCHE).capitalize()} {TAG} n°{i}",
+                "auteur": TAG,
+                "categorie_id": rng.choice(categorie_ids),
+                "resume": f"Un livre sur {rng.choice(MOTS_RECHERCHE)} et {rng.choice(MOTS_RECHERCHE)}.",
+                "isbn": f"{TAG}-{i}",
+                "annee_publication": rng.randint(1900, 2025),
+                "editeur": TAG,
+            }
+            for i in range(nb_livres)
+        ],
+    )
+    user_ids = db.execute(
+        select(models.Utilisateur.utilisateurs_id).where(models.Utilisateur.nom == TAG)
+    ).scalars().all()
+    livre_ids = db.execute(select(models.Livre.livre_id).where(models.Livre.auteur == TAG)).scalars().all()
+    db.execute(
+        insert(models.Exemplaire),
+        [
+            {"livre_id": livre_id, "etat_id": etat_id, "disponible": True, "date_ajout": today}
+            for livre_id in livre_ids
+            for _ in range(2)
+        ],
+    )
+    exemplaire_ids = db.execute(
+        select(models.Exemplaire.exemplaire_id).where(models.Exemplaire.livre_id.in_(livre_ids))
+    ).scalars().all()
+    # Un quart des exemplaires est déjà emprunté (retards, rappels J-5 et J-30 inclus)
+    ouverts = exemplaire_ids[: len(exemplaire_ids) // 4]
+    db.execute(
+        insert(models.Emprunt),
+        [
+            {
+                "exemplaire_id": exemplaire_id,
+                "utilisateur_id": user_ids[i % len(user_ids)],
+                "date_emprunt": today - timedelta(days=20),
+                "date_retour_prevu": today + timedelta(days=rng.choice((-3, 5, 12, 30))),
+                "statut_id": statut_id,
+            }
+            for i, exemplaire_id in enumerate(ouverts)
+        ],
+    )
+    db.execute(
+        models.Exemplaire.__table__.update()
+        .where(models.Exemplaire.exemplaire_id.in_(ouverts))
+        .values(disponible=False)
+    )
+    db.commit()
+    notifications.reconstruire_digests(db)
+    return {
+        "livres": livre_ids,
+        "utilisateurs": user_ids,
+        "exemplaires_libres": exemplaire_ids[len(ouverts):],
+        "statut_en_cours": statut_id,
+        "statut_rendu": db.execute(
+            select(models.Statut.statut_id).where(models.Statut.nom == "Rendu à temps")
+        ).scalar(),
+    }
+
+
+def cleanup(db) -> None:
+    user_ids = select(models.Utilisateur.utilisateurs_id).where(models.Utilisateur.nom == TAG)
+    livre_ids = select(models.Livre.livre_id).where(models.Livre.auteur == TAG)
+    exemplaire_ids = select(models.Exemplaire.exemplaire_id).where(models.Exemplaire.livre_id.in_(livre_ids))
+    db.execute(delete(models.Emprunt).where(models.Emprunt.exemplaire_id.in_(exemplaire_ids)))
+    db.execute(delete(models.Emprunt).where(models.Emprunt.utilisateur_id.in_(user_ids)))
+    db.execute(delete(models.NotificationDigest).where(models.NotificationDigest.utilisateur_id.in_(user_ids)))
+    db.execute(delete(models.Exemplaire).where(models.Exemplaire.livre_id.in_(livre_ids)))
+    db.execute(delete(models.Livre).where(models.Livre.auteur == TAG))
+    db.execute(delete(models.Utilisateur).where(models.Utilisateur.nom == TAG))
+    db.commit()
+
+
+# --- Serveur ---
+
+
+def port_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Serveur:
+    """uvicorn dans un thread du processus (pas de gestion des signaux hors thread principal)"""
+
+    def __init__(self, port: int):
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+# --- Scénarios ---
+
+
+class Mesures:
+    """Durées et statuts par route, pour les requêtes lancées après l'échauffement"""
+
+    def __init__(self, debut: float, fin: float):
+        self.debut, self.fin = debut, fin
+        self.durees: Dict[str, List[float]] = defaultdict(list)
+        self.statuts: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    @property
+    def duree(self) -> float:
+        return self.fin - self.debut
+
+    async def appel(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs) -> httpx.Response:
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        if start >= self.debut:
+            self.durees[route].append((time.perf_counter() - start) * 1000)
+            self.statuts[route][response.status_code] += 1
+        return response
+
+
+async def catalogue(client, mesures: Mesures, donnees, rng: random.Random, headers):
+    while time.perf_counter() < mesures.fin:
+        action = rng.random()
+        if action < 0.4:
+            # Parcours de quelques pages par curseur, tri par titre une fois sur deux
+            tri = "&sort=titre" if rng.random() < 0.5 else ""
+            curseur = ""
+            for _ in range(rng.randint(1, 4)):
+                response = await mesures.appel(
+                    client, "GET /livres/", "GET", f"/livres/?limit=50{tri}", params={"cursor": curseur}
+                )
+                curseur = response.headers.get(NEXT_CURSOR_HEADER)
+                if not curseur:
+                    break
+        elif action < 0.75:
+            await mesures.appel(client, "GET /livres/{item_id}", "GET", f"/livres/{rng.choice(donnees['livres'])}")
+        elif action < 0.95:
+            await mesures.appel(client, "GET /livres/search", "GET", f"/livres/search?q={rng.choice(MOTS_RECHERCHE)}")
+        else:
+            await mesures.appel(client, "GET /categories/", "GET", "/categories/")
+
+
+async def connexions(client, mesures: Mesures, donnees, rng: random.Random, headers):
+    while time.perf_counter() < mesures.fin:
+        i = rng.randrange(len(donnees["utilisateurs"]))
+        await mesures.appel(
+            client, "POST /login", "POST", "/login",
+            json={"email": f"{TAG.lower()}_{i}@example.com", "password": MOT_DE_PASSE},
+        )
+
+
+async def emprunts(client, mesures: Mesures, donnees, rng: random.Random, headers, exemplaires):
+    today = date.today()
+    while time.perf_counter() < mesures.fin:
+        exemplaire_id = exemplaires.pop()
+        response = await mesures.appel(
+            client, "POST /emprunts/", "POST", "/emprunts/", headers=headers,
+            json={
+                "exemplaire_id": exemplaire_id,
+                "utilisateur_id": rng.choice(donnees["utilisateurs"]),
+                "date_emprunt": today.isoformat(),
+                "date_retour_prevu": (today + timedelta(days=21)).isoformat(),
+                "statut_id": donnees["statut_en_cours"],
+            },
+        )
+        await mesures.appel(client, "PATCH /exemplaires/{item_id}", "PATCH", f"/exemplaires/{exemplaire_id}",
+                            headers=headers, json={"disponible": False})
+        if response.status_code == 201:
+            await mesures.appel(
+                client, "PATCH /emprunts/{item_id}", "PATCH", f"/emprunts/{response.json()['emprunt_id']}",
+                headers=headers,
+                json={"date_retour_effectue": today.isoformat(), "statut_id": donnees["statut_rendu"]},
+            )
+        await mesures.appel(client, "PATCH /exemplaires/{item_id}", "PATCH", f"/exemplaires/{exemplaire_id}",
+                            headers=headers, json={"disponible": True})
+        exemplaires.insert(0, exemplaire_id)
+
+
+async def notifications_eleves(client, mesures: Mesures, donnees, rng: random.Random, headers):
+    while time.perf_counter() < mesures.fin:
+        await mesures.appel(
+            client, "GET /notifications/mes-notifications", "GET", "/notifications/mes-notifications",
+            headers=rng.choice(headers),
+        )
+
+
+async def jouer(base_url: str, donnees, args) -> Mesures:
+    rng = random.Random(args.seed)
+    total = args.catalogue + args.connexions + args.emprunts + args.notifications
+    limites = httpx.Limits(max_connections=total, max_keepalive_connections=total)
+    async with httpx.AsyncClient(base_url=base_url, limits=limites, timeout=60) as client:
+        # Jetons obtenus hors mesure
+        admin = (await client.post("/login", json=ADMIN)).json()["access_token"]
+        admin_headers = {"Authorization": f"Bearer {admin}"}
+        eleves = []
+        for i in range(min(args.notifications * 4, len(donnees["utilisateurs"]))):
+            response = await client.post(
+                "/login", json={"email": f"{TAG.lower()}_{i}@example.com", "password": MOT_DE_PASSE}
+            )
+            eleves.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+
+        # Chaque client d'emprunt a ses propres exemplaires : pas de conflit entre clients
+        libres = list(donnees["exemplaires_libres"])
+        parts = [libres[i :: max(args.emprunts, 1)] for i in range(args.emprunts)]
+
+        debut = time.perf_counter() + args.echauffement
+        mesures = Mesures(debut, debut + args.duree)
+
+        def hasard() -> random.Random:
+            return random.Random(rng.random())
+
+        await asyncio.gather(
+            *[catalogue(client, mesures, donnees, hasard(), None) for _ in range(args.catalogue)],
+            *[connexions(client, mesures, donnees, hasard(), None) for _ in range(args.connexions)],
+            *[emprunts(client, mesures, donnees, hasard(), admin_headers, parts[i]) for i in range(args.emprunts)],
+            *[notifications_eleves(client, mesures, donnees, hasard(), eleves) for _ in range(args.notifications)],
+        )
+    return mesures
+
+
+# --- Résultats ---
+
+
+def centile(valeurs: List[float], p: float) -> float:
+    return valeurs[max(0, math.ceil(p * len(valeurs)) - 1)]
+
+
+def resumer(mesures: Mesures) -> Dict[str, dict]:
+    routes = {}
+    for route, durees in sorted(mesures.durees.items()):
+        durees = sorted(durees)
+        statuts = mesures.statuts[route]
+        routes[route] = {
+            "requetes": len(durees),
+            "erreurs": sum(n for code, n in statuts.items() if code >= 400),
+            "statuts": {str(code): n for code, n in sorted(statuts.items())},
+            "req_s": round(len(durees) / mesures.duree, 1),
+            "p50_ms": round(centile(durees, 0.50), 2),
+            "p95_ms": round(centile(durees, 0.95), 2),
+            "p99_ms": round(centile(durees, 0.99), 2),
+            "moyenne_ms": round(sum(durees) / len(durees), 2),
+        }
+    return routes
+
+
+def commit_git() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def afficher(routes: Dict[str, dict]) -> None:
+    print(f"\n{'route':<38} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erreurs':>8}")
+    for route, r in routes.items():
+        couleur = Colors.RED if r["erreurs"] else ""
+        print(
+            f"{route:<38} {r['req_s']:8.1f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f} "
+            f"{couleur}{r['erreurs']:8d}{Colors.RESET}"
+        )
+
+
+def comparer(resultat: dict, reference: dict, tolerance: float) -> int:
+    """Affiche l'écart au résultat de référence ; retourne le nombre de régressions"""
+    print(f"\n{Colors.BOLD}Comparaison à la référence du {reference['date']} "
+          f"(tolérance {tolerance:.0%}){Colors.RESET}")
+    differences = [
+        f"{cle} {reference['config'].get(cle)} → {resultat['config'].get(cle)}"
+        for cle in PARAMETRES_CHARGE
+        if reference["config"].get(cle) != resultat["config"].get(cle)
+    ]
+    if reference["base"] != resultat["base"]:
+        differences.append(f"base {reference['base']} → {resultat['base']}")
+    if differences:
+        print(f"{Colors.YELLOW}Charge différente de la référence : {', '.join(differences)}{Colors.RESET}")
+    routes, baseline = resultat["routes"], reference["routes"]
+    print(f"{'route':<38} {'Δ req/s':>9} {'Δ p95':>9} {'Δ p99':>9}")
+    regressions = 0
+    for route, r in routes.items():
+        ref = baseline.get(route)
+        if not ref:
+            print(f"{route:<38} {'(nouvelle route)':>29}")
+            continue
+        if min(r["requetes"], ref["requetes"]) < MIN_REQUETES_COMPARAISON:
+            print(f"{route:<38} {'(trop peu de requêtes)':>29}")
+            continue
+        ecart = lambda cle: (r[cle] - ref[cle]) / ref[cle] if ref[cle] else 0.0  # noqa: E731
+        regresse = ecart("req_s") < -tolerance or ecart("p95_ms") > tolerance
+        regressions += regresse
+        couleur = Colors.RED if regresse else Colors.GREEN
+        print(
+            f"{route:<38} {couleur}{ecart('req_s'):+9.1%} {ecart('p95_ms'):+9.1%} {ecart('p99_ms'):+9.1%}"
+            f"{Colors.RESET}"
+        )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duree", type=float, default=30, help="durée mesurée (s)")
+    parser.add_argument("--echauffement", type=float, default=3, help="durée écartée au début (s)")
+    parser.add_argument("--catalogue", type=int, default=16, help="clients du scénario catalogue")
+    parser.add_argument("--connexions", type=int, default=4, help="clients du scénario login")
+    parser.add_argument("--emprunts", type=int, default=4, help="clients du scénario emprunts")
+    parser.add_argument("--notifications", type=int, default=8, help="clients du scénario notifications")
+    parser.add_argument("--livres", type=int, default=2000)
+    parser.add_argument("--utilisateurs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sortie", help="fichier JSON des résultats")
+    parser.add_argument("--baseline", help="résultat JSON de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="régression tolérée (0.10 = 10 %%)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        cleanup(db)
+        print(f"{Colors.CYAN}Peuplement : {args.livres} livres, {args.utilisateurs} élèves...{Colors.RESET}")
+        donnees = seed(db, args.livres, args.utilisateurs, random.Random(args.seed))
+        total = args.catalogue + args.connexions + args.emprunts + args.notifications
+        print(f"{Colors.CYAN}{total} clients pendant {args.duree:.0f} s (+{args.echauffement:.0f} s "
+              f"d'échauffement) sur {engine.dialect.name}{Colors.RESET}")
+        with Serveur(port_libre()) as serveur:
+            mesures = asyncio.run(jouer(f"http://127.0.0.1:{serveur.server.config.port}", donnees, args))
+    finally:
+        cleanup(db)
+        db.close()
+
+    routes = resumer(mesures)
+    afficher(routes)
+    resultat = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit_git(),
+        "base": engine.dialect.name,
+        "python": platform.python_version(),
+        "config": vars(args),
+        "duree_s": round(mesures.duree, 2),
+        "total_req_s": round(sum(r["requetes"] for r in routes.values()) / mesures.duree, 1),
+        "routes": routes,
+    }
+    print(f"\n{Colors.BOLD}Total : {resultat['total_req_s']} req/s{Colors.RESET}")
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as f:
+            json.dump(resultat, f, indent=2, ensure_ascii=False)
+        print(f"Résultats écrits dans {args.sortie}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            reference = json.load(f)
+        regressions = comparer(resultat, reference, args.tolerance)
+        if regressions:
+            print(f"{Colors.RED}{regressions} route(s) en régression{Colors.RESET}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Débit de l'import du catalogue (app/importation.py) sur la base configurée
+
+Génère un fichier CSV de N livres (ISBN uniques, `--exemplaires` exemplaires chacun)
+et l'importe en flux, pour chaque taille de lot : lignes, livres et exemplaires par
+seconde, et requêtes SQL par lot (constantes : un executemany par table et la
+relecture des ids, jamais une requête par ligne). Affiche aussi le chemin suivi par
+bulk.inserer pour obtenir les ids (sur MySQL : innodb_autoinc_lock_mode).
+
+Les livres et exemplaires créés sont supprimés à la fin.
+
+Usage (depuis backend/) :
+    docker exec fastapi-backend python -m benchmarks.bench_import --lignes 100000
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.bench_import --chunks 500,2000
+"""
+
+import argparse
+import csv
+import io
+import logging
+import time
+import uuid
+
+from sqlalchemy import delete, event, select, text
+
+from app import importation, models, referentiel
+from app.database import SessionLocal, engine
+
+
+class Colors:
+    GREEN = "\033[92m"
+    CYAN = "\033[96m"
+    RESET = "\033[0m"
+    BOLD = "\033[1m"
+
+
+EDITEUR = "BENCH-IMPORT"
+
+
+def fichier(lignes: int, exemplaires: int, categorie_id: int, prefixe: str) -> bytes:
+    texte = io.StringIO()
+    writer = csv.writer(texte)
+    writer.writerow(["titre", "auteur", "categorie", "isbn", "annee_publication", "editeur", "exemplaires"])
+    for i in range(lignes):
+        writer.writerow([f"Livre {i}", f"Auteur {i % 997}", categorie_id, f"{prefixe}-{i}", 2000, EDITEUR, exemplaires])
+    return texte.getvalue().encode()
+
+
+def mode_ids() -> str:
+    """Chemin de bulk.inserer pour les livres sur la base configurée"""
+    if engine.dialect.name == "sqlite":
+        return "sqlite (ids depuis last_insert_rowid)"
+    if engine.dialect.insert_executemany_returning:
+        return f"{engine.dialect.name} (RETURNING)"
+    with engine.connect() as conn:
+        mode = conn.execute(text("SELECT @@innodb_autoinc_lock_mode")).scalar()
+    return f"mysql, innodb_autoinc_lock_mode={mode} (ids relus par isbn)"
+
+
+def nettoyer() -> None:
+    with SessionLocal() as db:
+        livres = select(models.Livre.livre_id).where(models.Livre.editeur == EDITEUR)
+        db.execute(delete(models.Exemplaire).where(models.Exemplaire.livre_id.in_(livres)))
+        db.execute(delete(models.Livre).where(models.Livre.editeur == EDITEUR))
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lignes", type=int, default=20000)
+    parser.add_argument("--exemplaires", type=int, default=2, help="exemplaires par livre")
+    parser.add_argument("--chunks", default="500,1000,5000", help="tailles de lot, séparées par des virgules")
+    args = parser.parse_args()
+    logging.getLogger(importation.__name__).setLevel(logging.ERROR)
+
+    categorie_id = next(iter(referentiel.registre.elements("categories")))
+    requetes = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def compter(*_):
+        requetes[0] += 1
+
+    print(
+        f"{Colors.CYAN}{args.lignes} livres, {args.exemplaires} exemplaire(s) chacun — {mode_ids()}{Colors.RESET}\n"
+        f"{'lot':>6} {'durée s':>8} {'lignes/s':>9} {'livres/s':>9} {'exempl./s':>10} {'SQL/lot':>8} {'erreurs':>8}"
+    )
+    try:
+        for chunk_size in (int(c) for c in args.chunks.split(",")):
+            contenu = fichier(args.lignes, args.exemplaires, categorie_id, uuid.uuid4().hex[:8])
+            requetes[0] = 0
+            start = time.perf_counter()
+            for evenement in importation.importer(io.BytesIO(contenu), "csv", chunk_size):
+                resume = evenement
+            duree = time.perf_counter() - start
+            lots = -(-args.lignes // chunk_size)
+            print(
+                f"{Colors.BOLD}{chunk_size:>6}{Colors.RESET} {duree:8.2f} {resume['lignes'] / duree:9.0f} "
+                f"{resume['livres_crees'] / duree:9.0f} {resume['exemplaires_crees'] / duree:10.0f} "
+                f"{requetes[0] / lots:8.1f} {resume['erreurs']:8d}"
+            )
+            nettoyer()
+    finally:
+        nettoyer()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Surcoût de l'instrumentation Prometheus (app/metriques.py)
+
+- HTTP : une application ASGI minimale appelée directement, avec et sans
+  MetriquesMiddleware (la route est posée dans le scope comme le fait le routeur)
+- SQL : les deux événements before/after_cursor_execute appelés directement, hors
+  requête HTTP, dans une requête, et avec la détection des N+1 (SQL_N1_DETECTION) ;
+  le budget porte sur ce coût, mesuré sans bruit. Pour information, SELECT 1 sur
+  SQLite en mémoire sans les événements puis avec (écart du même ordre que le bruit)
+
+Échoue (code 1) si un surcoût dépasse son budget.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_metriques --iterations 200000
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from starlette.routing import Route
+
+from app import metriques
+
+
+class Colors:
+    GREEN = "\033[92m"
+    RED = "\033[91m"
+    CYAN = "\033[96m"
+    RESET = "\033[0m"
+    BOLD = "\033[1m"
+
+
+ROUTE = Route("/livres/{item_id:int}", lambda request: None)
+START = {"type": "http.response.start", "status": 200, "headers": []}
+BODY = {"type": "http.response.body", "body": b"{}"}
+
+
+async def application(scope, receive, send):
+    scope["route"] = ROUTE
+    await send(START)
+    await send(BODY)
+
+
+async def envoyer(message):
+    pass
+
+
+async def boucle_http(app, iterations: int) -> float:
+    """Durée moyenne (µs) d'un appel de l'application"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        await app({"type": "http", "method": "GET", "path": f"/livres/{i}"}, None, envoyer)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def boucle_sql(conn, iterations: int) -> float:
+    requete = text("SELECT 1")
+    start = time.perf_counter()
+    for _ in range(iterations):
+        conn.execute(requete).scalar()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+EVENEMENTS = (
+    ("before_cursor_execute", metriques._avant_execution),
+    ("after_cursor_execute", metriques._apres_execution),
+)
+
+
+def boucle_evenements(iterations: int) -> float:
+    """Durée moyenne (µs) des deux événements d'une instruction, appelés directement"""
+    avant, apres = metriques._avant_execution, metriques._apres_execution
+    contexte = object()
+    start = time.perf_counter()
+    for i in range(iterations):
+        avant(None, None, "SELECT 1", (i,), contexte, False)
+        apres(None, None, "SELECT 1", (i,), contexte, False)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def dans_requete(fn, *args, details: bool = False):
+    jeton = metriques._requete_courante.set(metriques.RequeteSQL(details=details))
+    try:
+        return fn(*args)
+    finally:
+        metriques._requete_courante.reset(jeton)
+
+
+def meilleur(mesures):
+    # Meilleure passe : écarte le bruit du GC et de l'ordonnanceur
+    return min(mesures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--passes", type=int, default=5)
+    parser.add_argument("--budget-us", type=float, default=5.0, help="surcoût HTTP acceptable")
+    parser.add_argument("--budget-sql-us", type=float, default=1.0, help="surcoût SQL acceptable")
+    args = parser.parse_args()
+
+    instrumentee = metriques.MetriquesMiddleware(application)
+    # Passes alternées : une dérive de la machine touche les deux variantes
+    nue, avec = [], []
+    for _ in range(args.passes):
+        nue.append(asyncio.run(boucle_http(application, args.iterations)))
+        avec.append(asyncio.run(boucle_http(instrumentee, args.iterations)))
+    surcout_http = meilleur(avec) - meilleur(nue)
+
+    hors, dans, details = [], [], []
+    for _ in range(args.passes):
+        hors.append(boucle_evenements(args.iterations))
+        dans.append(dans_requete(boucle_evenements, args.iterations))
+        details.append(dans_requete(boucle_evenements, args.iterations, details=True))
+    surcout_sql = meilleur(dans)
+
+    engine = create_engine("sqlite://")
+    n = args.iterations // 10
+    with engine.connect() as conn:
+        sans_evenements, avec_evenements = [], []
+        for _ in range(args.passes):
+            for nom, fn in EVENEMENTS:
+                event.remove(Engine, nom, fn)
+            try:
+                sans_evenements.append(boucle_sql(conn, n))
+            finally:
+                for nom, fn in EVENEMENTS:
+                    event.listen(Engine, nom, fn)
+            avec_evenements.append(dans_requete(boucle_sql, conn, n))
+
+    print(f"{Colors.CYAN}{args.iterations} requêtes HTTP, {n} requêtes SQL, {args.passes} passes{Colors.RESET}")
+    print(f"  HTTP sans middleware           {meilleur(nue):6.2f} µs")
+    print(f"  HTTP avec middleware           {meilleur(avec):6.2f} µs")
+    print(f"  Événements SQL hors requête    {meilleur(hors):6.2f} µs")
+    print(f"  Événements SQL dans requête    {meilleur(dans):6.2f} µs")
+    print(f"  Événements SQL avec N+1        {meilleur(details):6.2f} µs")
+    print(f"  SELECT 1 sans événements       {meilleur(sans_evenements):6.2f} µs")
+    print(f"  SELECT 1 dans une requête      {meilleur(avec_evenements):6.2f} µs")
+    ok_http = surcout_http <= args.budget_us
+    ok_sql = surcout_sql <= args.budget_sql_us
+    for nom, surcout, budget, ok in (
+        ("requête HTTP", surcout_http, args.budget_us, ok_http),
+        ("requête SQL", surcout_sql, args.budget_sql_us, ok_sql),
+    ):
+        couleur = Colors.GREEN if ok else Colors.RED
+        print(f"{Colors.BOLD}Surcoût par {nom} : {couleur}{surcout:.2f} µs{Colors.RESET} (budget {budget} µs)")
+    return 0 if ok_http and ok_sql else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la taille du pool de connexions face au débit
+
+Reproduit la pile sync : N threads (40 par défaut, les jetons du threadpool AnyIO)
+empruntent chacun une connexion, exécutent une requête de durée fixe, la rendent.
+Pour chaque configuration taille+débordement : débit, latence p50/p95, attente
+moyenne et max d'une connexion, connexions ouvertes (le débordement est refermé
+à chaque retour et rouvert ensuite).
+
+Par défaut sur SQLite avec une latence MySQL simulée (fonction SLEEP, coût
+d'ouverture de connexion) ; --url pour viser le serveur MySQL (SELECT SLEEP).
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_pool --configs 5+10,10+0,10+30,20+20,40+0 --requetes 4000
+    docker exec fastapi-backend python -m benchmarks.bench_pool --url "$DB_URL"
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from sqlalchemy import create_engine, event, text
+
+from app import connexions
+
+
+class Colors:
+    GREEN = "\033[92m"
+    YELLOW = "\033[93m"
+    CYAN = "\033[96m"
+    RESET = "\033[0m"
+    BOLD = "\033[1m"
+
+
+def moteur(url: str, taille: int, debordement: int, connexion_ms: float):
+    options = {**connexions.options(), "pool_size": taille, "max_overflow": debordement, "pool_timeout": 60}
+    if url:
+        return connexions.surveiller(create_engine(url, **options), f"{taille}+{debordement}")
+
+    chemin = os.path.join(tempfile.gettempdir(), "bench_pool.db")
+    engine = create_engine(f"sqlite:///{chemin}", connect_args={"check_same_thread": False}, **options)
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        # Poignée de main TCP + authentification MySQL
+        time.sleep(connexion_ms / 1000)
+        dbapi_connection.create_function("SLEEP", 1, lambda s: time.sleep(s) or 0)
+
+    return connexions.surveiller(engine, f"{taille}+{debordement}")
+
+
+def executer(engine, requetes: int, concurrence: int, latence: float) -> Tuple[float, List[float]]:
+    def une() -> float:
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT SLEEP(:s)"), {"s": latence}).scalar()
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrence) as executor:
+        durees = list(executor.map(lambda _: une(), range(requetes)))
+    return time.perf_counter() - start, durees
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--configs", default="5+10,10+0,10+30,20+20,40+0",
+                        help="taille+débordement, séparés par des virgules")
+    parser.add_argument("--requetes", type=int, default=4000)
+    parser.add_argument("--concurrence", type=int, default=40, help="threads (jetons AnyIO)")
+    parser.add_argument("--latence-ms", type=float, default=5.0, help="durée de chaque requête")
+    parser.add_argument("--connexion-ms", type=float, default=3.0,
+                        help="coût d'ouverture simulé (SQLite uniquement)")
+    parser.add_argument("--url", help="base MySQL (défaut : SQLite avec latence simulée)")
+    args = parser.parse_args()
+    # Les attentes lentes sont attendues ici : seul le tableau final compte
+    logging.getLogger(connexions.__name__).setLevel(logging.ERROR)
+
+    print(
+        f"{Colors.CYAN}{args.requetes} requêtes de {args.latence_ms} ms, "
+        f"{args.concurrence} threads{Colors.RESET}\n"
+        f"{'config':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'attente moy':>12} {'attente max':>12} {'ouvertures':>11}"
+    )
+    for config in args.configs.split(","):
+        taille, debordement = (int(x) for x in config.split("+"))
+        engine = moteur(args.url, taille, debordement, args.connexion_ms)
+        executer(engine, taille + debordement, args.concurrence, 0)  # préchauffage
+        engine.pool.metrics = connexions.PoolMetrics(config)
+        try:
+            duree, durees = executer(engine, args.requetes, args.concurrence, args.latence_ms / 1000)
+        finally:
+            stats = engine.pool.metrics.snapshot(engine.pool)
+            engine.dispose()
+        durees.sort()
+        couleur = Colors.GREEN if stats["avg_wait_ms"] < args.latence_ms / 10 else Colors.YELLOW
+        print(
+            f"{Colors.BOLD}{config:>8}{Colors.RESET} {args.requetes / duree:9.0f} "
+            f"{statistics.median(durees):8.2f} {durees[int(len(durees) * 0.95)]:8.2f} "
+            f"{durees[int(len(durees) * 0.99)]:8.2f} "
+            f"{couleur}{stats['avg_wait_ms']:9.2f} ms{Colors.RESET} {stats['max_wait_ms']:9.2f} ms "
+            f"{stats['connects']:11d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
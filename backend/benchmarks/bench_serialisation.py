@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark des deux chemins des routes de liste CRUD (pages de GET /livres/ et /emprunts/)
+
+- ORM : instances SQLAlchemy, validation Pydantic (from_attributes) et dump_json,
+  comme le fait FastAPI avec response_model
+- Rapide : SELECT Core des colonnes du schéma et sérialiseur précompilé orjson
+
+Chaque page est produite par les deux chemins et comparée octet pour octet.
+Par défaut sur une base SQLite en mémoire (la part MySQL est alors minimale, ce qui
+isole le coût de la couche Python) ; --url pour viser une autre base déjà migrée.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_serialisation --lignes 20000 --page 100 --repetitions 200
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app import models, schemas, serialisation
+from app.database import Base
+
+
+class Colors:
+    GREEN = "\033[92m"
+    RED = "\033[91m"
+    CYAN = "\033[96m"
+    RESET = "\033[0m"
+    BOLD = "\033[1m"
+
+
+def peupler(db: Session, n: int, rng: random.Random) -> None:
+    """Catalogue et emprunts synthétiques (accents, résumés absents, retours partiels)"""
+    db.execute(insert(models.Categorie), [{"nom": f"Catégorie {i}"} for i in range(10)])
+    db.execute(insert(models.Etat), [{"nom": "Neuf"}])
+    db.execute(insert(models.Statut), [{"nom": "En cours"}])
+    db.execute(insert(models.Departement), [{"nom": "Lettres"}])
+    db.execute(insert(models.Groupe), [{"nom": "Eleve"}])
+    db.execute(
+        insert(models.Utilisateur),
+        [
+            {"nom": f"Nom {i}", "prenom": "Élise", "email": f"u{i}@example.com", "password": "x",
+             "departement_id": 1, "groupe_id": 1}
+            for i in range(100)
+        ],
+    )
+    db.execute(
+        insert(models.Livre),
+        [
+            {
+                "titre": f"Mémoires d'un livre n°{i}",
+                "auteur": f"Auteur {rng.randint(1, 5000)}",
+                "categorie_id": rng.randint(1, 10),
+                "resume": None if i % 3 else "Un résumé « typographié » de quelques mots.",
+                "isbn": f"978-{i:010d}",
+                "annee_publication": rng.randint(1900, 2026),
+                "editeur": "Éditions du Benchmark",
+            }
+            for i in range(n)
+        ],
+    )
+    db.execute(
+        insert(models.Exemplaire),
+        [{"livre_id": i + 1, "etat_id": 1, "disponible": True, "date_ajout": date(2024, 1, 1)} for i in range(n)],
+    )
+    debut = date(2024, 1, 1)
+    db.execute(
+        insert(models.Emprunt),
+        [
+            {
+                "exemplaire_id": rng.randint(1, n),
+                "utilisateur_id": rng.randint(1, 100),
+                "date_emprunt": debut + timedelta(days=i % 600),
+                "date_retour_prevu": debut + timedelta(days=i % 600 + 30),
+                "date_retour_effectue": None if i % 4 else debut + timedelta(days=i % 600 + 20),
+                "statut_id": 1,
+            }
+            for i in range(n)
+        ],
+    )
+    db.commit()
+
+
+def chemin_orm(db: Session, model, adapter: TypeAdapter, offset: int, taille: int) -> bytes:
+    pk = model.__mapper__.primary_key[0]
+    items = db.query(model).order_by(pk).offset(offset).limit(taille).all()
+    return adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+
+
+def chemin_rapide(db: Session, model, serialiseur, offset: int, taille: int) -> bytes:
+    pk = model.__mapper__.primary_key[0]
+    lignes = db.execute(select(*serialiseur.colonnes).order_by(pk).offset(offset).limit(taille)).all()
+    return serialiseur.encoder(lignes)
+
+
+def mesurer(fn, repetitions: int, pages: List[int]) -> List[float]:
+    durees = []
+    for i in range(repetitions):
+        start = time.perf_counter()
+        fn(pages[i % len(pages)])
+        durees.append((time.perf_counter() - start) * 1000)
+    return durees
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lignes", type=int, default=20000)
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--repetitions", type=int, default=200)
+    parser.add_argument("--url", help="base déjà migrée et peuplée (défaut : SQLite en mémoire)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.url:
+        engine = create_engine(args.url)
+    else:
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            print(f"{Colors.CYAN}Peuplement : {args.lignes} livres et emprunts...{Colors.RESET}")
+            peupler(db, args.lignes, random.Random(args.seed))
+
+    ressources = [
+        ("livres", models.Livre, schemas.LivreResponse),
+        ("emprunts", models.Emprunt, schemas.EmpruntResponse),
+    ]
+    echecs = 0
+    with Session(engine) as db:
+        total = db.query(models.Livre).count()
+        pages = [offset for offset in range(0, max(total - args.page, 1), args.page)][:50]
+        for nom, model, schema in ressources:
+            adapter = TypeAdapter(List[schema])
+            serialiseur = serialisation.compiler(model, schema)
+
+            identiques = all(
+                chemin_orm(db, model, adapter, offset, args.page)
+                == chemin_rapide(db, model, serialiseur, offset, args.page)
+                for offset in pages
+            )
+            echecs += not identiques
+
+            orm = mesurer(lambda o: chemin_orm(db, model, adapter, o, args.page), args.repetitions, pages)
+            rapide = mesurer(lambda o: chemin_rapide(db, model, serialiseur, o, args.page), args.repetitions, pages)
+            statut = f"{Colors.GREEN}identique{Colors.RESET}" if identiques else f"{Colors.RED}DIFFÉRENT{Colors.RESET}"
+            print(f"\n{Colors.BOLD}GET /{nom}/ ({args.page} lignes par page){Colors.RESET} - sortie {statut}")
+            for libelle, durees in (("ORM + Pydantic", orm), ("Core + orjson", rapide)):
+                durees.sort()
+                print(
+                    f"  {libelle:<15} p50 {statistics.median(durees):6.2f} ms   "
+                    f"p95 {durees[int(len(durees) * 0.95)]:6.2f} ms"
+                )
+            print(f"  gain (p50)      x{statistics.median(orm) / statistics.median(rapide):.1f}")
+
+    return 1 if echecs else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark de l'index trigrammes (recherche approximative sur titre et auteur)
+
+Construit l'index sur un catalogue synthétique, sans base de données, puis mesure
+la durée de construction, la mémoire occupée et la latence des recherches
+(requêtes avec fautes de frappe), ainsi que le coût d'une mise à jour incrémentale.
+
+Usage (depuis backend/) :
+    python -m benchmarks.bench_trigrammes --livres 500000 --requetes 500
+"""
+
+import argparse
+from itertools import accumulate
+import random
+import statistics
+import time
+
+from app.trigrammes import SEUIL_DEFAUT, TrigramIndex
+
+LIAISONS = ["le", "la", "les", "de", "des", "du", "et", "au", "sous", "dans", "l", "d"]
+SYLLABES = (
+    "ba be bi bo bu ca ce ci co cu da de di do du fa fe fi fo la le li lo lu ma me mi mo "
+    "na ne ni no pa pe pi po ra re ri ro ru sa se si so ta te ti to tu va ve vi vo "
+    "an en in on ar er ir or al el il ol ch ou ai eau ien tion ette ard ier"
+).split()
+
+
+class Colors:
+    GREEN = "\033[92m"
+    CYAN = "\033[96m"
+    RESET = "\033[0m"
+    BOLD = "\033[1m"
+
+
+def mot_aleatoire(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABES) for _ in range(rng.randint(2, 4)))
+
+
+def catalogue(n: int, rng: random.Random):
+    """
+    Catalogue synthétique : mots de liaison très fréquents, vocabulaire de titres
+    suivant une loi de Zipf-Mandelbrot (le mot le plus courant figure dans environ
+    1 % des titres, longue traîne), noms d'auteurs variés
+    """
+    vocabulaire = [mot_aleatoire(rng) for _ in range(max(1000, n // 8))]
+    noms = [mot_aleatoire(rng).capitalize() for _ in range(max(1000, n // 5))]
+    prenoms = [mot_aleatoire(rng).capitalize() for _ in range(500)]
+    cumul = list(accumulate(1 / (rang + 50) for rang in range(len(vocabulaire))))
+    for livre_id in range(1, n + 1):
+        tires = rng.choices(vocabulaire, cum_weights=cumul, k=rng.randint(1, 5))
+        titre = " ".join(w if i % 2 == 0 else f"{rng.choice(LIAISONS)} {w}" for i, w in enumerate(tires))
+        auteur = f"{rng.choice(prenoms)} {rng.choice(noms)}"
+        yield livre_id, titre.capitalize(), auteur
+
+
+def faute(texte: str, rng: random.Random) -> str:
+    """Inverse deux lettres voisines (faute de frappe typique)"""
+    if len(texte) < 4:
+        return texte
+    i = rng.randrange(1, len(texte) - 2)
+    return texte[:i] + texte[i + 1] + texte[i] + texte[i + 2 :]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--livres", type=int, default=500000)
+    parser.add_argument("--requetes", type=int, default=500)
+    parser.add_argument("--seuil", type=float, default=SEUIL_DEFAUT)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    livres = list(catalogue(args.livres, rng))
+    index = TrigramIndex()
+    stats = index.charger(livres)
+    print(f"{Colors.BOLD}{Colors.CYAN}Index trigrammes, {args.livres} livres{Colors.RESET}")
+    print(f"  construction : {stats['duree_reconstruction_s']:.2f}s")
+    print(f"  vocabulaire  : {stats['mots']} mots, {stats['trigrammes']} trigrammes, {stats['entrees']} entrées")
+    print(f"  mémoire      : {stats['memoire_octets'] / 2**20:.1f} Mio")
+
+    # Requêtes avec une faute de frappe : nom d'auteur, auteur complet, titre complet
+    requetes = []
+    for n in range(args.requetes):
+        _, titre, auteur = rng.choice(livres)
+        source = [auteur.split()[-1], auteur, titre][n % 3]
+        requetes.append(faute(source, rng))
+
+    latences = []
+    trouves = 0
+    for q in requetes:
+        start = time.perf_counter()
+        resultats = index.rechercher(q, limit=20, seuil=args.seuil)
+        latences.append((time.perf_counter() - start) * 1000)
+        trouves += bool(resultats)
+
+    print(
+        f"  recherche    : p50 {statistics.median(latences):.2f} ms  "
+        f"p95 {percentile(latences, 0.95):.2f} ms  p99 {percentile(latences, 0.99):.2f} ms  "
+        f"({trouves}/{len(requetes)} avec résultats)"
+    )
+
+    # Mise à jour incrémentale (hook after_commit des routes /livres)
+    start = time.perf_counter()
+    for livre_id, titre, auteur in livres[:1000]:
+        index.appliquer([(livre_id, (titre + " revu", auteur))])
+    duree = time.perf_counter() - start  # secondes pour 1000 livres = ms par livre
+    print(f"  mise à jour  : {duree:.3f} ms par livre")
+    print(f"{Colors.GREEN}Terminé{Colors.RESET}")
+
+
+if __name__ == "__main__":
+    main()
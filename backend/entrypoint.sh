@@ -5,6 +5,9 @@ echo "🔄 Attente de la base de données..."
 # Attendre que MySQL soit prêt
 sleep 10
 
+echo "🗄️  Migrations du schéma..."
+alembic upgrade head
+
 echo "🚀 Initialisation de la base de données..."
 python init_db.py
 
@@ -0,0 +1,54 @@
+"""
+Script d'import du catalogue depuis un fichier fournisseur (CSV ou JSONL)
+Crée les livres absents (dédoublonnés sur l'ISBN) et leurs exemplaires
+
+Colonnes : titre, auteur, categorie (nom) ou categorie_id, isbn, annee_publication,
+editeur, resume (optionnel), exemplaires (défaut 1), etat (nom, défaut "Neuf"),
+date_ajout (défaut aujourd'hui)
+
+Usage :
+    python import_catalogue.py acquisitions.csv
+    python import_catalogue.py acquisitions.jsonl --chunk-size 2000
+"""
+
+import argparse
+import sys
+
+from app import importation
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("fichier")
+    parser.add_argument("--format", choices=importation.FORMATS, help="déduit de l'extension par défaut")
+    parser.add_argument("--chunk-size", type=int, default=importation.CHUNK_SIZE)
+    args = parser.parse_args()
+
+    format = args.format or importation.format_depuis_nom(args.fichier)
+    if format is None:
+        parser.error("format inconnu, préciser --format csv|jsonl")
+
+    resume = {}
+    with open(args.fichier, "rb") as flux:
+        for evenement in importation.importer(flux, format, args.chunk_size):
+            if evenement["type"] == "erreur":
+                ou = evenement.get("ligne") or "{}-{}".format(*evenement["lignes"])
+                print(f"❌ Ligne {ou} : {evenement['message']}", file=sys.stderr)
+            elif evenement["type"] == "progression":
+                print(
+                    f"⏳ {evenement['lignes']} lignes lues, {evenement['livres_crees']} livres créés, "
+                    f"{evenement['exemplaires_crees']} exemplaires créés"
+                )
+            else:
+                resume = evenement
+
+    print("✅ Import terminé")
+    print(f"   - {resume['lignes']} lignes lues")
+    print(f"   - {resume['livres_crees']} livres créés, {resume['livres_existants']} déjà présents")
+    print(f"   - {resume['exemplaires_crees']} exemplaires créés")
+    print(f"   - {resume['erreurs']} lignes en erreur")
+    return 1 if resume["erreurs"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
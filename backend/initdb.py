@@ -2,10 +2,12 @@
 Script d'initialisation de la base de données
 Crée les groupes, départements, états, statuts de base
 Et un utilisateur administrateur par défaut
+
+Le schéma doit exister : lancer `alembic upgrade head` avant ce script.
 """
 
 from sqlalchemy.orm import Session
-from app.database import SessionLocal, engine, Base
+from app.database import SessionLocal
 from app.models import Groupe, Departement, Etat, Statut, Categorie, Utilisateur
 from app.utils import get_password_hash
 
@@ -13,9 +15,6 @@ from app.utils import get_password_hash
 def init_db():
     """Initialise la base de données avec les données de base"""
 
-    # Créer les tables
-    Base.metadata.create_all(bind=engine)
-
     db = SessionLocal()
 
     try:
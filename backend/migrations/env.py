@@ -0,0 +1,67 @@
+"""
+Environnement Alembic : utilise le moteur et les modèles de l'application
+"""
+
+from logging.config import fileConfig
+
+from alembic import context
+
+from app import models  # noqa: F401  (enregistre les tables dans Base.metadata)
+from app.database import Base, engine
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """Génère le SQL sans connexion (alembic upgrade head --sql)"""
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _include_object_for(dialect_name: str):
+    def include_object(obj, name, type_, reflected, compare_to):
+        # Index réservés à un dialecte (ddl_if), ex. FULLTEXT MySQL : ignorés ailleurs
+        ddl_if = getattr(obj, "_ddl_if", None)
+        if type_ == "index" and ddl_if is not None and ddl_if.dialect:
+            return ddl_if.dialect == dialect_name
+        return True
+
+    return include_object
+
+
+def run_migrations_online() -> None:
+    with engine.connect() as connection:
+        sqlite = connection.dialect.name == "sqlite"
+        if sqlite:
+            # Le mode batch recrée les tables : clés étrangères vérifiées seulement après
+            connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            connection.commit()
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=_include_object_for(connection.dialect.name),
+            # ALTER TABLE en mode batch sur SQLite
+            render_as_batch=sqlite,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+        if sqlite:
+            connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+            connection.commit()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,129 @@
+"""Schéma initial (tables créées auparavant par Base.metadata.create_all)
+
+Chaque table n'est créée que si elle n'existe pas encore : une base déjà
+initialisée par create_all passe ainsi sous le contrôle d'Alembic sans stamp manuel.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES_REFERENCE = ["groupes", "etats", "categories", "statuts", "departements"]
+
+
+def _create_table(existing, name, *columns, pk_index=None):
+    if name in existing:
+        return
+    op.create_table(name, *columns)
+    if pk_index:
+        op.create_index(op.f(f"ix_{name}_{pk_index}"), name, [pk_index])
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    # Tables de référence (id + nom)
+    for name in TABLES_REFERENCE:
+        pk = f"{name[:-1]}_id"
+        _create_table(
+            existing,
+            name,
+            sa.Column(pk, sa.Integer(), nullable=False),
+            sa.Column("nom", sa.String(255)),
+            sa.PrimaryKeyConstraint(pk),
+            pk_index=pk,
+        )
+
+    _create_table(
+        existing,
+        "livres",
+        sa.Column("livre_id", sa.Integer(), nullable=False),
+        sa.Column("titre", sa.String(255)),
+        sa.Column("auteur", sa.String(255)),
+        sa.Column("categorie_id", sa.Integer()),
+        sa.Column("resume", sa.String(1000)),
+        sa.Column("isbn", sa.String(50)),
+        sa.Column("annee_publication", sa.Integer()),
+        sa.Column("editeur", sa.String(255)),
+        sa.ForeignKeyConstraint(["categorie_id"], ["categories.categorie_id"]),
+        sa.PrimaryKeyConstraint("livre_id"),
+        pk_index="livre_id",
+    )
+    _create_table(
+        existing,
+        "exemplaires",
+        sa.Column("exemplaire_id", sa.Integer(), nullable=False),
+        sa.Column("livre_id", sa.Integer()),
+        sa.Column("etat_id", sa.Integer()),
+        sa.Column("disponible", sa.Boolean()),
+        sa.Column("date_ajout", sa.Date()),
+        sa.ForeignKeyConstraint(["etat_id"], ["etats.etat_id"]),
+        sa.ForeignKeyConstraint(["livre_id"], ["livres.livre_id"]),
+        sa.PrimaryKeyConstraint("exemplaire_id"),
+        pk_index="exemplaire_id",
+    )
+    _create_table(
+        existing,
+        "utilisateurs",
+        sa.Column("utilisateurs_id", sa.Integer(), nullable=False),
+        sa.Column("nom", sa.String(255)),
+        sa.Column("prenom", sa.String(255)),
+        sa.Column("email", sa.String(255)),
+        sa.Column("password", sa.String(255)),
+        sa.Column("departement_id", sa.Integer()),
+        sa.Column("groupe_id", sa.Integer()),
+        sa.ForeignKeyConstraint(["departement_id"], ["departements.departement_id"]),
+        sa.ForeignKeyConstraint(["groupe_id"], ["groupes.groupe_id"]),
+        sa.PrimaryKeyConstraint("utilisateurs_id"),
+        sa.UniqueConstraint("email"),
+        pk_index="utilisateurs_id",
+    )
+    _create_table(
+        existing,
+        "emprunts",
+        sa.Column("emprunt_id", sa.Integer(), nullable=False),
+        sa.Column("exemplaire_id", sa.Integer()),
+        sa.Column("utilisateur_id", sa.Integer()),
+        sa.Column("date_emprunt", sa.Date()),
+        sa.Column("date_retour_prevu", sa.Date()),
+        sa.Column("date_retour_effectue", sa.Date(), nullable=True),
+        sa.Column("statut_id", sa.Integer()),
+        sa.ForeignKeyConstraint(["exemplaire_id"], ["exemplaires.exemplaire_id"]),
+        sa.ForeignKeyConstraint(["statut_id"], ["statuts.statut_id"]),
+        sa.ForeignKeyConstraint(["utilisateur_id"], ["utilisateurs.utilisateurs_id"]),
+        sa.PrimaryKeyConstraint("emprunt_id"),
+        pk_index="emprunt_id",
+    )
+    _create_table(
+        existing,
+        "notification_digest",
+        sa.Column("utilisateur_id", sa.Integer(), nullable=False),
+        sa.Column("date_calcul", sa.Date(), nullable=False),
+        sa.Column("contenu", sa.Text().with_variant(mysql.MEDIUMTEXT(), "mysql"), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["utilisateur_id"], ["utilisateurs.utilisateurs_id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("utilisateur_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("notification_digest")
+    op.drop_table("emprunts")
+    op.drop_table("utilisateurs")
+    op.drop_table("exemplaires")
+    op.drop_table("livres")
+    for name in reversed(TABLES_REFERENCE):
+        op.drop_table(name)
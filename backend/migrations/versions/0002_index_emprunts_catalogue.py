@@ -0,0 +1,50 @@
+"""Index composites des requêtes chaudes (notifications, isbn, disponibilité)
+
+- emprunts(date_retour_effectue, date_retour_prevu) : notifications de tous les utilisateurs
+- emprunts(utilisateur_id, date_retour_effectue) : notifications d'un utilisateur
+- livres(isbn) : recherche par ISBN
+- exemplaires(livre_id, disponible) : exemplaires disponibles d'un livre
+
+Chaque index est vérifié par test_indexes.py (EXPLAIN).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_emprunts_retour", "emprunts", ["date_retour_effectue", "date_retour_prevu"]
+    )
+    op.create_index(
+        "ix_emprunts_utilisateur_retour",
+        "emprunts",
+        ["utilisateur_id", "date_retour_effectue"],
+    )
+    op.create_index("ix_livres_isbn", "livres", ["isbn"])
+    op.create_index(
+        "ix_exemplaires_livre_disponible", "exemplaires", ["livre_id", "disponible"]
+    )
+
+
+def downgrade() -> None:
+    # MySQL supprime l'index implicite d'une clé étrangère quand un index composite
+    # la couvre : on en recrée un avant de retirer le composite.
+    op.create_index("ix_exemplaires_livre_id", "exemplaires", ["livre_id"])
+    op.create_index("ix_emprunts_utilisateur_id", "emprunts", ["utilisateur_id"])
+
+    op.drop_index("ix_exemplaires_livre_disponible", table_name="exemplaires")
+    op.drop_index("ix_livres_isbn", table_name="livres")
+    op.drop_index("ix_emprunts_utilisateur_retour", table_name="emprunts")
+    op.drop_index("ix_emprunts_retour", table_name="emprunts")
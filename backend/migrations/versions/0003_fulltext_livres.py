@@ -0,0 +1,39 @@
+"""Index FULLTEXT sur livres(titre, auteur, resume) pour /livres/search
+
+La table passe en utf8mb4_0900_ai_ci : collation insensible aux accents et à la
+casse, donc "geographie" trouve "Géographie". Sans effet hors MySQL.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "mysql":
+        return
+    op.execute(
+        "ALTER TABLE livres CONVERT TO CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci"
+    )
+    op.create_index(
+        "ft_livres_recherche",
+        "livres",
+        ["titre", "auteur", "resume"],
+        mysql_prefix="FULLTEXT",
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "mysql":
+        return
+    op.drop_index("ft_livres_recherche", table_name="livres")
@@ -0,0 +1,27 @@
+"""Index emprunts(date_emprunt) pour l'export de l'historique par période
+
+Sert le filtre et le tri de GET /emprunts/export (date_emprunt, emprunt_id) :
+InnoDB ajoute la clé primaire à l'index, le flux sort sans tri supplémentaire.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_emprunts_date_emprunt", "emprunts", ["date_emprunt"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_emprunts_date_emprunt", table_name="emprunts")
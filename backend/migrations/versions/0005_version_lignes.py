@@ -0,0 +1,43 @@
+"""Colonne version sur les tables des routes CRUD (ETags, GET conditionnels)
+
+Incrémentée par l'ORM à chaque UPDATE (version_id_col), 1 pour les lignes existantes.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = (
+    "groupes",
+    "etats",
+    "categories",
+    "statuts",
+    "departements",
+    "livres",
+    "exemplaires",
+    "utilisateurs",
+    "emprunts",
+)
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(
+            table, sa.Column("version", sa.Integer(), nullable=False, server_default="1")
+        )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_column(table, "version")
@@ -0,0 +1,39 @@
+"""Emails insensibles à la casse sous SQLite (collation NOCASE)
+
+Sous MySQL, la collation *_ci de la colonne fait déjà de "Alice@x.fr" et "alice@x.fr"
+le même compte (connexion, unicité). Sans effet hors SQLite.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _collation(collation: Union[str, None]) -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table("utilisateurs", recreate="always") as batch_op:
+        batch_op.alter_column(
+            "email",
+            existing_type=sa.String(255),
+            type_=sa.String(255, collation=collation),
+        )
+
+
+def upgrade() -> None:
+    _collation("NOCASE")
+
+
+def downgrade() -> None:
+    _collation(None)
@@ -0,0 +1,35 @@
+"""Index emprunts(exemplaire_id, date_retour_effectue, date_retour_prevu) pour la disponibilité
+
+Sert GET /livres/disponibilite : emprunts en cours de chaque exemplaire et prochaine date
+de retour, lus dans l'index seul. Sous MySQL, il remplace l'index créé implicitement pour
+la clé étrangère exemplaire_id.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_emprunts_exemplaire_retour",
+        "emprunts",
+        ["exemplaire_id", "date_retour_effectue", "date_retour_prevu"],
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "mysql":
+        # La clé étrangère exige un index commençant par exemplaire_id
+        op.create_index("exemplaire_id", "emprunts", ["exemplaire_id"])
+    op.drop_index("ix_emprunts_exemplaire_retour", table_name="emprunts")
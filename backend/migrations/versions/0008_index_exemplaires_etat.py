@@ -0,0 +1,38 @@
+"""Index exemplaires(livre_id, disponible, etat_id) pour le prêt d'un livre
+
+POST /emprunts/checkout verrouille le premier exemplaire disponible d'un livre, état par
+état (FOR UPDATE SKIP LOCKED, ORDER BY exemplaire_id LIMIT 1) : l'ordre vient de l'index,
+seule la ligne prêtée est verrouillée. Remplace exemplaires(livre_id, disponible), dont il
+garde les deux premières colonnes.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Créé avant la suppression : sous MySQL, la clé étrangère livre_id garde un index
+    op.create_index(
+        "ix_exemplaires_livre_disponible_etat",
+        "exemplaires",
+        ["livre_id", "disponible", "etat_id"],
+    )
+    op.drop_index("ix_exemplaires_livre_disponible", table_name="exemplaires")
+
+
+def downgrade() -> None:
+    op.create_index(
+        "ix_exemplaires_livre_disponible", "exemplaires", ["livre_id", "disponible"]
+    )
+    op.drop_index("ix_exemplaires_livre_disponible_etat", table_name="exemplaires")
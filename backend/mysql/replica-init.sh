@@ -0,0 +1,15 @@
+#!/bin/bash
+# Initialisation de la réplique : abonnement au binlog du primaire (service db)
+set -e
+
+mysql -uroot -p"$MYSQL_ROOT_PASSWORD" <<SQL
+CHANGE REPLICATION SOURCE TO
+    SOURCE_HOST='db',
+    SOURCE_USER='root',
+    SOURCE_PASSWORD='$MYSQL_ROOT_PASSWORD',
+    SOURCE_AUTO_POSITION=1,
+    GET_SOURCE_PUBLIC_KEY=1;
+START REPLICA;
+SQL
+
+echo "✅ Réplique abonnée au primaire (db)"
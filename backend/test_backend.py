@@ -746,6 +746,37 @@ class LibraryAPITester:
             )
             self.print_result(False, str(e))
 
+        # Test: Taille de page nulle en pagination par curseur
+        self.print_test("Validation", "Liste paginée avec limit=0", is_bonus=True)
+        try:
+            response = requests.get(
+                f"{BASE_URL}/livres/?cursor=&limit=0", headers=self.get_headers()
+            )
+            success = response.status_code == 422
+            self.results.append(
+                TestResult(
+                    "Validation",
+                    "Pagination limit=0",
+                    "Erreur 422 Validation Error",
+                    "Conforme" if success else "Non-Conforme",
+                    response.status_code,
+                    is_bonus=True,
+                )
+            )
+            self.print_result(success, f"Code: {response.status_code}")
+        except Exception as e:
+            self.results.append(
+                TestResult(
+                    "Validation",
+                    "Pagination limit=0",
+                    "Erreur 422 Validation Error",
+                    "Non-Conforme",
+                    error_message=str(e),
+                    is_bonus=True,
+                )
+            )
+            self.print_result(False, str(e))
+
     def test_rbac_permissions(self):
         """Tests des permissions RBAC par groupe [BONUS]"""
         self.print_header("TESTS BONUS - PERMISSIONS RBAC (CONTRÔLE D'ACCÈS)")
@@ -1141,6 +1172,73 @@ class LibraryAPITester:
             )
             self.print_result(False, str(e))
 
+    def test_bonus_etags(self):
+        """Tests des GET conditionnels (ETag / If-None-Match)"""
+        self.print_header("TESTS BONUS - CACHE HTTP (ETAG)")
+        livre_id = self.created_ids.get("livres", 1)
+        url = f"{BASE_URL}/livres/{livre_id}"
+
+        self.print_test("Cache", "GET /livres/id avec If-None-Match (304)", is_bonus=True)
+        try:
+            etag = requests.get(url, headers=self.get_headers()).headers.get("ETag")
+            response = requests.get(url, headers={**self.get_headers(), "If-None-Match": etag})
+            success = etag is not None and response.status_code == 304 and not response.content
+            self.results.append(
+                TestResult(
+                    "Cache",
+                    "GET conditionnel inchangé",
+                    "304 Not Modified sans corps",
+                    "Conforme" if success else "Non-Conforme",
+                    response.status_code,
+                    is_bonus=True,
+                )
+            )
+            self.print_result(success, f"Code: {response.status_code}, ETag: {etag}")
+        except Exception as e:
+            self.results.append(
+                TestResult(
+                    "Cache",
+                    "GET conditionnel inchangé",
+                    "304 Not Modified sans corps",
+                    "Non-Conforme",
+                    error_message=str(e),
+                    is_bonus=True,
+                )
+            )
+            self.print_result(False, str(e))
+            return
+
+        self.print_test("Cache", "PATCH puis GET avec l'ancien ETag (200)", is_bonus=True)
+        try:
+            requests.patch(url, headers=self.get_headers(), json={"editeur": "Éditeur ETag"})
+            response = requests.get(url, headers={**self.get_headers(), "If-None-Match": etag})
+            success = response.status_code == 200 and response.headers.get("ETag") != etag
+            self.results.append(
+                TestResult(
+                    "Cache",
+                    "GET conditionnel après modification",
+                    "200 OK avec un nouvel ETag",
+                    "Conforme" if success else "Non-Conforme",
+                    response.status_code,
+                    is_bonus=True,
+                )
+            )
+            self.print_result(
+                success, f"Code: {response.status_code}, ETag: {response.headers.get('ETag')}"
+            )
+        except Exception as e:
+            self.results.append(
+                TestResult(
+                    "Cache",
+                    "GET conditionnel après modification",
+                    "200 OK avec un nouvel ETag",
+                    "Non-Conforme",
+                    error_message=str(e),
+                    is_bonus=True,
+                )
+            )
+            self.print_result(False, str(e))
+
     def run_all_tests(self):
         """Exécute tous les tests"""
         print(f"{Colors.BOLD}{Colors.MAGENTA}")
@@ -1239,6 +1337,7 @@ class LibraryAPITester:
         self.test_bonus_security()
         self.test_bonus_validation()
         self.test_rbac_permissions()  # ← Nouveaux tests RBAC
+        self.test_bonus_etags()
 
         # Rapport final
         self.print_report()
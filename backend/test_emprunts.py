@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Script de test des prêts et retours atomiques
+(POST /emprunts/checkout, POST /emprunts/{id}/retour)
+
+Ce script, sur l'API démarrée :
+1. Vérifie le choix de l'exemplaire (meilleur état), le statut "En cours" et la
+   disponibilité de l'exemplaire après le prêt
+2. Vérifie les erreurs (exemplaire déjà prêté, inexistant, demande invalide)
+3. Lance des centaines de prêts simultanés du dernier exemplaire d'un livre :
+   un seul doit réussir, tous les autres reçoivent 409
+4. Lance des prêts simultanés sur un livre à plusieurs exemplaires : chacun est
+   prêté exactement une fois, et aucun prêt n'est refusé tant qu'il en reste
+5. Vérifie les retours : statut à temps / en retard, exemplaire libéré, retour
+   rejoué (y compris simultanément) sans effet
+6. Nettoie toutes les données de test à la fin
+
+Usage :
+    python test_emprunts.py [--concurrence 200]
+"""
+
+import argparse
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+import requests
+
+# Configuration
+BASE_URL = "http://localhost:8000"
+ADMIN_EMAIL = "admin@library.com"
+ADMIN_PASSWORD = "admin123"
+TAG = "EMPRUNTS-TEST"
+
+
+# Couleurs pour le terminal
+class Colors:
+    GREEN = "\033[92m"
+    RED = "\033[91m"
+    CYAN = "\033[96m"
+    RESET = "\033[0m"
+    BOLD = "\033[1m"
+
+
+def report(scenario: str, ok: bool, detail: str = "") -> bool:
+    status = f"{Colors.GREEN}✓ OK{Colors.RESET}" if ok else f"{Colors.RED}✗ ÉCHEC{Colors.RESET}"
+    print(f"{scenario}... {status}" + (f" - {detail}" if detail else ""))
+    return ok
+
+
+class EmpruntsTester:
+    def __init__(self, concurrence: int):
+        self.concurrence = concurrence
+        self.headers: Dict[str, str] = {}
+        self.utilisateur_id = None
+        self.etats: Dict[str, int] = {}
+        self.statuts: Dict[str, int] = {}
+        self.created = {"livres": [], "exemplaires": [], "emprunts": []}
+
+    # --- Données ---
+
+    def login(self) -> None:
+        response = requests.post(f"{BASE_URL}/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        self.utilisateur_id = requests.get(f"{BASE_URL}/me", headers=self.headers).json()["utilisateurs_id"]
+        for table, cible in (("etats", self.etats), ("statuts", self.statuts)):
+            for ligne in requests.get(f"{BASE_URL}/{table}/?limit=500", headers=self.headers).json():
+                cible[ligne["nom"]] = ligne[f"{table[:-1]}_id"]
+
+    def creer_livre(self, etats: List[str]) -> Tuple[int, List[int]]:
+        """Livre de test et ses exemplaires disponibles, dans l'ordre de `etats`"""
+        categorie_id = requests.get(f"{BASE_URL}/categories/?limit=1", headers=self.headers).json()[0]["categorie_id"]
+        n = len(self.created["livres"])
+        livre = requests.post(f"{BASE_URL}/livres/", headers=self.headers, json={
+            "titre": f"{TAG} {n}", "auteur": TAG, "categorie_id": categorie_id,
+            "isbn": f"{TAG}-{n}", "annee_publication": 2020, "editeur": TAG,
+        }).json()
+        self.created["livres"].append(livre["livre_id"])
+        exemplaires = []
+        for etat in etats:
+            exemplaire = requests.post(f"{BASE_URL}/exemplaires/", headers=self.headers, json={
+                "livre_id": livre["livre_id"], "etat_id": self.etats[etat],
+                "disponible": True, "date_ajout": date.today().isoformat(),
+            }).json()
+            exemplaires.append(exemplaire["exemplaire_id"])
+        self.created["exemplaires"].extend(exemplaires)
+        return livre["livre_id"], exemplaires
+
+    def checkout(self, session=requests, **demande) -> requests.Response:
+        response = session.post(
+            f"{BASE_URL}/emprunts/checkout",
+            headers=self.headers,
+            json={"utilisateur_id": self.utilisateur_id, **demande},
+        )
+        if response.status_code == 201:
+            self.created["emprunts"].append(response.json()["emprunt_id"])
+        return response
+
+    def retour(self, emprunt_id: int, session=requests) -> requests.Response:
+        return session.post(f"{BASE_URL}/emprunts/{emprunt_id}/retour", headers=self.headers)
+
+    def disponibilite(self, livre_id: int) -> dict:
+        return requests.get(f"{BASE_URL}/livres/disponibilite?ids={livre_id}").json()[0]
+
+    def cleanup(self) -> None:
+        for ressource in ("emprunts", "exemplaires", "livres"):
+            for item_id in reversed(self.created[ressource]):
+                requests.delete(f"{BASE_URL}/{ressource}/{item_id}", headers=self.headers)
+
+    # --- Scénarios ---
+
+    def test_choix_exemplaire(self) -> List[bool]:
+        livre_id, (abime, neuf, bon) = self.creer_livre(["Abîmé", "Neuf", "Bon"])
+        response = self.checkout(livre_id=livre_id)
+        emprunt = response.json() if response.status_code == 201 else {}
+        exemplaire = requests.get(f"{BASE_URL}/exemplaires/{neuf}", headers=self.headers).json()
+        resultats = [
+            report("Prêt par livre_id", response.status_code == 201, f"statut {response.status_code}"),
+            report("Exemplaire en meilleur état choisi", emprunt.get("exemplaire_id") == neuf,
+                   f"exemplaire {emprunt.get('exemplaire_id')}, attendu {neuf} (Neuf)"),
+            report("Statut \"En cours\"", emprunt.get("statut_id") == self.statuts["En cours"]),
+            report("Exemplaire indisponible après le prêt", exemplaire.get("disponible") is False),
+        ]
+        suivant = self.checkout(livre_id=livre_id).json().get("exemplaire_id")
+        resultats.append(report("Prêt suivant : état suivant", suivant == bon, f"exemplaire {suivant}, attendu {bon} (Bon)"))
+        return resultats
+
+    def test_erreurs(self) -> List[bool]:
+        livre_id, (exemplaire_id,) = self.creer_livre(["Bon"])
+        premier = self.checkout(exemplaire_id=exemplaire_id).status_code
+        deja_prete = self.checkout(exemplaire_id=exemplaire_id).status_code
+        epuise = self.checkout(livre_id=livre_id).status_code
+        inexistant = self.checkout(exemplaire_id=999999999).status_code
+        livre_inexistant = self.checkout(livre_id=999999999).status_code
+        invalide = self.checkout(exemplaire_id=exemplaire_id, livre_id=livre_id).status_code
+        return [
+            report("Prêt par exemplaire_id", premier == 201, f"statut {premier}"),
+            report("Exemplaire déjà prêté → 409", deja_prete == 409, f"statut {deja_prete}"),
+            report("Livre sans exemplaire libre → 409", epuise == 409, f"statut {epuise}"),
+            report("Exemplaire inexistant → 404", inexistant == 404, f"statut {inexistant}"),
+            report("Livre inexistant → 404", livre_inexistant == 404, f"statut {livre_inexistant}"),
+            report("exemplaire_id et livre_id ensemble → 422", invalide == 422, f"statut {invalide}"),
+        ]
+
+    def rafale(self, nombre: int, **demande) -> List[requests.Response]:
+        """`nombre` prêts lancés au même instant (barrière), une connexion HTTP par client"""
+        barriere = threading.Barrier(nombre)
+
+        def un():
+            with requests.Session() as session:
+                barriere.wait()
+                return self.checkout(session, **demande)
+
+        with ThreadPoolExecutor(max_workers=nombre) as executor:
+            return list(executor.map(lambda _: un(), range(nombre)))
+
+    def test_dernier_exemplaire(self) -> List[bool]:
+        resultats = []
+        for mode in ("livre_id", "exemplaire_id"):
+            livre_id, (exemplaire_id,) = self.creer_livre(["Bon"])
+            demande = {"livre_id": livre_id} if mode == "livre_id" else {"exemplaire_id": exemplaire_id}
+            statuts = [r.status_code for r in self.rafale(self.concurrence, **demande)]
+            succes, refus = statuts.count(201), statuts.count(409)
+            dispo = self.disponibilite(livre_id)
+            resultats.append(report(
+                f"{self.concurrence} prêts simultanés du dernier exemplaire ({mode})",
+                succes == 1 and refus == self.concurrence - 1 and dispo["disponibles"] == 0,
+                f"{succes} prêt(s), {refus} refus 409, autres {sorted(set(statuts) - {201, 409})}, "
+                f"{dispo['disponibles']} disponible(s)",
+            ))
+        return resultats
+
+    def test_plusieurs_exemplaires(self) -> List[bool]:
+        nombre = min(self.concurrence, 60)
+        livre_id, exemplaires = self.creer_livre(["Neuf", "Bon", "Bon", "Acceptable", "Abîmé"])
+        reponses = self.rafale(nombre, livre_id=livre_id)
+        pretes = [r.json()["exemplaire_id"] for r in reponses if r.status_code == 201]
+        refus = sum(r.status_code == 409 for r in reponses)
+        resultats = [report(
+            f"{nombre} prêts simultanés de {len(exemplaires)} exemplaires",
+            sorted(pretes) == sorted(exemplaires) and refus == nombre - len(exemplaires),
+            f"{len(pretes)} prêt(s) ({len(set(pretes))} exemplaires distincts), {refus} refus 409",
+        )]
+
+        # Autant de prêts que d'exemplaires, au-delà de 20 : aucun refus tant qu'il en reste
+        nombre = min(self.concurrence, 40)
+        livre_id, exemplaires = self.creer_livre(["Bon"] * nombre)
+        reponses = self.rafale(nombre, livre_id=livre_id)
+        pretes = [r.json()["exemplaire_id"] for r in reponses if r.status_code == 201]
+        resultats.append(report(
+            f"{nombre} prêts simultanés de {nombre} exemplaires",
+            sorted(pretes) == sorted(exemplaires),
+            f"{len(pretes)} prêt(s), statuts {sorted({r.status_code for r in reponses})}",
+        ))
+        return resultats
+
+    def test_retours(self) -> List[bool]:
+        livre_id, (exemplaire_id,) = self.creer_livre(["Bon"])
+        emprunt = self.checkout(livre_id=livre_id).json()
+        premier = self.retour(emprunt["emprunt_id"])
+        rendu = premier.json() if premier.status_code == 200 else {}
+        rejoue = self.retour(emprunt["emprunt_id"])
+        dispo = self.disponibilite(livre_id)
+        resultats = [
+            report("Retour à temps", premier.status_code == 200
+                   and rendu.get("statut_id") == self.statuts["Rendu à temps"]
+                   and rendu.get("date_retour_effectue") == date.today().isoformat(),
+                   f"statut {premier.status_code}, statut_id {rendu.get('statut_id')}"),
+            report("Exemplaire de nouveau disponible", dispo["disponibles"] == 1,
+                   f"{dispo['disponibles']} disponible(s)"),
+            report("Retour rejoué : même réponse", rejoue.status_code == 200 and rejoue.json() == rendu,
+                   f"statut {rejoue.status_code}"),
+            report("Emprunt inexistant → 404", self.retour(999999999).status_code == 404),
+        ]
+
+        # Emprunt échu, créé par la route CRUD avec une date de retour passée
+        en_retard = requests.post(f"{BASE_URL}/emprunts/", headers=self.headers, json={
+            "exemplaire_id": exemplaire_id, "utilisateur_id": self.utilisateur_id,
+            "date_emprunt": (date.today() - timedelta(days=30)).isoformat(),
+            "date_retour_prevu": (date.today() - timedelta(days=2)).isoformat(),
+            "statut_id": self.statuts["En cours"],
+        }).json()
+        self.created["emprunts"].append(en_retard["emprunt_id"])
+        statut_id = self.retour(en_retard["emprunt_id"]).json().get("statut_id")
+        resultats.append(report("Retour en retard", statut_id == self.statuts["Rendu en retard"],
+                                f"statut_id {statut_id}"))
+
+        # Retours rejoués simultanément (client qui renvoie sa requête)
+        emprunt = self.checkout(livre_id=livre_id).json()
+        nombre = 20
+        barriere = threading.Barrier(nombre)
+
+        def un():
+            with requests.Session() as session:
+                barriere.wait()
+                return self.retour(emprunt["emprunt_id"], session)
+
+        with ThreadPoolExecutor(max_workers=nombre) as executor:
+            reponses = list(executor.map(lambda _: un(), range(nombre)))
+        corps = {r.text for r in reponses}
+        exemplaire = requests.get(f"{BASE_URL}/exemplaires/{exemplaire_id}", headers=self.headers).json()
+        resultats.append(report(
+            f"{nombre} retours simultanés du même emprunt",
+            all(r.status_code == 200 for r in reponses) and len(corps) == 1 and exemplaire["disponible"],
+            f"statuts {sorted({r.status_code for r in reponses})}, {len(corps)} réponse(s) distincte(s)",
+        ))
+        return resultats
+
+    def run(self) -> int:
+        print(f"\n{Colors.BOLD}{Colors.CYAN}{'TESTS DES PRÊTS ET RETOURS'.center(80)}{Colors.RESET}\n")
+        self.login()
+        resultats = []
+        try:
+            resultats += self.test_choix_exemplaire()
+            resultats += self.test_erreurs()
+            resultats += self.test_dernier_exemplaire()
+            resultats += self.test_plusieurs_exemplaires()
+            resultats += self.test_retours()
+        finally:
+            self.cleanup()
+        print(f"\n{sum(resultats)}/{len(resultats)} tests réussis")
+        return 0 if all(resultats) else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrence", type=int, default=200, help="prêts simultanés du dernier exemplaire")
+    args = parser.parse_args()
+    return EmpruntsTester(args.concurrence).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
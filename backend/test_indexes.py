@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Script de test des index du schéma (migrations 0002, 0004 et 0007)
+
+Pour chaque index composite, exécute EXPLAIN sur la requête qu'il doit servir
+et vérifie que l'optimiseur l'utilise. Des données de test représentatives
+(majorité d'emprunts rendus, plusieurs utilisateurs) sont insérées puis supprimées.
+
+Usage (base migrée et initialisée, ex. dans le conteneur backend) :
+    python test_indexes.py
+"""
+
+import sys
+from datetime import date, timedelta
+from typing import List
+
+from sqlalchemy import delete, insert, select, text
+
+from app import models
+from app.database import SessionLocal, engine
+from app.catalogue import _select_disponibilite
+from app.exports import _select_emprunts
+from app.notifications import _select_notifications
+
+TAG = "IDXTEST"
+NB_LIVRES = 300
+NB_UTILISATEURS = 50
+
+
+# Couleurs pour le terminal
+class Colors:
+    GREEN = "\033[92m"
+    RED = "\033[91m"
+    CYAN = "\033[96m"
+    RESET = "\033[0m"
+    BOLD = "\033[1m"
+
+
+def seed(db) -> None:
+    """Insère un jeu de données représentatif, marqué par TAG"""
+    today = date.today()
+    categorie_id = db.execute(select(models.Categorie.categorie_id)).scalars().first()
+    etat_id = db.execute(select(models.Etat.etat_id)).scalars().first()
+    statut_id = db.execute(select(models.Statut.statut_id)).scalars().first()
+    departement_id = db.execute(select(models.Departement.departement_id)).scalars().first()
+    groupe_id = db.execute(select(models.Groupe.groupe_id)).scalars().first()
+
+    db.execute(
+        insert(models.Utilisateur),
+        [
+            {
+                "nom": TAG,
+                "prenom": str(i),
+                "email": f"{TAG.lower()}_{i}@example.com",
+                "password": "-",
+                "departement_id": departement_id,
+                "groupe_id": groupe_id,
+            }
+            for i in range(NB_UTILISATEURS)
+        ],
+    )
+    db.execute(
+        insert(models.Livre),
+        [
+            {
+                "titre": f"{TAG} {i}",
+                "auteur": TAG,
+                "categorie_id": categorie_id,
+                "isbn": f"{TAG}-{i}",
+                "annee_publication": 2000,
+                "editeur": TAG,
+            }
+            for i in range(NB_LIVRES)
+        ],
+    )
+    user_ids = db.execute(
+        select(models.Utilisateur.utilisateurs_id).where(models.Utilisateur.nom == TAG)
+    ).scalars().all()
+    livre_ids = db.execute(
+        select(models.Livre.livre_id).where(models.Livre.auteur == TAG)
+    ).scalars().all()
+    db.execute(
+        insert(models.Exemplaire),
+        [
+            {"livre_id": livre_id, "etat_id": etat_id, "disponible": n % 2 == 0, "date_ajout": today}
+            for livre_id in livre_ids
+            for n in range(3)
+        ],
+    )
+    exemplaire_ids = db.execute(
+        select(models.Exemplaire.exemplaire_id).where(models.Exemplaire.livre_id.in_(livre_ids))
+    ).scalars().all()
+    # 90 % des emprunts sont rendus : seule une petite partie intéresse les notifications
+    db.execute(
+        insert(models.Emprunt),
+        [
+            {
+                "exemplaire_id": exemplaire_id,
+                "utilisateur_id": user_ids[i % len(user_ids)],
+                "date_emprunt": today - timedelta(days=i % 365),
+                "date_retour_prevu": today + timedelta(days=i % 40 - 10),
+                "date_retour_effectue": None if i % 10 == 0 else today,
+                "statut_id": statut_id,
+            }
+            for i, exemplaire_id in enumerate(exemplaire_ids * 3)
+        ],
+    )
+    db.commit()
+
+
+def cleanup(db) -> None:
+    user_ids = select(models.Utilisateur.utilisateurs_id).where(models.Utilisateur.nom == TAG)
+    livre_ids = select(models.Livre.livre_id).where(models.Livre.auteur == TAG)
+    db.execute(delete(models.Emprunt).where(models.Emprunt.utilisateur_id.in_(user_ids)))
+    db.execute(delete(models.NotificationDigest).where(models.NotificationDigest.utilisateur_id.in_(user_ids)))
+    db.execute(delete(models.Exemplaire).where(models.Exemplaire.livre_id.in_(livre_ids)))
+    db.execute(delete(models.Livre).where(models.Livre.auteur == TAG))
+    db.execute(delete(models.Utilisateur).where(models.Utilisateur.nom == TAG))
+    db.commit()
+
+
+def analyze(db) -> None:
+    """Met à jour les statistiques de l'optimiseur"""
+    if engine.dialect.name == "mysql":
+        db.execute(text("ANALYZE TABLE emprunts, livres, exemplaires"))
+    else:
+        db.execute(text("ANALYZE"))
+    db.commit()
+
+
+def indexes_used(db, stmt, table: str) -> List[str]:
+    """Index choisis par l'optimiseur pour `table` dans le plan de `stmt`"""
+    sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    if engine.dialect.name == "mysql":
+        rows = db.execute(text("EXPLAIN " + sql)).mappings().all()
+        return [row["key"] for row in rows if row["table"] == table and row["key"]]
+    # SQLite : "SEARCH emprunts USING INDEX ix_... (...)"
+    details = [row[-1] for row in db.execute(text("EXPLAIN QUERY PLAN " + sql))]
+    used = []
+    for detail in details:
+        words = detail.replace("COVERING ", "").split()
+        if len(words) >= 5 and words[1] == table and words[2:4] == ["USING", "INDEX"]:
+            used.append(words[4])
+    return used
+
+
+def main() -> int:
+    today = date.today()
+    db = SessionLocal()
+    some_user = select(models.Utilisateur.utilisateurs_id).where(models.Utilisateur.nom == TAG).limit(1)
+    page_livres = select(models.Livre.livre_id).where(models.Livre.auteur == TAG).limit(100)
+
+    cases = [
+        (
+            "Notifications de tous les utilisateurs",
+            lambda: _select_notifications(today),
+            "emprunts",
+            "ix_emprunts_retour",
+        ),
+        (
+            "Notifications d'un utilisateur",
+            lambda: _select_notifications(
+                today, utilisateur_ids=[db.execute(some_user).scalar()], avec_utilisateur=False
+            ),
+            "emprunts",
+            "ix_emprunts_utilisateur_retour",
+        ),
+        (
+            "Livre par ISBN",
+            lambda: select(models.Livre).where(models.Livre.isbn == f"{TAG}-42"),
+            "livres",
+            "ix_livres_isbn",
+        ),
+        (
+            "Exemplaires disponibles d'un livre",
+            lambda: select(models.Exemplaire.exemplaire_id).where(
+                models.Exemplaire.livre_id
+                == select(models.Livre.livre_id).where(models.Livre.isbn == f"{TAG}-7").scalar_subquery(),
+                models.Exemplaire.disponible.is_(True),
+            ),
+            "exemplaires",
+            "ix_exemplaires_livre_disponible_etat",
+        ),
+        (
+            "Export des emprunts d'une période",
+            lambda: _select_emprunts(today - timedelta(days=7), today),
+            "emprunts",
+            "ix_emprunts_date_emprunt",
+        ),
+        (
+            "Disponibilité d'une page de livres (exemplaires)",
+            lambda: _select_disponibilite(db.execute(page_livres).scalars().all()),
+            "exemplaires",
+            "ix_exemplaires_livre_disponible_etat",
+        ),
+        (
+            "Disponibilité d'une page de livres (emprunts en cours)",
+            lambda: _select_disponibilite(db.execute(page_livres).scalars().all()),
+            "emprunts",
+            "ix_emprunts_exemplaire_retour",
+        ),
+    ]
+
+    print(f"\n{Colors.BOLD}{Colors.CYAN}{'TESTS DES INDEX (EXPLAIN)'.center(80)}{Colors.RESET}\n")
+    failures = 0
+    try:
+        cleanup(db)
+        seed(db)
+        analyze(db)
+        for scenario, build, table, index in cases:
+            used = indexes_used(db, build(), table)
+            ok = index in used
+            failures += not ok
+            status = f"{Colors.GREEN}✓ OK{Colors.RESET}" if ok else f"{Colors.RED}✗ ÉCHEC{Colors.RESET}"
+            print(f"[{table}] {scenario}... {status} - attendu {index}, plan : {used or 'aucun index'}")
+    finally:
+        cleanup(db)
+        db.close()
+
+    print(f"\n{len(cases) - failures}/{len(cases)} index utilisés")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Script de test des budgets de requêtes SQL (détection des N+1)
+
+Chaque scénario compte les requêtes SQL exécutées et échoue au-delà de son budget,
+ou si une même instruction est répétée avec des paramètres différents (N+1) :
+- fonctions de notifications.py, via metriques.compter_requetes()
+- routes de l'API, appelées en processus (TestClient) avec DEBUG=true et
+  SQL_N1_DETECTION=true : en-têtes X-DB-Queries et X-DB-N-Plus-One
+
+Les données de test_indexes.py sont insérées puis supprimées.
+
+Usage (base migrée et initialisée, ex. dans le conteneur backend) :
+    python test_requetes_sql.py
+"""
+
+import os
+import sys
+from typing import Tuple
+
+# Avant l'import de l'application : en-têtes SQL actifs, sans job ni index en mémoire
+os.environ["DEBUG"] = "true"
+os.environ["SQL_N1_DETECTION"] = "true"
+os.environ["METRICS"] = "true"
+os.environ["NOTIFICATION_DIGEST_JOB"] = "false"
+os.environ["TRIGRAM_INDEX"] = "false"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, select
+
+from app import metriques, models, notifications
+from app.database import SessionLocal
+from app.main import app
+from test_indexes import TAG, cleanup, seed
+
+ADMIN = {"email": "admin@library.com", "password": "admin123"}
+
+
+# Couleurs pour le terminal
+class Colors:
+    GREEN = "\033[92m"
+    RED = "\033[91m"
+    CYAN = "\033[96m"
+    RESET = "\033[0m"
+    BOLD = "\033[1m"
+
+
+def report(scenario: str, requetes: int, budget: int, n_plus_un: int) -> bool:
+    ok = requetes <= budget and not n_plus_un
+    status = f"{Colors.GREEN}✓ OK{Colors.RESET}" if ok else f"{Colors.RED}✗ ÉCHEC{Colors.RESET}"
+    detail = f"{requetes} requête(s), budget {budget}"
+    if n_plus_un:
+        detail += f", {n_plus_un} N+1 probable(s)"
+    print(f"{scenario}... {status} - {detail}")
+    return ok
+
+
+def fonctions(db, utilisateur_id: int) -> Tuple[int, int]:
+    """Budgets des requêtes de notifications.py ; retourne (échecs, scénarios)"""
+    db.execute(delete(models.NotificationDigest).where(models.NotificationDigest.utilisateur_id == utilisateur_id))
+    db.commit()
+    cases = [
+        # Digest absent : lecture, calcul en une requête, écriture du digest
+        ("get_notifications_utilisateur (digest absent)",
+         lambda: notifications.get_notifications_utilisateur(db, utilisateur_id), 4),
+        # Digest du jour : lecture par clé primaire
+        ("get_notifications_utilisateur (digest à jour)",
+         lambda: notifications.get_notifications_utilisateur(db, utilisateur_id), 1),
+        ("get_tous_les_rappels", lambda: notifications.get_tous_les_rappels(db), 1),
+        ("get_emprunts_en_retard", lambda: notifications.get_emprunts_en_retard(db), 1),
+    ]
+    echecs = 0
+    for scenario, appel, budget in cases:
+        with metriques.compter_requetes() as sql:
+            appel()
+        echecs += not report(f"[notifications] {scenario}", sql.requetes, budget, len(sql.n_plus_un()))
+    return echecs, len(cases)
+
+
+def routes(client: TestClient, livre_id: int) -> Tuple[int, int]:
+    """Budgets des routes (en-têtes de débogage) ; retourne (échecs, scénarios)"""
+    token = client.post("/login", json=ADMIN).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    # Premier appel : digest de l'admin éventuellement recalculé, hors budget
+    client.get("/notifications/mes-notifications", headers=headers)
+
+    cases = [
+        ("GET /livres/ (read_items)", "/livres/?limit=100", 1),
+        ("GET /livres/ trié par titre", "/livres/?limit=100&sort=titre", 1),
+        ("GET /livres/{item_id} (read_item)", f"/livres/{livre_id}", 1),
+        ("GET /livres/catalogue", "/livres/catalogue?limit=100", 1),
+        ("GET /livres/catalogue trié par titre", "/livres/catalogue?limit=100&sort=-titre", 1),
+        ("GET /livres/disponibilite", f"/livres/disponibilite?ids={','.join(str(livre_id + i) for i in range(100))}", 1),
+        ("GET /exemplaires/", "/exemplaires/?limit=100", 1),
+        ("GET /emprunts/", "/emprunts/?limit=100", 1),
+        ("GET /utilisateurs/", "/utilisateurs/?limit=100", 1),
+        ("GET /notifications/mes-notifications", "/notifications/mes-notifications", 1),
+        ("GET /notifications/tous", "/notifications/tous", 1),
+        ("GET /me", "/me", 1),
+        ("POST /login", None, 1),
+    ]
+    echecs = 0
+    for scenario, url, budget in cases:
+        response = client.post("/login", json=ADMIN) if url is None else client.get(url, headers=headers)
+        if response.status_code != 200 or "x-db-queries" not in response.headers:
+            print(f"[route] {scenario}... {Colors.RED}✗ ÉCHEC{Colors.RESET} - statut {response.status_code}, "
+                  f"X-DB-Queries {response.headers.get('x-db-queries', 'absent')}")
+            echecs += 1
+            continue
+        requetes = int(response.headers["x-db-queries"])
+        n_plus_un = int(response.headers.get("x-db-n-plus-one", 0))
+        echecs += not report(f"[route] {scenario}", requetes, budget, n_plus_un)
+    return echecs, len(cases)
+
+
+def main() -> int:
+    print(f"\n{Colors.BOLD}{Colors.CYAN}{'TESTS DES BUDGETS DE REQUÊTES SQL'.center(80)}{Colors.RESET}\n")
+    db = SessionLocal()
+    try:
+        cleanup(db)
+        seed(db)
+        utilisateur_id = db.execute(
+            select(models.Utilisateur.utilisateurs_id).where(models.Utilisateur.nom == TAG).limit(1)
+        ).scalar()
+        livre_id = db.execute(select(models.Livre.livre_id).where(models.Livre.auteur == TAG).limit(1)).scalar()
+
+        echecs, total = fonctions(db, utilisateur_id)
+        with TestClient(app) as client:
+            echecs_routes, nb_routes = routes(client, livre_id)
+        echecs += echecs_routes
+        total += nb_routes
+    finally:
+        cleanup(db)
+        db.close()
+
+    print(f"\n{total - echecs}/{total} budgets respectés")
+    return 1 if echecs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
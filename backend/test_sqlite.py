@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Script de test du mode SQLite (DATABASE_URL=sqlite:///...)
+
+Sur deux fichiers temporaires, primaire et réplique, migrés et initialisés :
+- pragmas de chaque connexion (WAL, clés étrangères, attente des verrous)
+- lecture pendant une écriture non validée (WAL : pas de blocage)
+- comportement identique à MySQL : clés étrangères, email insensible à la casse,
+  dates des notifications (retard, J-30, J-5), recherche insensible aux accents
+- routage des lectures vers la réplique, et vers le primaire après une écriture
+
+Aucun serveur MySQL n'est requis ; les fichiers sont supprimés à la fin.
+
+Usage (depuis backend/) :
+    python test_sqlite.py
+    DB_ASYNC=true python test_sqlite.py
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Avant l'import de l'application : bases SQLite temporaires, sans job ni index en mémoire
+DOSSIER = tempfile.mkdtemp(prefix="bibliotheque-sqlite-")
+PRIMAIRE = os.path.join(DOSSIER, "primaire.db")
+REPLIQUE = os.path.join(DOSSIER, "replique.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{PRIMAIRE}"
+os.environ["DB_REPLICA_URL"] = f"sqlite:///{REPLIQUE}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["NOTIFICATION_DIGEST_JOB"] = "false"
+os.environ["TRIGRAM_INDEX"] = "false"
+
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+from sqlalchemy import select, text
+from sqlalchemy.exc import IntegrityError
+
+from app import connexions, models, notifications
+from app.database import SessionLocal, engine
+from app.main import app
+from initdb import init_db
+
+ADMIN = {"email": "admin@library.com", "password": "admin123"}
+TAG = "SQLITE"
+
+
+# Couleurs pour le terminal
+class Colors:
+    GREEN = "\033[92m"
+    RED = "\033[91m"
+    CYAN = "\033[96m"
+    RESET = "\033[0m"
+    BOLD = "\033[1m"
+
+
+def report(scenario: str, ok: bool, detail: str = "") -> bool:
+    status = f"{Colors.GREEN}✓ OK{Colors.RESET}" if ok else f"{Colors.RED}✗ ÉCHEC{Colors.RESET}"
+    print(f"{scenario}... {status}" + (f" - {detail}" if detail else ""))
+    return ok
+
+
+def preparer() -> None:
+    """Schéma et données de base sur le primaire, puis copie vers la réplique"""
+    command.upgrade(Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")), "head")
+    init_db()
+    source, copie = sqlite3.connect(PRIMAIRE), sqlite3.connect(REPLIQUE)
+    try:
+        source.backup(copie)
+    finally:
+        source.close()
+        copie.close()
+
+
+def test_pragmas() -> bool:
+    with engine.connect() as conn:
+        valeurs = {
+            p: conn.exec_driver_sql(f"PRAGMA {p}").scalar()
+            for p in ("journal_mode", "foreign_keys", "busy_timeout", "synchronous")
+        }
+    attendu = {
+        "journal_mode": "wal",
+        "foreign_keys": 1,
+        "busy_timeout": connexions.SQLITE_BUSY_TIMEOUT_MS,
+        "synchronous": 1,  # NORMAL
+    }
+    return report("Pragmas de connexion", valeurs == attendu, str(valeurs))
+
+
+def test_lecture_pendant_ecriture() -> bool:
+    """Une transaction d'écriture ouverte ne bloque pas les lecteurs (journal WAL)"""
+    with engine.connect() as ecrivain:
+        ecrivain.execute(text("INSERT INTO categories (nom, version) VALUES (:nom, 1)"), {"nom": TAG})
+        start = time.perf_counter()
+        with SessionLocal() as db:
+            vue = db.execute(select(models.Categorie).where(models.Categorie.nom == TAG)).first()
+        duree_ms = (time.perf_counter() - start) * 1000
+        ecrivain.rollback()
+    return report(
+        "Lecture pendant une écriture non validée",
+        vue is None and duree_ms < 1000,
+        f"{duree_ms:.1f} ms, ligne non validée {'visible' if vue else 'invisible'}",
+    )
+
+
+def test_cle_etrangere() -> bool:
+    with SessionLocal() as db:
+        db.add(models.Exemplaire(livre_id=999999, disponible=True))
+        try:
+            db.commit()
+        except IntegrityError:
+            return report("Clé étrangère vérifiée", True, "IntegrityError")
+        return report("Clé étrangère vérifiée", False, "exemplaire orphelin accepté")
+
+
+def test_email_casse(client: TestClient) -> bool:
+    response = client.post("/login", json={**ADMIN, "email": ADMIN["email"].upper()})
+    return report("Connexion avec l'email en majuscules", response.status_code == 200, f"statut {response.status_code}")
+
+
+def creer_emprunts(db) -> int:
+    """Un élève avec quatre emprunts : en retard de 3 jours, à J-30, à J-5, à J-10"""
+    today = date.today()
+    groupe_id = db.execute(select(models.Groupe.groupe_id).where(models.Groupe.nom == "Eleve")).scalar()
+    statut_id = db.execute(select(models.Statut.statut_id).where(models.Statut.nom == "En cours")).scalar()
+    utilisateur = models.Utilisateur(nom=TAG, prenom="Test", email="eleve@sqlite.test", password="x", groupe_id=groupe_id)
+    categorie_id = db.execute(select(models.Categorie.categorie_id)).scalars().first()
+    livre = models.Livre(
+        titre="Géographie de l'Europe", auteur=TAG, categorie_id=categorie_id,
+        isbn="978-0-00-000000-0", annee_publication=2020, editeur=TAG,
+    )
+    db.add_all([utilisateur, livre])
+    db.flush()
+    for jours in (-3, 30, 5, 10):
+        exemplaire = models.Exemplaire(livre_id=livre.livre_id, disponible=False, date_ajout=today)
+        db.add(exemplaire)
+        db.flush()
+        db.add(models.Emprunt(
+            exemplaire_id=exemplaire.exemplaire_id,
+            utilisateur_id=utilisateur.utilisateurs_id,
+            date_emprunt=today - timedelta(days=30),
+            date_retour_prevu=today + timedelta(days=jours),
+            statut_id=statut_id,
+        ))
+    db.commit()
+    return utilisateur.utilisateurs_id
+
+
+def test_notifications() -> bool:
+    with SessionLocal() as db:
+        digest = notifications.get_notifications_utilisateur(db, creer_emprunts(db))
+    retards = digest[notifications.EN_RETARD]
+    ok = (
+        [n["jours_retard"] for n in retards] == [3]
+        and [n["jours_restants"] for n in digest[notifications.RAPPEL_J30]] == [30]
+        and [n["jours_restants"] for n in digest[notifications.RAPPEL_J5]] == [5]
+        and digest["total_notifications"] == 3
+    )
+    return report(
+        "Dates des notifications (retard, J-30, J-5)",
+        ok,
+        f"{len(retards)} retard(s), {digest['total_notifications']} notification(s)",
+    )
+
+
+def test_recherche(client: TestClient) -> bool:
+    # Lecture sur le primaire : cookie posé par la connexion de test_email_casse
+    response = client.get("/livres/search", params={"q": "GEOGRAPHIE"})
+    titres = [livre["titre"] for livre in response.json()] if response.status_code == 200 else []
+    return report(
+        "Recherche insensible à la casse et aux accents",
+        "Géographie de l'Europe" in titres,
+        f"statut {response.status_code}, {len(titres)} résultat(s)",
+    )
+
+
+def test_replique(client: TestClient) -> bool:
+    """Le livre créé après la copie n'existe que sur le primaire"""
+    with SessionLocal() as db:
+        livre_id = db.execute(select(models.Livre.livre_id).where(models.Livre.auteur == TAG)).scalar()
+    token = client.post("/login", json=ADMIN).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.cookies.clear()
+    sur_replique = client.get(f"/livres/{livre_id}", headers=headers).status_code
+    # Une écriture réussie pose le cookie : les lectures suivantes vont au primaire
+    client.post("/login", json=ADMIN)
+    sur_primaire = client.get(f"/livres/{livre_id}", headers=headers).status_code
+    return report(
+        "Lectures sur la réplique, puis sur le primaire après une écriture",
+        (sur_replique, sur_primaire) == (404, 200),
+        f"réplique {sur_replique}, primaire {sur_primaire}",
+    )
+
+
+def main() -> int:
+    print(f"\n{Colors.BOLD}{Colors.CYAN}{'TESTS DU MODE SQLITE'.center(80)}{Colors.RESET}\n")
+    try:
+        preparer()
+        resultats = [test_pragmas(), test_lecture_pendant_ecriture(), test_cle_etrangere(), test_notifications()]
+        with TestClient(app) as client:
+            resultats += [test_email_casse(client), test_recherche(client), test_replique(client)]
+    finally:
+        engine.dispose()
+        shutil.rmtree(DOSSIER, ignore_errors=True)
+
+    print(f"\n{sum(resultats)}/{len(resultats)} tests réussis")
+    return 0 if all(resultats) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
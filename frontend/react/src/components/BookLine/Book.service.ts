@@ -15,6 +15,18 @@ export const BookService = {
         }
     },
 
+    // Recherche plein texte côté serveur (titre, auteur, résumé), triée par pertinence
+    async searchBooks(query: string): Promise<BookProps[]> {
+        try {
+            const response = await fetch(`${API_URL}search?q=${encodeURIComponent(query)}`);
+            if (!response.ok) throw new Error('Erreur réseau');
+            return await response.json();
+        } catch (error) {
+            console.error("Erreur lors de la recherche des livres:", error);
+            return [];
+        }
+    },
+
     async postBook(book: Omit<BookProps, 'livre_id'>): Promise<BookProps | null> {
         try {
             const response = await fetch(API_URL, {
@@ -2,11 +2,17 @@ import "./Header.css";
 import backgroundImage from "../../assets/librairy.png";
 import headerImage from "../../assets/verne_sign.png";
 import { CreateBookModal } from "../CreateBookModal/CreateBookModal";
-import { useState } from "react";
+import { useState, type FormEvent } from "react";
 
 // Ajout de la prop isAdmin (par défaut false)
-export function Header({ isAdmin = true }) {
+export function Header({ isAdmin = true, onSearch }: { isAdmin?: boolean; onSearch?: (query: string) => void }) {
     const [showModal, setShowModal] = useState(false);
+    const [query, setQuery] = useState("");
+
+    const handleSearch = (e: FormEvent) => {
+        e.preventDefault();
+        onSearch?.(query.trim());
+    };
 
     return (
         <header className="hero-header">
@@ -26,9 +32,9 @@ export function Header({ isAdmin = true }) {
 
             <div className="hero-content">
                 <div className="search-container">
-                    <form className="search-form" role="search">
+                    <form className="search-form" role="search" onSubmit={handleSearch}>
                         <div className="search-group">
-                            <input type="text" placeholder="Les Fleurs du Mal..." aria-label="Rechercher un livre" />
+                            <input type="text" placeholder="Les Fleurs du Mal..." aria-label="Rechercher un livre" value={query} onChange={e => setQuery(e.target.value)} />
                             <button type="submit" className="search-button">
                                 <svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="currentColor">
                                     <path fillRule="evenodd" d="M10.5 3.75a6.75 6.75 0 1 0 0 13.5 6.75 6.75 0 0 0 0-13.5ZM2.25 10.5a8.25 8.25 0 1 1 14.59 5.28l4.69 4.69a.75.75 0 1 1-1.06 1.06l-4.69-4.69A8.25 8.25 0 0 1 2.25 10.5Z" clipRule="evenodd" />
@@ -13,6 +13,12 @@ export function Home() {
         BookService.getBooks().then(data => setBooks(data));
     }, []);
 
+    // Recherche côté serveur ; une recherche vide réaffiche la première page du catalogue
+    const handleSearch = (query: string) => {
+        const request = query ? BookService.searchBooks(query) : BookService.getBooks();
+        request.then(data => setBooks(data));
+    };
+
     console.log(books)
 
     /* const mockBook: BookProps[] = [{
@@ -29,7 +35,7 @@ export function Home() {
 
     return (
         <>
-            <Header></Header>
+            <Header onSearch={handleSearch}></Header>
             <List>
                 {books.map(book => <BookLine book={book}></BookLine>)}
             </List>